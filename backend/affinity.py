@@ -0,0 +1,157 @@
+"""
+Oda Yakınlığı (Room Affinity)
+ROOM_AFFINITY açıkken her oda tutarlı hash halkası (consistent hashing)
+ile tek bir worker'a aittir. Sahibi olmayan worker'a gelen WebSocket
+bağlantısı "redirect" frame'i ile sahibin adresine yönlendirilir; böylece
+bir odanın yayınları, history buffer'ı, replay log'u ve yazıyor listesi
+tek süreçte kalır ve backplane'den geçmez.
+
+Her worker AFFINITY_WORKER_URL ile kendi adresini hello/heartbeat
+mesajlarında duyurur. Worker katıldığında veya düştüğünde halka yeniden
+kurulur; sadece sahibi değişen odalar (yaklaşık 1/N'i) taşınır.
+"""
+
+from bisect import bisect
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import hashlib
+
+from backplane import Backplane, backplane as default_backplane
+from config import settings
+from history import recent_history
+from replay import replay_log
+
+
+def _hash(key: str) -> int:
+    """Anahtarın halkadaki konumu (64 bit)"""
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """
+    Tutarlı hash halkası.
+    
+    Her düğüm halkaya `vnodes` sanal düğümle yerleşir (yük dengesi için);
+    bir anahtarın sahibi, konumundan sonraki ilk sanal düğümdür.
+    """
+    
+    def __init__(self, vnodes: int = 160):
+        self.vnodes = vnodes
+        self.nodes: Tuple[str, ...] = ()
+        self._points: List[int] = []
+        self._owners: List[str] = []
+    
+    def rebuild(self, nodes: Iterable[str]):
+        """Halkayı verilen düğümlerle yeniden kurar"""
+        self.nodes = tuple(sorted(set(nodes)))
+        points = sorted(
+            (_hash(f"{node}#{index}"), node)
+            for node in self.nodes
+            for index in range(self.vnodes)
+        )
+        self._points = [point for point, _ in points]
+        self._owners = [node for _, node in points]
+    
+    def owner(self, key: str) -> Optional[str]:
+        """Anahtarın sahibi olan düğüm (halka boşsa None)"""
+        if not self._points:
+            return None
+        index = bisect(self._points, _hash(key)) % len(self._points)
+        return self._owners[index]
+
+
+class RoomAffinity:
+    """
+    Odaların hangi worker'a ait olduğunu takip eder.
+    
+    - owner_url(): oda başka bir worker'a aitse onun adresi, değilse None
+    - Halka değiştiğinde artık sahibi olunmayan odaların replay log'u ve
+      history buffer'ı atılır, on_rebalance() ile kaydedilen fonksiyonlar
+      (bağlı istemcileri yeni sahibe devretmek için) çağrılır.
+    """
+    
+    def __init__(
+        self,
+        backplane: Backplane = None,
+        enabled: bool = None,
+        url: str = None,
+        vnodes: int = None
+    ):
+        self.enabled = settings.ROOM_AFFINITY if enabled is None else enabled
+        self.url = url or settings.AFFINITY_WORKER_URL
+        self.ring = HashRing(vnodes or settings.AFFINITY_VIRTUAL_NODES)
+        self.ring.rebuild([self.url])
+        self._urls: Dict[str, str] = {}  # worker_id -> adres
+        self._listeners: List[Callable[[], None]] = []
+        
+        # İstatistikler
+        self.rebalances = 0
+        self.redirects = 0  # Sahibine yönlendirilen bağlantılar
+        
+        if self.enabled:
+            backplane = backplane or default_backplane
+            backplane.info["url"] = self.url
+            backplane.on("hello", self._on_announce)
+            backplane.on("heartbeat", self._on_announce)
+            backplane.on_worker_lost(self._on_worker_lost)
+    
+    def owns(self, room_id: str) -> bool:
+        """Oda bu worker'a mı ait? (affinity kapalıysa her oda)"""
+        return not self.enabled or self.ring.owner(room_id) == self.url
+    
+    def owner_url(self, room_id: str) -> Optional[str]:
+        """Oda başka bir worker'a aitse onun adresi, değilse None"""
+        if not self.enabled:
+            return None
+        owner = self.ring.owner(room_id)
+        return owner if owner != self.url else None
+    
+    def on_rebalance(self, handler: Callable[[], None]):
+        """Odaların sahipleri değiştiğinde çağrılacak fonksiyonu kaydeder"""
+        self._listeners.append(handler)
+    
+    def get_stats(self) -> dict:
+        """Affinity durumunu döner"""
+        return {
+            "enabled": self.enabled,
+            "url": self.url,
+            "workers": len(self.ring.nodes),
+            "rebalances": self.rebalances,
+            "redirects": self.redirects
+        }
+    
+    # ==================== İç Yardımcılar ====================
+    
+    def _on_announce(self, message: dict):
+        """hello/heartbeat ile gelen worker adresini kaydeder"""
+        url = message.get("url")
+        if url and self._urls.get(message["worker"]) != url:
+            self._urls[message["worker"]] = url
+            self._rebuild()
+    
+    def _on_worker_lost(self, worker: str):
+        """Düşen worker'ı halkadan çıkarır"""
+        if self._urls.pop(worker, None) is not None:
+            self._rebuild()
+    
+    def _rebuild(self):
+        """Halkayı yeniden kurar, sahipliği değişen odaları devreder"""
+        nodes = {self.url, *self._urls.values()}
+        if set(self.ring.nodes) == nodes:
+            return
+        caches = (replay_log, recent_history)
+        owned = {room_id for cache in caches for room_id in cache.rooms() if self.owns(room_id)}
+        self.ring.rebuild(nodes)
+        self.rebalances += 1
+        print(f"🔀 Oda sahiplikleri yeniden dağıtıldı: {len(nodes)} worker")
+        
+        # Sahipliği kesintisiz sürmeyen odaların yerel durumu eksik/eski olabilir
+        for cache in caches:
+            for room_id in cache.rooms():
+                if room_id not in owned or not self.owns(room_id):
+                    cache.drop(room_id)
+        for handler in self._listeners:
+            handler()
+
+
+# Global singleton instance
+room_affinity = RoomAffinity()
@@ -0,0 +1,494 @@
+"""
+Süreçler Arası Yayın Omurgası (Backplane)
+`uvicorn --workers N` ile çalışırken her worker kendi bağlantılarını
+tutar; oda yayınları, presence ve yazıyor listeleri worker'lar arasında
+bu pub/sub katmanı üzerinden aktarılır.
+
+Gerçekleştirmeler (BACKPLANE ayarı):
+- local:  Tek süreç, hiçbir şey aktarılmaz (varsayılan)
+- unix:   Aynı makinedeki worker'lar BACKPLANE_SOCKET_DIR içindeki Unix
+          datagram soketleri üzerinden doğrudan haberleşir
+- redis:  Harici broker (redis.asyncio kuruluysa), BrokerClient adaptörü
+- memory: Süreç içi broker (testlerde harici broker'ın yerine geçer)
+"""
+
+from typing import Callable, Dict, List, Optional
+import asyncio
+import errno
+import os
+import socket
+import time
+import uuid
+
+from config import settings
+from replay import SEQ_STRIDE
+from serialization import dumps, loads
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # pragma: no cover - opsiyonel bağımlılık
+    aioredis = None
+
+
+# Worker'ı ölü saymak için kaçırılması gereken heartbeat sayısı
+MISSED_HEARTBEATS = 3
+
+
+class Backplane:
+    """
+    Tüm backplane'lerin ortak kısmı (ve "local" gerçekleştirmesi).
+    
+    - publish(kind, **fields) beklemeden döner; mesajlar sıraya alınır ve
+      bir sender task'ı tarafından taşıyıcıya (_send) yazılır.
+    - Gelen mesajlar on(kind, handler) ile kaydedilen fonksiyonlara dağıtılır.
+    - Worker'lar heartbeat gönderir; MISSED_HEARTBEATS aralık boyunca
+      sesi çıkmayan (veya "bye" diyen) worker için on_worker_lost
+      fonksiyonları, yeni görülen worker için on_worker_joined
+      fonksiyonları çağrılır (örn. tam presence durumunu göndermek için).
+    """
+    
+    name = "local"
+    enabled = False
+    
+    def __init__(self, heartbeat_seconds: float = None, queue_size: int = None):
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.slot = 0  # Worker'lar arasında benzersiz küçük sayı (seq'lere eklenir)
+        # hello/heartbeat mesajlarıyla duyurulan bilgiler (örn. worker'ın adresi)
+        self.info: Dict[str, str] = {}
+        self.heartbeat = heartbeat_seconds or settings.BACKPLANE_HEARTBEAT_SECONDS
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size or settings.BACKPLANE_QUEUE_SIZE)
+        self._handlers: Dict[str, Callable[[dict], None]] = {}
+        self._joined_handlers: List[Callable[[str], None]] = []
+        self._lost_handlers: List[Callable[[str], None]] = []
+        self._peers: Dict[str, float] = {}  # worker_id -> son görülme (monotonic)
+        self._tasks: List[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        
+        # İstatistikler
+        self.published = 0
+        self.received = 0
+        self.dropped = 0  # Kuyruk dolduğu veya taşıyıcı kabul etmediği için atılanlar
+    
+    def on(self, kind: str, handler: Callable[[dict], None]):
+        """Bu türdeki uzak mesajlar için işleyici kaydeder"""
+        self._handlers[kind] = handler
+    
+    def on_worker_joined(self, handler: Callable[[str], None]):
+        """Yeni bir worker görüldüğünde çağrılacak fonksiyonu kaydeder"""
+        self._joined_handlers.append(handler)
+    
+    def on_worker_lost(self, handler: Callable[[str], None]):
+        """Bir worker kapandığında/öldüğünde çağrılacak fonksiyonu kaydeder"""
+        self._lost_handlers.append(handler)
+    
+    def publish(self, kind: str, **fields):
+        """
+        Mesajı diğer worker'lara gönderilmek üzere sıraya alır (beklemez).
+        Veritabanı thread'lerinden (ORM event'leri) de çağrılabilir.
+        """
+        if not self.enabled:
+            return
+        fields["kind"] = kind
+        fields["worker"] = self.worker_id
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            if self._loop is not None:
+                self._loop.call_soon_threadsafe(self._put, fields)
+            return
+        self._put(fields)
+    
+    async def start(self):
+        """Taşıyıcıyı açar, sender ve heartbeat task'larını başlatır"""
+        if not self.enabled or self._tasks:
+            return
+        self._loop = asyncio.get_running_loop()
+        await self._open()
+        self._tasks = [
+            asyncio.create_task(self._sender()),
+            asyncio.create_task(self._heartbeat())
+        ]
+        self.publish("hello", **self.info)
+        print(f"🔗 Backplane ({self.name}) hazır: {self.worker_id} (slot {self.slot})")
+    
+    async def stop(self):
+        """Diğer worker'lara ayrıldığını bildirir ve taşıyıcıyı kapatır"""
+        if not self._tasks:
+            return
+        self.publish("bye")
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=1)
+        except asyncio.TimeoutError:
+            pass
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        await self._close()
+    
+    def peers(self) -> List[str]:
+        """Canlı görülen diğer worker'lar"""
+        return list(self._peers)
+    
+    def get_stats(self) -> dict:
+        """Backplane durumunu döner"""
+        return {
+            "backend": self.name,
+            "worker_id": self.worker_id,
+            "slot": self.slot,
+            "peers": len(self._peers),
+            "published": self.published,
+            "received": self.received,
+            "dropped": self.dropped
+        }
+    
+    # ==================== Taşıyıcı (alt sınıflar) ====================
+    
+    async def _open(self):
+        """Taşıyıcı bağlantısını açar"""
+    
+    async def _close(self):
+        """Taşıyıcı bağlantısını kapatır"""
+    
+    async def _send(self, data: bytes):
+        """Kodlanmış mesajı diğer worker'lara iletir"""
+    
+    def _peer_joined(self, worker: str):
+        """Yeni bir worker görüldü (taşıyıcı adres listesini yenileyebilir)"""
+    
+    # ==================== İç Yardımcılar ====================
+    
+    def _put(self, message: dict):
+        """Mesajı gönderim kuyruğuna ekler (doluysa atar)"""
+        try:
+            self._queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.dropped += 1
+    
+    def _receive(self, data: bytes):
+        """Taşıyıcıdan gelen mesajı çözer ve işleyicisine dağıtır"""
+        try:
+            message = loads(data)
+        except ValueError:
+            return
+        worker = message.get("worker")
+        if worker == self.worker_id:
+            return
+        self.received += 1
+        
+        kind = message.get("kind")
+        if kind == "bye":
+            self._forget_peer(worker)
+            return
+        
+        is_new = worker not in self._peers
+        self._peers[worker] = time.monotonic()
+        if is_new or kind == "hello":
+            # Yeni worker bizim durumumuzu bilmiyor
+            self._peer_joined(worker)
+            if is_new:
+                self.publish("heartbeat", **self.info)
+            for handler in self._joined_handlers:
+                handler(worker)
+        
+        handler = self._handlers.get(kind)
+        if handler is not None:
+            try:
+                handler(message)
+            except Exception as e:
+                print(f"❌ Backplane mesajı işlenemedi ({kind}): {e}")
+    
+    def _forget_peer(self, worker: str):
+        """Worker'ı listeden çıkarır ve kayıp işleyicilerini çağırır"""
+        if self._peers.pop(worker, None) is None:
+            return
+        for handler in self._lost_handlers:
+            handler(worker)
+    
+    async def _sender(self):
+        """Sıradaki mesajları kodlayıp taşıyıcıya yazan task"""
+        while True:
+            message = await self._queue.get()
+            try:
+                await self._send(dumps(message))
+                self.published += 1
+            except Exception as e:
+                self.dropped += 1
+                print(f"⚠️ Backplane mesajı gönderilemedi: {e}")
+            finally:
+                self._queue.task_done()
+    
+    async def _heartbeat(self):
+        """Periyodik heartbeat gönderir ve sessiz kalan worker'ları düşürür"""
+        while True:
+            await asyncio.sleep(self.heartbeat)
+            self.publish("heartbeat", **self.info)
+            threshold = time.monotonic() - self.heartbeat * MISSED_HEARTBEATS
+            for worker in [worker for worker, seen in self._peers.items() if seen < threshold]:
+                print(f"⚠️ Backplane worker'ı yanıt vermiyor: {worker}")
+                self._forget_peer(worker)
+
+
+class UnixSocketBackplane(Backplane):
+    """
+    Aynı makinedeki worker'lar için broker gerektirmeyen backplane.
+    
+    Her worker BACKPLANE_SOCKET_DIR içinde worker-<slot>.sock adlı bir
+    datagram soketi açar (slot, boş olan en küçük numaradır) ve mesajları
+    klasördeki diğer soketlere doğrudan gönderir. Ölmüş worker'ların
+    kalan soket dosyaları ilk gönderimde temizlenir.
+    """
+    
+    name = "unix"
+    enabled = True
+    MAX_SLOTS = SEQ_STRIDE
+    
+    def __init__(self, directory: str = None, **kwargs):
+        super().__init__(**kwargs)
+        self.directory = directory or settings.BACKPLANE_SOCKET_DIR
+        self.path: Optional[str] = None
+        self._sock: Optional[socket.socket] = None
+        # Diğer worker'ların soket yolları (yeni worker görülünce veya
+        # heartbeat aralığında bir yeniden taranır)
+        self._paths: Optional[List[str]] = None
+        self._scanned_at = 0.0
+    
+    async def _open(self):
+        os.makedirs(self.directory, exist_ok=True)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sock.setblocking(False)
+        for slot in range(self.MAX_SLOTS):
+            path = os.path.join(self.directory, f"worker-{slot}.sock")
+            if os.path.exists(path) and not self._is_stale(path):
+                continue
+            try:
+                if os.path.exists(path):
+                    os.unlink(path)
+                sock.bind(path)
+            except OSError:
+                # Başka bir worker aynı anda aldı
+                continue
+            self.slot, self.path = slot, path
+            break
+        else:
+            sock.close()
+            raise RuntimeError(f"Backplane soket klasöründe boş slot yok: {self.directory}")
+        
+        self._sock = sock
+        asyncio.get_running_loop().add_reader(sock.fileno(), self._read)
+    
+    async def _close(self):
+        if self._sock is None:
+            return
+        asyncio.get_running_loop().remove_reader(self._sock.fileno())
+        self._sock.close()
+        self._sock = None
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+    
+    async def _send(self, data: bytes):
+        for path in self._peer_paths():
+            try:
+                self._sock.sendto(data, path)
+            except BlockingIOError:
+                # Alıcının tamponu dolu, bu mesaj o worker için atılır
+                self.dropped += 1
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Ölmüş worker'dan kalan soket dosyası
+                self._paths = None
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+    
+    def _peer_joined(self, worker: str):
+        self._paths = None
+    
+    def _peer_paths(self) -> List[str]:
+        """Klasördeki diğer worker soketleri"""
+        now = time.monotonic()
+        if self._paths is None or now - self._scanned_at > self.heartbeat:
+            self._paths = [
+                os.path.join(self.directory, name)
+                for name in os.listdir(self.directory)
+                if name.endswith(".sock") and os.path.join(self.directory, name) != self.path
+            ]
+            self._scanned_at = now
+        return self._paths
+    
+    def _read(self):
+        """Soketteki tüm datagram'ları okur"""
+        while True:
+            try:
+                data = self._sock.recv(settings.BACKPLANE_MAX_MESSAGE_BYTES)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                if e.errno != errno.EAGAIN:
+                    print(f"⚠️ Backplane soketi okunamadı: {e}")
+                return
+            self._receive(data)
+    
+    @staticmethod
+    def _is_stale(path: str) -> bool:
+        """Soket dosyasının sahibi yaşıyor mu? (bağlanılamıyorsa eski dosyadır)"""
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        try:
+            probe.connect(path)
+            return False
+        except OSError:
+            return True
+        finally:
+            probe.close()
+
+
+class BrokerClient:
+    """
+    Harici pub/sub broker adaptörü arayüzü (Redis, NATS vb.).
+    
+    BrokerBackplane sadece bu beş metodu kullanır; yeni bir broker
+    eklemek için bu sınıftan türetmek yeterlidir.
+    """
+    
+    async def connect(self):
+        """Broker'a bağlanır"""
+        raise NotImplementedError
+    
+    async def publish(self, channel: str, data: bytes):
+        """Kanala mesaj yayınlar"""
+        raise NotImplementedError
+    
+    async def subscribe(self, channel: str, callback: Callable[[bytes], None]):
+        """Kanala abone olur; gelen her mesaj için callback(data) çağrılır"""
+        raise NotImplementedError
+    
+    async def incr(self, key: str) -> int:
+        """Broker'daki sayacı atomik olarak artırır ve yeni değeri döner"""
+        raise NotImplementedError
+    
+    async def close(self):
+        """Bağlantıyı kapatır"""
+        raise NotImplementedError
+
+
+class MemoryBroker(BrokerClient):
+    """
+    Süreç içi broker: aynı nesneyi paylaşan BrokerBackplane'ler birbirini
+    görür. Testlerde harici broker'ın yerine kullanılır.
+    """
+    
+    def __init__(self):
+        self._subscribers: Dict[str, List[Callable[[bytes], None]]] = {}
+        self._counters: Dict[str, int] = {}
+    
+    async def connect(self):
+        pass
+    
+    async def publish(self, channel: str, data: bytes):
+        loop = asyncio.get_running_loop()
+        for callback in self._subscribers.get(channel, ()):
+            # Gerçek broker gibi asenkron teslim
+            loop.call_soon(callback, data)
+    
+    async def subscribe(self, channel: str, callback: Callable[[bytes], None]):
+        self._subscribers.setdefault(channel, []).append(callback)
+    
+    async def incr(self, key: str) -> int:
+        self._counters[key] = self._counters.get(key, 0) + 1
+        return self._counters[key]
+    
+    async def close(self):
+        self._subscribers.clear()
+
+
+class RedisBroker(BrokerClient):
+    """Redis pub/sub adaptörü (redis paketi kurulu olmalı)"""
+    
+    def __init__(self, url: str = None):
+        if aioredis is None:
+            raise RuntimeError("BACKPLANE=redis için 'redis' paketi kurulu olmalı")
+        self.url = url or settings.BACKPLANE_URL
+        self._client = None
+        self._pubsub = None
+        self._listener: Optional[asyncio.Task] = None
+    
+    async def connect(self):
+        self._client = aioredis.from_url(self.url)
+        self._pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+    
+    async def publish(self, channel: str, data: bytes):
+        await self._client.publish(channel, data)
+    
+    async def subscribe(self, channel: str, callback: Callable[[bytes], None]):
+        await self._pubsub.subscribe(channel)
+        
+        async def listen():
+            async for message in self._pubsub.listen():
+                callback(message["data"])
+        
+        self._listener = asyncio.create_task(listen())
+    
+    async def incr(self, key: str) -> int:
+        return await self._client.incr(key)
+    
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+        if self._pubsub is not None:
+            await self._pubsub.close()
+        if self._client is not None:
+            await self._client.close()
+
+
+class BrokerBackplane(Backplane):
+    """Harici (veya süreç içi) bir broker üzerinden çalışan backplane"""
+    
+    enabled = True
+    
+    def __init__(self, client: BrokerClient, channel: str = None, name: str = "broker", **kwargs):
+        super().__init__(**kwargs)
+        self.client = client
+        self.channel = channel or settings.BACKPLANE_CHANNEL
+        self.name = name
+    
+    async def _open(self):
+        await self.client.connect()
+        # Slot broker'daki ortak sayaçtan atomik olarak alınır: art arda
+        # başlayan SEQ_STRIDE worker'ın hiçbiri aynı slot'u almaz
+        self.slot = (await self.client.incr(f"{self.channel}:slots") - 1) % SEQ_STRIDE
+        await self.client.subscribe(self.channel, self._receive)
+    
+    async def _close(self):
+        await self.client.close()
+    
+    async def _send(self, data: bytes):
+        await self.client.publish(self.channel, data)
+
+
+def create_backplane(kind: str = None) -> Backplane:
+    """
+    BACKPLANE ayarına göre backplane oluşturur.
+    
+    Args:
+        kind: local | unix | redis | memory
+    """
+    kind = (kind or settings.BACKPLANE).lower()
+    if kind == "unix":
+        return UnixSocketBackplane()
+    if kind == "redis":
+        return BrokerBackplane(RedisBroker(), name="redis")
+    if kind == "memory":
+        return BrokerBackplane(MemoryBroker(), name="memory")
+    if kind != "local":
+        raise ValueError(f"Geçersiz backplane: {kind}")
+    return Backplane()
+
+
+# Global singleton instance
+backplane = create_backplane()
@@ -0,0 +1,115 @@
+"""
+DropZone Benchmark - Yoğun Odada Toplu Gönderim
+Saniyede yüzlerce mesaj alan bir odada (sınav öncesi) yayın maliyetini ölçer.
+
+İki mod karşılaştırılır:
+  - immediate: her mesaj her sokete ayrı send_text (BROADCAST_BATCH_THRESHOLD=0)
+  - batched:   eşik aşılınca BROADCAST_BATCH_WINDOW_MS içindeki mesajlar
+               her alıcıya tek bir dizi frame'i olarak gider
+
+Mesajlar sabit hızla üretilir; süre beklemelerle dolduğu için duvar saati
+yerine sürecin CPU süresi ve soketlere yapılan gönderim sayısı raporlanır.
+
+Kullanım (backend klasöründen):
+    python benchmarks/broadcast_batching.py
+"""
+
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import time
+from datetime import datetime
+
+os.environ["DEBUG"] = "False"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from manager import ConnectionManager  # noqa: E402
+from replay import ReplayLog  # noqa: E402
+
+ROOM_ID = "BEN-CH1"
+USERS_IN_ROOM = 50
+MESSAGES_PER_SECOND = 400
+DURATION = 2.0  # saniye
+THRESHOLD = 50
+WINDOW_MS = 20
+
+
+class FakeWebSocket:
+    """Gönderimleri sayan sahte WebSocket"""
+    
+    def __init__(self):
+        self.scope = {"subprotocols": []}
+        self.sends = 0
+    
+    async def accept(self, subprotocol=None):
+        pass
+    
+    async def send_text(self, text: str):
+        self.sends += 1
+    
+    async def close(self, code: int = 1000, reason: str = ""):
+        pass
+
+
+async def run(threshold: int) -> dict:
+    """Odayı doldurur, sabit hızda mesaj yayınlar ve sonuçları döner"""
+    manager = ConnectionManager(queue_size=10000, replay=ReplayLog(), batch_threshold=threshold, batch_window_ms=WINDOW_MS)
+    sockets = [FakeWebSocket() for _ in range(USERS_IN_ROOM)]
+    with contextlib.redirect_stdout(io.StringIO()):
+        for index, websocket in enumerate(sockets):
+            await manager.connect(websocket, ROOM_ID, f"user{index}")
+    await asyncio.sleep(0.05)
+    for websocket in sockets:
+        websocket.sends = 0
+    
+    total = int(MESSAGES_PER_SECOND * DURATION)
+    interval = 1 / MESSAGES_PER_SECOND
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    for index in range(total):
+        await manager.broadcast(ROOM_ID, {
+            "type": "message",
+            "username": f"user{index % USERS_IN_ROOM}",
+            "content": "Bu soru sınavda çıkar mı?",
+            "timestamp": datetime.utcnow().isoformat()
+        })
+        # Sabit hız: bir sonraki mesajın zamanına kadar bekle
+        delay = start + (index + 1) * interval - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+    await asyncio.sleep(0.1)
+    cpu = time.process_time() - cpu_start
+    
+    with contextlib.redirect_stdout(io.StringIO()):
+        for websocket in sockets:
+            manager.disconnect(websocket, ROOM_ID)
+    return {
+        "messages": total,
+        "sends": sum(websocket.sends for websocket in sockets),
+        "cpu": cpu,
+        "saved": manager.batch_frames_saved
+    }
+
+
+def main():
+    print("=" * 60)
+    print("🚀 DropZone Yoğun Oda Toplu Gönderim Benchmark")
+    print(f"  {USERS_IN_ROOM} kullanıcı, {MESSAGES_PER_SECOND} mesaj/s x {DURATION:.0f} s")
+    print(f"  eşik {THRESHOLD} mesaj/s, pencere {WINDOW_MS} ms")
+    print("=" * 60)
+    
+    immediate = asyncio.run(run(0))
+    batched = asyncio.run(run(THRESHOLD))
+    for name, result in (("immediate", immediate), ("batched", batched)):
+        print(
+            f"  {name:<10} {result['sends']:>8,} send   "
+            f"CPU {result['cpu'] * 1000:8.1f} ms   kazanılan frame {result['saved']:,}"
+        )
+    print(f"  gönderim azalması {immediate['sends'] / max(batched['sends'], 1):.1f}x, "
+          f"CPU {immediate['cpu'] / max(batched['cpu'], 1e-9):.2f}x")
+
+
+if __name__ == "__main__":
+    main()
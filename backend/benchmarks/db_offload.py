@@ -0,0 +1,152 @@
+"""
+DropZone Benchmark - DB Offload
+Geçmiş (history) sorguları çalışırken broadcast gecikmesini ölçer.
+
+Üç senaryo karşılaştırılır:
+  - idle:   arka planda sorgu yok
+  - inline: history sorguları event loop üzerinde (eski davranış)
+  - pool:   history sorguları run_db() ile DB thread pool'unda
+
+Kullanım (backend klasöründen):
+    python benchmarks/db_offload.py
+"""
+
+import asyncio
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Geçici veritabanı (gerçek dropzone.db'ye dokunmaz)
+_tmp_dir = tempfile.mkdtemp(prefix="dropzone-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp_dir}/bench.db"
+os.environ["DEBUG"] = "False"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert  # noqa: E402
+
+from database import SessionLocal, engine, run_db, _call_with_session  # noqa: E402
+from manager import ConnectionManager  # noqa: E402
+from models import Message, Room, User, create_all_tables  # noqa: E402
+from routers.chat import _load_history  # noqa: E402
+
+ROOM_ID = "BEN-CH1"
+SEED_MESSAGES = 20000
+HISTORY_LIMIT = 200
+USERS_IN_ROOM = 50
+BROADCASTS = 100
+BROADCAST_INTERVAL = 0.01  # saniye
+HISTORY_WORKERS = 4
+
+
+class FakeWebSocket:
+    """Gönderim gecikmesini kaydeden sahte WebSocket"""
+    
+    def __init__(self, latencies: list):
+        self.latencies = latencies
+        self.scope = {"subprotocols": []}
+    
+    async def accept(self, subprotocol=None):
+        pass
+    
+    async def send_text(self, text: str):
+        message = json.loads(text)
+        if "t" in message:  # welcome/presence frame'leri sayılmaz
+            self.latencies.append(time.perf_counter() - message["t"])
+    
+    async def close(self, code: int = 1000, reason: str = ""):
+        pass
+
+
+def seed_database():
+    """Test odası ve mesajları oluşturur"""
+    create_all_tables(engine)
+    db = SessionLocal()
+    try:
+        db.add(Room(room_id=ROOM_ID, room_name="Benchmark"))
+        db.add(User(username="bench", display_name="bench"))
+        start = datetime.utcnow() - timedelta(days=30)
+        rows = [
+            {
+                "room_id": ROOM_ID,
+                "username": "bench",
+                "message_type": "message",
+                "content": f"Mesaj {i}",
+                "created_at": start + timedelta(seconds=i),
+                "is_deleted": False
+            }
+            for i in range(SEED_MESSAGES)
+        ]
+        db.execute(insert(Message), rows)
+        db.commit()
+    finally:
+        db.close()
+
+
+async def history_load(mode: str, stop: asyncio.Event):
+    """Sürekli history sorgusu çalıştırır"""
+    while not stop.is_set():
+        if mode == "inline":
+            _call_with_session(_load_history, ROOM_ID, HISTORY_LIMIT)
+            await asyncio.sleep(0)
+        else:
+            await run_db(_load_history, ROOM_ID, HISTORY_LIMIT)
+
+
+async def run_scenario(mode: str) -> list:
+    """Tek bir senaryoyu çalıştırır ve gecikmeleri döner"""
+    latencies: list = []
+    # Toplu gönderim kapalı: sadece event loop gecikmesi ölçülür
+    manager = ConnectionManager(queue_size=1000, batch_threshold=0)
+    with contextlib.redirect_stdout(io.StringIO()):  # Bağlantı loglarını gizle
+        for i in range(USERS_IN_ROOM):
+            await manager.connect(FakeWebSocket(latencies), ROOM_ID, f"user{i}")
+    
+    stop = asyncio.Event()
+    workers = []
+    if mode != "idle":
+        workers = [asyncio.create_task(history_load(mode, stop)) for _ in range(HISTORY_WORKERS)]
+    
+    for _ in range(BROADCASTS):
+        await manager.broadcast(ROOM_ID, {"type": "message", "t": time.perf_counter()})
+        await asyncio.sleep(BROADCAST_INTERVAL)
+    
+    stop.set()
+    await asyncio.gather(*workers)
+    await asyncio.sleep(0.05)  # Kuyrukların boşalmasını bekle
+    
+    # Writer task'larını kapat
+    with contextlib.redirect_stdout(io.StringIO()):
+        for connection in list(manager.active_connections[ROOM_ID]):
+            manager.disconnect(connection.websocket, ROOM_ID)
+    await asyncio.sleep(0)
+    return latencies
+
+
+def report(mode: str, latencies: list):
+    """Gecikme istatistiklerini yazdırır (ms)"""
+    latencies = sorted(latencies)
+    p50 = statistics.median(latencies) * 1000
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+    worst = latencies[-1] * 1000
+    print(f"  {mode:<8} p50={p50:8.2f} ms   p99={p99:8.2f} ms   max={worst:8.2f} ms   ({len(latencies)} teslimat)")
+
+
+async def main():
+    print("=" * 60)
+    print("🚀 DropZone DB Offload Benchmark")
+    print(f"  {SEED_MESSAGES} mesaj, {USERS_IN_ROOM} kullanıcı, {HISTORY_WORKERS} paralel history isteği")
+    print("=" * 60)
+    seed_database()
+    
+    for mode in ("idle", "inline", "pool"):
+        report(mode, await run_scenario(mode))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
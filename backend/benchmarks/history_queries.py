@@ -0,0 +1,125 @@
+"""
+DropZone Benchmark - History Sorgu Sayısı
+History sayfası oluşturulurken atılan SQL sorgularını sayar.
+
+Mesajların yarısı dosya mesajı olan bir oda oluşturulur ve history
+yardımcılarının sayfa başına sabit sayıda sorgu attığı doğrulanır
+(dosya bilgisi için mesaj başına ek sorgu = N+1 regresyonu).
+
+Kullanım (backend klasöründen):
+    python benchmarks/history_queries.py
+"""
+
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+# Geçici veritabanı (gerçek dropzone.db'ye dokunmaz)
+_tmp_dir = tempfile.mkdtemp(prefix="dropzone-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp_dir}/bench.db"
+os.environ["DEBUG"] = "False"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event  # noqa: E402
+
+from database import SessionLocal, engine, _call_with_session  # noqa: E402
+from models import File, Message, Room, User, create_all_tables  # noqa: E402
+from routers.chat import _load_history, _load_history_page  # noqa: E402
+
+ROOM_ID = "BEN-QRY"
+SEED_MESSAGES = 200
+PAGE_SIZE = 50
+
+# Sayfa başına beklenen sorgu: oda kontrolü + mesajlar (dosyalar JOIN ile)
+EXPECTED_QUERIES = 2
+
+
+class QueryCounter:
+    """Engine üzerinde çalışan SQL ifadelerini sayar"""
+    
+    def __init__(self):
+        self.count = 0
+    
+    def __enter__(self):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+        return self
+    
+    def __exit__(self, *exc):
+        event.remove(engine, "before_cursor_execute", self._on_execute)
+    
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+
+def seed_database():
+    """Test odası, dosyalar ve mesajları oluşturur (her iki mesajdan biri dosya)"""
+    create_all_tables(engine)
+    db = SessionLocal()
+    try:
+        db.add(Room(room_id=ROOM_ID, room_name="Benchmark"))
+        db.add(User(username="bench", display_name="bench"))
+        start = datetime.utcnow() - timedelta(days=1)
+        for i in range(SEED_MESSAGES):
+            file = None
+            if i % 2:
+                file = File(
+                    room_id=ROOM_ID,
+                    uploader_username="bench",
+                    original_filename=f"notlar-{i}.pdf",
+                    stored_filename=f"{i:08d}.pdf",
+                    file_path=f"uploads/{i:08d}.pdf",
+                    file_url=f"/uploads/{i:08d}.pdf",
+                    file_size=1024 * i,
+                    file_type="application/pdf",
+                    file_extension=".pdf"
+                )
+                db.add(file)
+                db.flush()
+            db.add(Message(
+                room_id=ROOM_ID,
+                username="bench",
+                message_type="file" if file else "message",
+                content=f"Mesaj {i}",
+                file_id=file.id if file else None,
+                created_at=start + timedelta(seconds=i)
+            ))
+        db.commit()
+    finally:
+        db.close()
+
+
+def check(name: str, func, *args) -> bool:
+    """Yardımcıyı çalıştırır, sorgu sayısını ve dosya alanlarını kontrol eder"""
+    with QueryCounter() as counter:
+        messages = _call_with_session(func, ROOM_ID, *args)
+    
+    files = sum(1 for msg in messages if "file_url" in msg)
+    ok = counter.count <= EXPECTED_QUERIES and files == len(messages) // 2
+    status = "✅" if ok else "❌"
+    print(f"  {status} {name:<24} {len(messages)} mesaj, {files} dosya, {counter.count} sorgu")
+    return ok
+
+
+def main():
+    print("=" * 60)
+    print("🚀 DropZone History Sorgu Sayısı")
+    print(f"  {SEED_MESSAGES} mesaj (yarısı dosya), sayfa boyutu {PAGE_SIZE}")
+    print("=" * 60)
+    seed_database()
+    
+    results = [
+        check("_load_history", _load_history, PAGE_SIZE),
+        check("_load_history_page", _load_history_page, PAGE_SIZE, SEED_MESSAGES // 2),
+        check("_load_history_page/after", _load_history_page, PAGE_SIZE, None, 10),
+    ]
+    
+    if not all(results):
+        print(f"❌ Sayfa başına en fazla {EXPECTED_QUERIES} sorgu bekleniyordu")
+        sys.exit(1)
+    print("✅ N+1 yok")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+DropZone Benchmark - Gelen Mesaj Pipeline'ı
+Tek çekirdekte saniyede işlenen WebSocket mesajı sayısını ölçer.
+
+İki pipeline karşılaştırılır:
+  - legacy: json.loads -> validate_websocket_message (if zinciri) ->
+            model_dump() -> json.dumps (eski davranış)
+  - fast:   parse_websocket_frame (ham JSON'dan discriminated union
+            TypeAdapter) -> model_dump_json() (tek serileştirme adımı)
+
+Mesaj karışımı frontend trafiğine benzer: çoğunluğu tipi olmayan
+{"content": ...} mesajları, kalanı typing sinyalleri ve tipli mesajlar.
+
+Kullanım (backend klasöründen):
+    python benchmarks/inbound_pipeline.py
+"""
+
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from schemas import parse_websocket_frame, stamp_websocket_message, validate_websocket_message  # noqa: E402
+
+USERNAME = "bench"
+ROUNDS = 5
+FRAMES = [
+    json.dumps({"content": "Bugünkü ders notu var mı?"}),
+    json.dumps({"content": "Evet, birazdan yüklüyorum"}),
+    json.dumps({"content": "Teşekkürler 🙏"}),
+    json.dumps({"content": "Sınav hangi gün?"}),
+    json.dumps({"content": "Cuma 10:00"}),
+    json.dumps({"content": "Bu soru sınavda çıkar mı?"}),
+    json.dumps({"type": "typing_start", "username": USERNAME}),
+    json.dumps({"type": "typing_stop", "username": USERNAME}),
+    json.dumps({"type": "message", "username": USERNAME, "content": "Tipli mesaj"}),
+    json.dumps({"content": "Tamamdır"}),
+] * 2000
+
+
+def legacy_pipeline(data: str) -> str:
+    """Eski handler: dict'e çöz, doğrula, dict'e geri dök, tekrar serialize et"""
+    message_data = json.loads(data)
+    if "type" in message_data:
+        enriched_message = validate_websocket_message(message_data).model_dump()
+        if not enriched_message.get("timestamp"):
+            enriched_message["timestamp"] = datetime.utcnow().isoformat()
+        enriched_message["username"] = USERNAME
+    else:
+        enriched_message = {
+            "type": "message",
+            "username": USERNAME,
+            "content": message_data.get("content", ""),
+            "timestamp": datetime.utcnow().isoformat()
+        }
+    return json.dumps(enriched_message, ensure_ascii=False)
+
+
+def fast_pipeline(data: str) -> str:
+    """Yeni handler: ham JSON'dan doğrula, modelden tek adımda serialize et"""
+    inbound = parse_websocket_frame(data)
+    stamp_websocket_message(inbound, USERNAME)
+    return inbound.model_dump_json()
+
+
+def measure(pipeline) -> float:
+    """En iyi turdaki mesaj/saniye değerini döner"""
+    best = 0.0
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        for frame in FRAMES:
+            pipeline(frame)
+        elapsed = time.perf_counter() - start
+        best = max(best, len(FRAMES) / elapsed)
+    return best
+
+
+def main():
+    print("=" * 60)
+    print("🚀 DropZone Gelen Mesaj Pipeline Benchmark")
+    print(f"  {len(FRAMES)} frame x {ROUNDS} tur, tek çekirdek")
+    print("=" * 60)
+    
+    # İki pipeline aynı alanları üretmeli
+    for frame in FRAMES[:10]:
+        legacy = json.loads(legacy_pipeline(frame))
+        fast = json.loads(fast_pipeline(frame))
+        legacy.pop("timestamp"), fast.pop("timestamp")
+        assert legacy == fast, (legacy, fast)
+    
+    legacy_rate = measure(legacy_pipeline)
+    fast_rate = measure(fast_pipeline)
+    print(f"  legacy   {legacy_rate:12,.0f} mesaj/s")
+    print(f"  fast     {fast_rate:12,.0f} mesaj/s   ({fast_rate / legacy_rate:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+"""
+In-Memory Cache'ler
+Aktif odaların indeksini ve varlığı doğrulanmış kullanıcıları tutarak sıcak
+yoldaki (mesaj kaydetme, WebSocket bağlantısı, oda kontrolü) tekrar eden
+SELECT'leri önler.
+"""
+
+from collections import OrderedDict
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from backplane import backplane
+from config import settings
+from database import run_db
+from directory import room_directory
+from models import Room
+
+
+class LRUSet:
+    """
+    Boyutu sınırlı, en az kullanılanı atan küme.
+    
+    Write-behind flusher thread'i ve event loop aynı anda eriştiği
+    için işlemler kilit altında yapılır.
+    """
+    
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._items: "OrderedDict[Hashable, None]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return True
+            self.misses += 1
+            return False
+    
+    def __len__(self) -> int:
+        return len(self._items)
+    
+    def add(self, key: Hashable):
+        """Anahtarı ekler, limit aşılırsa en eskisini atar"""
+        with self._lock:
+            self._items[key] = None
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+    
+    def update(self, keys: Iterable[Hashable]):
+        """Birden fazla anahtarı ekler"""
+        for key in keys:
+            self.add(key)
+    
+    def discard(self, key: Hashable):
+        """Anahtarı (varsa) çıkarır"""
+        with self._lock:
+            self._items.pop(key, None)
+    
+    def clear(self):
+        """Tüm anahtarları siler"""
+        with self._lock:
+            self._items.clear()
+    
+    def get_stats(self) -> dict:
+        """Boyut ve isabet istatistiklerini döner"""
+        return {
+            "size": len(self._items),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+class ActiveRoomIndex:
+    """
+    Aktif oda kodları -> oda adı indeksi ve negatif cache.
+    
+    - Açılışta tüm aktif odalarla doldurulur, oda oluşturma/kapatma ile
+      güncel tutulur; WebSocket kabulü ve /rooms/{code}/check veritabanına
+      gitmeden cevaplanır.
+    - Diğer worker'larda oluşturulan odalar backplane'den (room_created)
+      gelir. Yine de indekste olmayan kod (BACKPLANE=local ile birden fazla
+      worker, kaybolan mesaj) bir kez veritabanına sorulur; yoksa
+      ROOM_NEGATIVE_CACHE_TTL_SECONDS boyunca negatif cache'ten
+      cevaplanır (typo / brute-force denemeleri).
+    """
+    
+    def __init__(self, negative_size: int = None, negative_ttl: int = None):
+        self.negative_size = negative_size or settings.ROOM_NEGATIVE_CACHE_SIZE
+        self.negative_ttl = negative_ttl if negative_ttl is not None else settings.ROOM_NEGATIVE_CACHE_TTL_SECONDS
+        self._rooms: Dict[str, str] = {}
+        # Olmayan kod -> son geçerlilik zamanı (monotonic)
+        self._missing: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+    
+    def __contains__(self, room_id: str) -> bool:
+        if room_id in self._rooms:
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+    
+    def __len__(self) -> int:
+        return len(self._rooms)
+    
+    def get_name(self, room_id: str) -> Optional[str]:
+        """Aktif odanın adını döner, indekste yoksa None"""
+        return self._rooms.get(room_id)
+    
+    def add(self, room_id: str, room_name: str = None):
+        """Odayı aktif olarak ekler (negatif cache'ten çıkarır)"""
+        with self._lock:
+            self._rooms[room_id] = room_name or self._rooms.get(room_id) or room_id
+            self._missing.pop(room_id, None)
+    
+    def update(self, rooms: Dict[str, str]):
+        """Birden fazla odayı (kod -> ad) ekler"""
+        for room_id, room_name in rooms.items():
+            self.add(room_id, room_name)
+    
+    def discard(self, room_id: str):
+        """Odayı (varsa) indeksten çıkarır"""
+        with self._lock:
+            self._rooms.pop(room_id, None)
+    
+    def load(self, rooms: Iterable[Tuple[str, str]]):
+        """İndeksi verilen (kod, ad) listesiyle baştan kurar"""
+        with self._lock:
+            self._rooms = {room_id: room_name or room_id for room_id, room_name in rooms}
+            self._missing.clear()
+    
+    def is_missing(self, room_id: str) -> bool:
+        """Kodun yakın zamanda olmadığı doğrulandı mı?"""
+        with self._lock:
+            expires = self._missing.get(room_id)
+            if expires is None:
+                return False
+            if expires < time.monotonic():
+                del self._missing[room_id]
+                return False
+            self.negative_hits += 1
+            return True
+    
+    def mark_missing(self, room_id: str):
+        """Kodu negatif cache'e ekler, limit aşılırsa en eskisini atar"""
+        with self._lock:
+            if room_id in self._rooms:
+                return
+            self._missing[room_id] = time.monotonic() + self.negative_ttl
+            self._missing.move_to_end(room_id)
+            while len(self._missing) > self.negative_size:
+                self._missing.popitem(last=False)
+    
+    def clear(self):
+        """İndeksi ve negatif cache'i boşaltır"""
+        with self._lock:
+            self._rooms.clear()
+            self._missing.clear()
+    
+    def get_stats(self) -> dict:
+        """Boyut ve isabet istatistiklerini döner"""
+        return {
+            "size": len(self._rooms),
+            "negative_size": len(self._missing),
+            "hits": self.hits,
+            "misses": self.misses,
+            "negative_hits": self.negative_hits
+        }
+
+
+# Aktif odaların indeksi (kod -> ad)
+known_rooms = ActiveRoomIndex()
+
+# Veritabanında var olduğu doğrulanmış kullanıcı adları
+known_users = LRUSet(settings.KNOWN_CACHE_SIZE)
+
+
+def register_room(room_id: str, room_name: str):
+    """
+    Yeni oluşturulan odayı indekse ekler ve oda dizinini geçersiz kılar.
+    Diğer worker'lar da backplane üzerinden haberdar edilir.
+    """
+    known_rooms.add(room_id, room_name)
+    room_directory.invalidate()
+    backplane.publish("room_created", room=room_id, name=room_name)
+
+
+def forget_room(room_id: str):
+    """
+    Odayı cache'ten çıkarır ve oda dizinini geçersiz kılar.
+    Toplu UPDATE ile deaktive edilen odalar için elle çağrılmalıdır.
+    Diğer worker'lar da backplane üzerinden haberdar edilir.
+    """
+    known_rooms.discard(room_id)
+    room_directory.invalidate()
+    backplane.publish("room_closed", room=room_id)
+
+
+def _on_remote_room_closed(message: dict):
+    """Diğer worker'da kapatılan odayı bu worker'ın cache'inden çıkarır"""
+    known_rooms.discard(message["room"])
+    room_directory.invalidate()
+
+
+def _on_remote_room_created(message: dict):
+    """Diğer worker'da oluşturulan odayı bu worker'ın indeksine ekler"""
+    known_rooms.add(message["room"], message.get("name"))
+    room_directory.invalidate()
+
+
+backplane.on("room_created", _on_remote_room_created)
+backplane.on("room_closed", _on_remote_room_closed)
+
+
+# ==================== Oda Çözümleme ====================
+
+def _load_active_room_names(db: Session) -> List[Tuple[str, str]]:
+    """Tüm aktif odaların (kod, ad) listesi"""
+    return [tuple(row) for row in db.query(Room.room_id, Room.room_name).filter(Room.is_active == True).all()]
+
+
+def _find_active_room_name(db: Session, room_id: str) -> Optional[str]:
+    """Aktif odanın adını döner, yoksa None"""
+    room = db.query(Room.room_name).filter(Room.room_id == room_id, Room.is_active == True).first()
+    if room is None:
+        return None
+    return room.room_name or room_id
+
+
+async def load_active_rooms() -> int:
+    """
+    Aktif oda indeksini veritabanından doldurur (uygulama açılışında).
+    
+    Returns:
+        int: Yüklenen oda sayısı
+    """
+    known_rooms.load(await run_db(_load_active_room_names))
+    return len(known_rooms)
+
+
+async def resolve_room(room_id: str) -> Optional[str]:
+    """
+    Aktif odanın adını döner, oda yoksa None.
+    İndeks ve negatif cache'ten cevaplanamayan kodlar için tek sorgu atılır.
+    """
+    room_name = known_rooms.get_name(room_id)
+    if room_name is not None:
+        known_rooms.hits += 1
+        return room_name
+    if known_rooms.is_missing(room_id):
+        return None
+    
+    known_rooms.misses += 1
+    room_name = await run_db(_find_active_room_name, room_id)
+    if room_name is None:
+        known_rooms.mark_missing(room_id)
+    else:
+        known_rooms.add(room_id, room_name)
+    return room_name
+
+
+# ==================== ORM Event'leri ====================
+
+@event.listens_for(Room.is_active, "set")
+def _room_active_changed(target: Room, value, oldvalue, initiator):
+    """Oda ORM üzerinden deaktive edildiğinde cache'ten çıkar"""
+    if not value and target.room_id:
+        forget_room(target.room_id)
+
+
+@event.listens_for(Room, "after_delete")
+def _room_deleted(mapper, connection, target: Room):
+    """Oda silindiğinde cache'ten çıkar"""
+    forget_room(target.room_id)
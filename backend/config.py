@@ -26,12 +26,55 @@ class Settings(BaseSettings):
     
     # Veritabanı
     DATABASE_URL: str = "sqlite:///./dropzone.db"
+    DB_THREAD_POOL_SIZE: int = 8  # Blocking DB çağrıları için thread sayısı
+    DB_POOL_SIZE: int = 10  # Havuzda kalıcı tutulan bağlantı sayısı
+    DB_MAX_OVERFLOW: int = 10  # Yoğunlukta açılabilecek ek bağlantı
+    DB_POOL_TIMEOUT: int = 30  # Boş bağlantı bekleme süresi (saniye)
+    DB_POOL_RECYCLE: int = 1800  # Bağlantıları yenileme süresi (saniye)
+    DB_ECHO: bool = False  # SQL sorgularını loga yaz (sadece açıkça istenirse)
+    
+    # SQLite Profili (production: WAL + pragma'lar, default: SQLite varsayılanları)
+    SQLITE_PROFILE: str = "production"
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_CACHE_SIZE: int = -64000  # Negatif değer KB cinsinden (~64MB)
+    SQLITE_MMAP_SIZE: int = 268435456  # 256MB
+    SQLITE_TEMP_STORE: str = "MEMORY"
+    
+    # Mesaj Kalıcılığı (write-behind)
+    MESSAGE_WRITE_MODE: str = "write_behind"  # write_behind | sync
+    MESSAGE_BATCH_SIZE: int = 100
+    MESSAGE_FLUSH_INTERVAL_MS: int = 200
+    MESSAGE_QUEUE_MAX_SIZE: int = 10000
+    MESSAGE_WRITE_RETRIES: int = 3  # Yazılamayan batch'in tekrar deneme sayısı
+    MESSAGE_RETRY_BACKOFF_MS: int = 100  # İlk tekrar öncesi bekleme (her denemede iki katı)
+    KNOWN_CACHE_SIZE: int = 10000  # Doğrulanmış kullanıcı LRU cache boyutu
+    ACTIVITY_FLUSH_INTERVAL_SECONDS: int = 5  # Oda aktivitesi ve oturumların yazılma aralığı
+    ROOM_NEGATIVE_CACHE_SIZE: int = 10000  # Var olmadığı bilinen oda kodu sayısı
+    ROOM_NEGATIVE_CACHE_TTL_SECONDS: int = 30  # Olmayan kod bu süre veritabanına sorulmaz
     
     # Dosya Yükleme
     UPLOAD_DIR: str = "static/uploads"
     MAX_FILE_SIZE: int = 10485760  # 10MB
     ALLOWED_FILE_TYPES: str = ".pdf,.jpg,.jpeg,.png,.gif,.doc,.docx"
     
+    # Oda Geçmişi Buffer'ı (bellekte son mesajlar)
+    HISTORY_BUFFER_SIZE: int = 100  # Oda başına tutulan mesaj sayısı
+    HISTORY_BUFFER_MAX_ROOMS: int = 500  # Bellekte tutulan en fazla oda
+    HISTORY_BUFFER_IDLE_SECONDS: int = 900  # Bu süre dokunulmayan oda atılır
+    
+    # Oda Dizini Cache (/rooms, /rooms/list)
+    ROOM_DIRECTORY_TTL_SECONDS: int = 10  # Mesaj sayaçları için en fazla bu kadar eski snapshot
+    ROOM_DIRECTORY_PAGE_SIZE: int = 50  # /rooms/list varsayılan sayfa boyutu
+    
+    # Oda Yaşam Döngüsü (boşta kalan odaların kapatılması)
+    ROOM_IDLE_TTL_SECONDS: int = 604800  # 7 gün aktivite olmayan oda kapatılır (0 = kapalı)
+    ROOM_LIFECYCLE_INTERVAL_SECONDS: int = 300  # Temizlik aralığı
+    
+    # Oda Kodları
+    ROOM_CODE_BLOCK_SIZE: int = 100  # Veritabanından tek seferde rezerve edilen kod sayısı
+    
     # CORS
     CORS_ORIGINS: str = "http://localhost:5173,http://localhost:3000"
     
@@ -42,8 +85,41 @@ class Settings(BaseSettings):
     
     # WebSocket
     WS_MESSAGE_QUEUE_SIZE: int = 100
+    WS_QUEUE_OVERFLOW_POLICY: str = "drop_oldest"  # drop_oldest | drop_newest | disconnect
+    WS_MSGPACK_ENABLED: bool = True  # "dropzone.msgpack" alt protokolü (msgpack kuruluysa)
     WS_MAX_CONNECTIONS_PER_ROOM: int = 50
     
+    # Yoğun Odalarda Toplu Gönderim (saniyede eşikten fazla frame -> pencere boyunca biriktir)
+    BROADCAST_BATCH_THRESHOLD: int = 50  # frame/saniye, 0 = kapalı
+    BROADCAST_BATCH_WINDOW_MS: int = 20
+    
+    # Yazıyor Göstergeleri (sunucuda toplanıp aralıklarla gönderilir)
+    TYPING_BROADCAST_INTERVAL_MS: int = 500  # Toplu "typing" frame gönderim aralığı
+    TYPING_TIMEOUT_SECONDS: float = 5.0  # Sinyal yenilenmezse kullanıcı listeden düşer
+    
+    # Yeniden Bağlanma Replay Log'u (resume_from ile kaçırılan frame'ler)
+    REPLAY_LOG_SIZE: int = 100  # Oda başına tutulan son frame sayısı
+    REPLAY_LOG_MAX_ROOMS: int = 500  # En fazla kaç odanın log'u tutulur
+    REPLAY_LOG_IDLE_SECONDS: int = 900  # Bu süre yayın olmayan odanın log'u atılır
+    LEAVE_GRACE_SECONDS: float = 30.0  # Kopan bağlantının leave mesajı bu süre bekletilir (resume ile gelirse atılır)
+    
+    # Katılma (welcome frame'inde gönderilen son mesaj sayısı)
+    WELCOME_HISTORY_SIZE: int = 50
+    
+    # Worker'lar Arası Backplane (uvicorn --workers N ile çalışırken)
+    BACKPLANE: str = "local"  # local | unix | redis | memory
+    BACKPLANE_SOCKET_DIR: str = "/tmp/dropzone-backplane"  # unix: worker soketlerinin klasörü
+    BACKPLANE_URL: str = "redis://localhost:6379/0"  # redis: broker adresi
+    BACKPLANE_CHANNEL: str = "dropzone"
+    BACKPLANE_HEARTBEAT_SECONDS: float = 2.0  # 3 heartbeat boyunca sessiz kalan worker düşer
+    BACKPLANE_QUEUE_SIZE: int = 10000  # Gönderilmeyi bekleyen en fazla mesaj
+    BACKPLANE_MAX_MESSAGE_BYTES: int = 262144
+    
+    # Oda Yakınlığı: her oda tek worker'a ait, diğerleri "redirect" ile yönlendirir
+    ROOM_AFFINITY: bool = False
+    AFFINITY_WORKER_URL: str = "ws://localhost:8000"  # Bu worker'ın istemcilerin bağlanacağı adresi
+    AFFINITY_VIRTUAL_NODES: int = 160  # Worker başına hash halkasındaki sanal düğüm
+    
     # Loglama
     LOG_LEVEL: str = "INFO"
     LOG_FILE: str = "logs/dropzone.log"
@@ -3,35 +3,107 @@ Database Connection ve Session Yönetimi
 SQLAlchemy Engine, SessionLocal ve bağlantı yönetimi
 """
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, Session
-from sqlalchemy.pool import StaticPool
-from typing import Generator
+from sqlalchemy.pool import QueuePool, StaticPool
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Generator, TypeVar
 from config import settings
+import asyncio
+import functools
 import os
 
+T = TypeVar("T")
+
 # Veritabanı dizinini oluştur (SQLite için)
 if settings.DATABASE_URL.startswith("sqlite"):
     db_dir = os.path.dirname(settings.DATABASE_URL.replace("sqlite:///", ""))
     if db_dir and not os.path.exists(db_dir):
         os.makedirs(db_dir, exist_ok=True)
 
+# Bağlantı havuzu ayarları
+# Session'lar bağlantı başına değil iş birimi başına açıldığı için (run_db,
+# write-behind flusher) binlerce WebSocket birkaç düzine bağlantıyla çalışır.
+POOL_OPTIONS = {
+    "poolclass": QueuePool,
+    "pool_size": settings.DB_POOL_SIZE,
+    "max_overflow": settings.DB_MAX_OVERFLOW,
+    "pool_timeout": settings.DB_POOL_TIMEOUT,
+    "pool_recycle": settings.DB_POOL_RECYCLE,
+}
+
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    Her yeni SQLite bağlantısına production pragma'larını uygular.
+    WAL modu okuyucuların yazıcıyı (ve birbirini) beklemeden çalışmasını sağlar.
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        if not is_memory_db:
+            cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+        cursor.execute(f"PRAGMA cache_size={int(settings.SQLITE_CACHE_SIZE)}")
+        cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+        cursor.execute(f"PRAGMA temp_store={settings.SQLITE_TEMP_STORE}")
+    finally:
+        cursor.close()
+
+
 # SQLAlchemy Engine oluştur
-if settings.DATABASE_URL.startswith("sqlite"):
+# SQL loglama sadece DB_ECHO=True ile açılır (DEBUG'dan bağımsız)
+is_sqlite = settings.DATABASE_URL.startswith("sqlite")
+is_memory_db = is_sqlite and (":memory:" in settings.DATABASE_URL or settings.DATABASE_URL == "sqlite://")
+
+if is_sqlite:
     # SQLite için özel ayarlar
-    engine = create_engine(
-        settings.DATABASE_URL,
-        connect_args={"check_same_thread": False},  # SQLite multi-threading desteği
-        poolclass=StaticPool,  # Geliştirme için basit pool
-        echo=settings.DEBUG  # SQL sorgularını loga yaz (debug modda)
-    )
+    sqlite_connect_args = {
+        "check_same_thread": False,  # SQLite multi-threading desteği
+        "timeout": settings.SQLITE_BUSY_TIMEOUT_MS / 1000
+    }
+    
+    if is_memory_db:
+        # In-memory veritabanı tek bağlantıda yaşar
+        engine = create_engine(
+            settings.DATABASE_URL,
+            connect_args=sqlite_connect_args,
+            poolclass=StaticPool,
+            echo=settings.DB_ECHO
+        )
+        write_engine = engine
+    else:
+        # Okuma havuzu: WAL sayesinde birden fazla eşzamanlı okuyucu
+        engine = create_engine(
+            settings.DATABASE_URL,
+            connect_args=sqlite_connect_args,
+            **POOL_OPTIONS,
+            echo=settings.DB_ECHO
+        )
+        # Yazma havuzu: SQLite tek yazıcıya izin verir, yazmalar
+        # SQLITE_BUSY yerine bu tek bağlantılık havuzda sıraya girer
+        write_engine = create_engine(
+            settings.DATABASE_URL,
+            connect_args=sqlite_connect_args,
+            poolclass=QueuePool,
+            pool_size=1,
+            max_overflow=0,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            echo=settings.DB_ECHO
+        )
+    
+    if settings.SQLITE_PROFILE == "production":
+        for sqlite_engine in {engine, write_engine}:
+            event.listen(sqlite_engine, "connect", apply_sqlite_pragmas)
 else:
     # PostgreSQL veya diğer veritabanları için
     engine = create_engine(
         settings.DATABASE_URL,
         pool_pre_ping=True,  # Bağlantı kontrolü
-        echo=settings.DEBUG
+        **POOL_OPTIONS,
+        echo=settings.DB_ECHO
     )
+    write_engine = engine
 
 # Session Factory
 SessionLocal = sessionmaker(
@@ -40,6 +112,74 @@ SessionLocal = sessionmaker(
     bind=engine
 )
 
+# Yazma işleri için Session Factory (SQLite dışında aynı engine)
+WriteSessionLocal = sessionmaker(
+    autocommit=False,
+    autoflush=False,
+    bind=write_engine
+)
+
+
+# ==================== Async Erişim (Thread Pool) ====================
+
+# Senkron ORM çağrıları için sınırlı thread pool.
+# Async handler'lar sorguları burada çalıştırır, event loop bloklanmaz.
+# Thread sayısı havuz kapasitesini aşmaz, böylece hiçbir thread bağlantı beklemez.
+DB_WORKERS = min(settings.DB_THREAD_POOL_SIZE, settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW)
+db_executor = ThreadPoolExecutor(
+    max_workers=DB_WORKERS,
+    thread_name_prefix="dropzone-db"
+)
+
+
+async def run_in_db_thread(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Blocking bir fonksiyonu DB thread pool'unda çalıştırır.
+    
+    Args:
+        func: Çalıştırılacak senkron fonksiyon
+    
+    Returns:
+        Fonksiyonun dönüş değeri
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(db_executor, functools.partial(func, *args, **kwargs))
+
+
+def _call_with_session(func: Callable[..., T], *args: Any, write: bool = False, **kwargs: Any) -> T:
+    """Yeni bir session açar, func(db, ...) çağırır ve session'ı kapatır"""
+    with DatabaseSession(write=write) as db:
+        return func(db, *args, **kwargs)
+
+
+async def run_db(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Veritabanı işini kendi session'ı ile DB thread pool'unda çalıştırır.
+    Router'lardaki tüm sorgular bu yolla yapılır:
+    
+    def _load_room(db: Session, code: str):
+        return db.query(Room).filter(Room.room_id == code).first()
+    
+    room = await run_db(_load_room, code)
+    
+    Dönen ORM nesneleri session kapandıktan sonra kullanılacağı için
+    lazy-load gerektiren alanlar fonksiyon içinde okunmalıdır.
+    """
+    return await run_in_db_thread(_call_with_session, func, *args, **kwargs)
+
+
+async def run_db_write(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    run_db() ile aynı, ancak yazma session'ı kullanır.
+    SQLite'ta tüm yazmalar tek yazıcı bağlantısında sıraya girer.
+    """
+    return await run_in_db_thread(_call_with_session, func, *args, write=True, **kwargs)
+
+
+def shutdown_db_executor():
+    """DB thread pool'unu kapatır (uygulama kapanışında)"""
+    db_executor.shutdown(wait=True)
+
 
 # ==================== Dependency Injection ====================
 
@@ -52,6 +192,10 @@ def get_db() -> Generator[Session, None, None]:
     def get_messages(db: Session = Depends(get_db)):
         messages = db.query(Message).all()
         return messages
+    
+    ⚠️ WebSocket endpoint'lerinde kullanmayın: session (ve havuzdan alınan
+    bağlantı) bağlantı süresince açık kalır. Bunun yerine run_db() ile
+    her iş birimi için kısa ömürlü session açın.
     """
     db = SessionLocal()
     try:
@@ -129,10 +273,30 @@ def get_db_info() -> dict:
         "database_type": settings.DATABASE_URL.split(":")[0],
         "tables_count": len(tables),
         "tables": tables,
-        "is_connected": check_db_connection()
+        "is_connected": check_db_connection(),
+        "pool": get_pool_status()
     }
 
 
+def get_pool_status() -> dict:
+    """
+    Bağlantı havuzunun anlık durumunu döner
+    
+    Returns:
+        dict: Havuz tipi, boyut ve kullanımdaki bağlantı sayısı
+    """
+    pool = engine.pool
+    status = {"type": type(pool).__name__, "threads": DB_WORKERS, "separate_writer": write_engine is not engine}
+    if isinstance(pool, QueuePool):
+        status.update({
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "max_overflow": settings.DB_MAX_OVERFLOW
+        })
+    return status
+
+
 # ==================== Context Manager (Advanced Usage) ====================
 
 class DatabaseSession:
@@ -143,10 +307,15 @@ class DatabaseSession:
     with DatabaseSession() as db:
         user = db.query(User).first()
         print(user)
+    
+    Yazma işleri için DatabaseSession(write=True) kullanılır.
     """
     
+    def __init__(self, write: bool = False):
+        self.write = write
+    
     def __enter__(self) -> Session:
-        self.db = SessionLocal()
+        self.db = WriteSessionLocal() if self.write else SessionLocal()
         return self.db
     
     def __exit__(self, exc_type, exc_val, exc_tb):
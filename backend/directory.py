@@ -0,0 +1,202 @@
+"""
+Oda Dizini Cache'i
+/rooms ve /rooms/list için aktif oda listesinin bellekteki snapshot'ı.
+
+Snapshot oda oluşturma/kapatma olaylarında ve katılım/ayrılma (presence)
+değişikliklerinde geçersiz olur; her değişiklikte `version` artar.
+Version'lar replay seq'leri gibi worker'a özgüdür (alt kısmı backplane
+slot'u): başka bir worker'dan alınmış `since` hiçbir zaman eşleşmez.
+Sayfalar serialize edilmiş halde (JSON bytes) cache'lenir, `since` ile
+gelen ve hiçbir şey değişmemiş istekler küçük bir "not modified" cevabı alır.
+"""
+
+from typing import Callable, Dict, List, Optional, Tuple
+import asyncio
+import time
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from backplane import backplane
+from config import settings
+from database import run_db
+from manager import manager
+from models import Room
+from replay import SEQ_STRIDE
+from serialization import dumps
+
+
+# Bir sayfayı endpoint'in cevap formatına çeviren fonksiyon:
+# view(entries, total, version, next_cursor) -> dict
+DirectoryView = Callable[[List[dict], int, int, Optional[str]], dict]
+
+# Version başına tutulan en fazla serialize sayfa
+MAX_CACHED_PAGES = 256
+
+
+def _load_directory_rows(db: Session) -> List[dict]:
+    """Aktif odaları (en yeni önce) dict listesi olarak döner"""
+    rooms = db.execute(
+        select(
+            Room.room_id,
+            Room.room_name,
+            Room.description,
+            Room.created_at,
+            Room.last_activity,
+            Room.message_count,
+            Room.last_message_at
+        )
+        .where(Room.is_active == True)
+        .order_by(Room.created_at.desc(), Room.id.desc())
+    ).all()
+    return [
+        {
+            "room_id": room.room_id,
+            "room_name": room.room_name or room.room_id,
+            "description": room.description,
+            "created_at": room.created_at.isoformat(),
+            "last_activity": room.last_activity.isoformat() if room.last_activity else None,
+            "message_count": room.message_count,
+            "last_message_at": room.last_message_at.isoformat() if room.last_message_at else None
+        }
+        for room in rooms
+    ]
+
+
+class RoomDirectory:
+    """
+    Aktif oda listesinin version'lı snapshot'ı.
+    
+    - Veritabanı satırları invalidate() çağrılana veya TTL (mesaj
+      sayaçlarının tazeliği için) dolana kadar yeniden okunmaz.
+    - Aktif kullanıcılar manager'dan alınır; manager.presence_version
+      değiştiğinde sadece bellekteki girişler yeniden oluşturulur.
+    - Sayfalama oda kodu cursor'ı ile yapılır (bir sonraki sayfa bu
+      odadan sonra başlar).
+    """
+    
+    def __init__(self, ttl_seconds: int = None, page_size: int = None):
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else settings.ROOM_DIRECTORY_TTL_SECONDS
+        self.page_size = page_size or settings.ROOM_DIRECTORY_PAGE_SIZE
+        self.version = 0
+        
+        self._rows: Optional[List[dict]] = None
+        self._stale = True
+        self._loaded_at = 0.0
+        self._presence_seen = -1
+        self._entries: List[dict] = []
+        self._positions: Dict[str, int] = {}
+        self._pages: Dict[Tuple[str, Optional[str], Optional[int]], bytes] = {}
+        self._lock = asyncio.Lock()
+        
+        # İstatistikler
+        self.reloads = 0
+        self.page_hits = 0
+        self.not_modified = 0
+    
+    def invalidate(self):
+        """
+        Veritabanı snapshot'ını geçersiz kılar (oda oluşturma/kapatma).
+        Thread'lerden (ORM event'leri) de çağrılabilir.
+        """
+        self._stale = True
+    
+    async def page(
+        self,
+        view: DirectoryView,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        since: Optional[int] = None
+    ) -> bytes:
+        """
+        Dizinin bir sayfasını serialize edilmiş JSON olarak döner.
+        
+        Args:
+            view: Sayfayı endpoint formatına çeviren fonksiyon
+            limit: Sayfa boyutu (None ise tüm odalar)
+            cursor: Önceki sayfanın `next_cursor` değeri (oda kodu)
+            since: İstemcinin elindeki version; değişiklik yoksa
+                   sadece {"version", "not_modified"} döner
+        
+        Raises:
+            ValueError: Cursor artık dizinde değilse
+        """
+        await self._refresh()
+        
+        if since is not None and since == self.version:
+            self.not_modified += 1
+            return dumps({"version": self.version, "not_modified": True})
+        
+        key = (view.__name__, cursor, limit)
+        body = self._pages.get(key)
+        if body is not None:
+            self.page_hits += 1
+            return body
+        
+        start = 0
+        if cursor is not None:
+            position = self._positions.get(cursor)
+            if position is None:
+                raise ValueError(f"Geçersiz cursor: {cursor}")
+            start = position + 1
+        
+        end = len(self._entries) if limit is None else start + limit
+        entries = self._entries[start:end]
+        next_cursor = entries[-1]["room_id"] if entries and end < len(self._entries) else None
+        
+        body = dumps(view(entries, len(self._entries), self.version, next_cursor))
+        if len(self._pages) >= MAX_CACHED_PAGES:
+            self._pages.clear()
+        self._pages[key] = body
+        return body
+    
+    def get_stats(self) -> dict:
+        """Snapshot boyutu ve cache istatistiklerini döner"""
+        return {
+            "version": self.version,
+            "rooms": len(self._entries),
+            "cached_pages": len(self._pages),
+            "reloads": self.reloads,
+            "page_hits": self.page_hits,
+            "not_modified": self.not_modified
+        }
+    
+    # ==================== İç Yardımcılar ====================
+    
+    async def _refresh(self):
+        """Gerekirse veritabanından yeniden yükler ve girişleri günceller"""
+        if self._stale or time.monotonic() - self._loaded_at > self.ttl_seconds:
+            async with self._lock:
+                # Beklerken başka bir istek yüklemiş olabilir
+                if self._stale or time.monotonic() - self._loaded_at > self.ttl_seconds:
+                    # Yükleme sırasında gelen invalidate() tekrar işaretler
+                    self._stale = False
+                    rows = await run_db(_load_directory_rows)
+                    self._loaded_at = time.monotonic()
+                    self.reloads += 1
+                    if rows != self._rows:
+                        self._rows = rows
+                        self._rebuild()
+        
+        if manager.presence_version != self._presence_seen:
+            self._rebuild()
+    
+    def _rebuild(self):
+        """Satırları aktif kullanıcılarla birleştirip yeni version oluşturur"""
+        self._presence_seen = manager.presence_version
+        entries = []
+        for row in self._rows or ():
+            entry = dict(row)
+            entry["active_users"] = manager.get_room_users(row["room_id"])
+            entries.append(entry)
+        
+        self._entries = entries
+        self._positions = {entry["room_id"]: index for index, entry in enumerate(entries)}
+        self._pages.clear()
+        # Zamana dayalı başlangıç: yeniden başlayan worker eski version'ları tekrar vermez
+        now = (time.time_ns() // 1_000_000) * SEQ_STRIDE + backplane.slot
+        self.version = max(self.version + SEQ_STRIDE, now)
+
+
+# Global singleton instance
+room_directory = RoomDirectory()
@@ -0,0 +1,215 @@
+"""
+Oda Geçmişi Ring Buffer
+Her aktif oda için son N mesajı (history formatında) bellekte tutar.
+Varsayılan /chat/{room_id}/history istekleri veritabanına gitmeden buradan cevaplanır.
+"""
+
+from collections import OrderedDict, deque
+from itertools import chain, islice
+from datetime import datetime
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+import asyncio
+import time
+
+from config import settings
+
+
+class RoomHistory:
+    """Tek bir odanın son mesajları"""
+    
+    __slots__ = ("messages", "pending", "ready", "last_access")
+    
+    def __init__(self, capacity: int):
+        # Eskiden yeniye, history formatında (message_to_dict) mesajlar
+        self.messages: Deque[dict] = deque(maxlen=capacity)
+        # Buffer doldurulurken (priming) gelen mesajlar
+        self.pending: Optional[List[dict]] = []
+        self.ready = asyncio.Event()
+        self.last_access = time.monotonic()
+
+
+class HistoryBuffer:
+    """
+    Oda bazlı, boyutu sınırlı mesaj geçmişi cache'i.
+    
+    - Oda başına en fazla HISTORY_BUFFER_SIZE mesaj tutulur.
+    - En fazla HISTORY_BUFFER_MAX_ROOMS oda tutulur, en az kullanılan atılır.
+    - HISTORY_BUFFER_IDLE_SECONDS boyunca dokunulmayan (soğuk) odalar atılır.
+    - Bir oda ilk istekte veritabanından doldurulur, sonra mesaj kaydetme
+      yolundan (save_message_to_db) ve diğer worker'lardan aktarılan
+      yayınlardan (manager) güncel tutulur.
+    """
+    
+    def __init__(self, capacity: int = None, max_rooms: int = None, idle_seconds: int = None):
+        self.capacity = capacity or settings.HISTORY_BUFFER_SIZE
+        self.max_rooms = max_rooms or settings.HISTORY_BUFFER_MAX_ROOMS
+        self.idle_seconds = idle_seconds if idle_seconds is not None else settings.HISTORY_BUFFER_IDLE_SECONDS
+        self._rooms: "OrderedDict[str, RoomHistory]" = OrderedDict()
+        
+        # İstatistikler
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def append(self, room_id: str, message: dict):
+        """
+        Odanın buffer'ına yeni mesaj ekler.
+        Buffer'ı olmayan (soğuk) odalar için bir şey yapmaz.
+        """
+        room = self._rooms.get(room_id)
+        if room is None:
+            return
+        if room.pending is not None:
+            room.pending.append(message)
+        else:
+            room.messages.append(message)
+        room.last_access = time.monotonic()
+    
+    def assign_ids(self, room_id: str, ids: Dict[Tuple[str, str], int]):
+        """
+        Diğer worker'da yazılan mesajların veritabanı id'lerini odanın
+        buffer kayıtlarına işler.
+        
+        Args:
+            ids: (kullanıcı adı, timestamp) -> mesaj id'si
+        """
+        room = self._rooms.get(room_id)
+        if room is None:
+            return
+        for message in chain(room.messages, room.pending or ()):
+            if "id" not in message:
+                message_id = ids.get((message["username"], message["timestamp"]))
+                if message_id is not None:
+                    message["id"] = message_id
+    
+    def get(self, room_id: str, limit: int) -> Optional[List[dict]]:
+        """
+        Son `limit` mesajı (eskiden yeniye) döner.
+        Oda buffer'da yoksa veya limit kapasiteyi aşıyorsa None.
+        """
+        room = self._rooms.get(room_id)
+        if room is None or room.pending is not None or limit > self.capacity:
+            self.misses += 1
+            return None
+        
+        self.hits += 1
+        room.last_access = time.monotonic()
+        self._rooms.move_to_end(room_id)
+        if limit <= 0:
+            return []
+        messages = room.messages
+        return list(islice(messages, max(len(messages) - limit, 0), None))
+    
+    def can_serve(self, limit: int) -> bool:
+        """Bu limit buffer'dan karşılanabilir mi?"""
+        return limit <= self.capacity
+    
+    async def prime(
+        self,
+        room_id: str,
+        load: Callable[[datetime], Awaitable[Optional[List[dict]]]]
+    ) -> bool:
+        """
+        Odanın buffer'ını veritabanından doldurur.
+        
+        Args:
+            room_id: Oda ID
+            load: `before` zamanından önceki son mesajları dönen coroutine
+                  fonksiyonu (oda yoksa None döner)
+        
+        Returns:
+            bool: Oda buffer'a alındıysa True
+        """
+        room = self._rooms.get(room_id)
+        if room is not None:
+            # Başka bir istek dolduruyor olabilir, onu bekle
+            await room.ready.wait()
+            return room_id in self._rooms
+        
+        self.evict_idle()
+        room = RoomHistory(self.capacity)
+        self._rooms[room_id] = room
+        self._enforce_room_limit()
+        
+        # Bu andan sonraki mesajlar pending'e düşer, öncekiler veritabanından gelir
+        cutoff = datetime.utcnow()
+        try:
+            rows = await load(cutoff)
+        except BaseException:
+            self._discard(room_id, room)
+            raise
+        
+        if rows is None:
+            # Oda veritabanında yok
+            self._discard(room_id, room)
+            return False
+        
+        room.messages.extend(rows)
+        # Diğer worker'dan aktarılan mesaj, yüklemeden önce yazılmış olabilir
+        loaded = {(row["username"], row["timestamp"]) for row in rows}
+        room.messages.extend(
+            message for message in room.pending
+            if (message["username"], message["timestamp"]) not in loaded
+        )
+        room.pending = None
+        room.ready.set()
+        return room_id in self._rooms
+    
+    def rooms(self) -> List[str]:
+        """Bellekte tutulan odalar"""
+        return list(self._rooms)
+    
+    def drop(self, room_id: str):
+        """Odanın buffer'ını siler (oda kapatıldığında vb.)"""
+        room = self._rooms.pop(room_id, None)
+        if room is not None:
+            room.ready.set()
+    
+    def evict_idle(self) -> int:
+        """
+        Uzun süredir dokunulmayan odaları atar.
+        
+        Returns:
+            int: Atılan oda sayısı
+        """
+        if not self.idle_seconds:
+            return 0
+        threshold = time.monotonic() - self.idle_seconds
+        cold = [
+            room_id for room_id, room in self._rooms.items()
+            if room.pending is None and room.last_access < threshold
+        ]
+        for room_id in cold:
+            self.drop(room_id)
+        self.evictions += len(cold)
+        return len(cold)
+    
+    def get_stats(self) -> dict:
+        """Buffer boyutu ve isabet istatistiklerini döner"""
+        return {
+            "rooms": len(self._rooms),
+            "max_rooms": self.max_rooms,
+            "capacity_per_room": self.capacity,
+            "buffered_messages": sum(len(room.messages) for room in self._rooms.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
+    
+    # ==================== İç Yardımcılar ====================
+    
+    def _enforce_room_limit(self):
+        """Oda limiti aşıldıysa en az kullanılanları atar"""
+        while len(self._rooms) > self.max_rooms:
+            self.drop(next(iter(self._rooms)))
+            self.evictions += 1
+    
+    def _discard(self, room_id: str, room: RoomHistory):
+        """Doldurulamayan odayı (hala aynı kayıtsa) siler"""
+        if self._rooms.get(room_id) is room:
+            del self._rooms[room_id]
+        room.ready.set()
+
+
+# Global singleton instance
+recent_history = HistoryBuffer()
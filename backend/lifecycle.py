@@ -0,0 +1,164 @@
+"""
+Oda Yaşam Döngüsü
+ROOM_IDLE_TTL_SECONDS boyunca aktivite olmayan odaları toplu olarak
+kapatır (Room.is_active = False) ve bellekteki oda durumlarını temizler.
+Böylece aktif oda kümesi, şimdiye kadar açılmış oda sayısından bağımsız
+olarak küçük kalır.
+"""
+
+from datetime import datetime, timedelta
+from typing import Collection, List, Optional
+import asyncio
+
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+
+from cache import forget_room, known_rooms
+from config import settings
+from database import run_db_write
+from history import recent_history
+from manager import ConnectionManager, manager
+from replay import replay_log
+from models import Room
+
+
+def _deactivate_idle_rooms(db: Session, cutoff: datetime, keep: Collection[str]) -> List[str]:
+    """
+    Son aktivitesi cutoff'tan eski odaları tek UPDATE ile kapatır.
+    
+    Args:
+        cutoff: Bu zamandan önce aktivitesi olan odalar kapatılır
+        keep: Bağlı kullanıcısı veya yazılmamış aktivitesi olan odalar
+    
+    Returns:
+        List[str]: Kapatılan oda kodları
+    """
+    query = update(Room)\
+        .where(
+            Room.is_active == True,
+            func.coalesce(Room.last_activity, Room.created_at) < cutoff
+        )\
+        .values(is_active=False)\
+        .returning(Room.room_id)\
+        .execution_options(synchronize_session=False)
+    if keep:
+        query = query.where(Room.room_id.not_in(keep))
+    
+    expired = db.execute(query).scalars().all()
+    db.commit()
+    return expired
+
+
+class RoomLifecycle:
+    """
+    Boşta kalan odaları periyodik olarak kapatan arka plan task'ı.
+    
+    Her ROOM_LIFECYCLE_INTERVAL_SECONDS'ta:
+    - Aktivitesi ROOM_IDLE_TTL_SECONDS'tan eski odalar tek UPDATE ile kapatılır
+      (bağlı kullanıcısı olanlar ve bellekte yeni aktivitesi olanlar hariç),
+    - Kapatılan odalar indeks, oda dizini ve history buffer'dan çıkarılır,
+    - Soğuk history buffer'ları, replay log'ları ve eski aktivite kayıtları atılır.
+    """
+    
+    def __init__(
+        self,
+        connection_manager: ConnectionManager = None,
+        idle_ttl_seconds: int = None,
+        interval_seconds: int = None
+    ):
+        self.manager = connection_manager or manager
+        self.idle_ttl = idle_ttl_seconds if idle_ttl_seconds is not None else settings.ROOM_IDLE_TTL_SECONDS
+        self.interval = interval_seconds or settings.ROOM_LIFECYCLE_INTERVAL_SECONDS
+        self._task: Optional[asyncio.Task] = None
+        
+        # İstatistikler
+        self.sweeps = 0
+        self.expired_rooms = 0
+        self.last_sweep_at: Optional[datetime] = None
+    
+    async def start(self):
+        """Periyodik temizlik task'ını başlatır (TTL 0 ise kapalı)"""
+        if self._task is not None or not self.idle_ttl:
+            return
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Temizlik task'ını durdurur"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+    
+    async def sweep(self) -> List[str]:
+        """
+        Boşta kalan odaları kapatır ve bellekten çıkarır.
+        
+        Returns:
+            List[str]: Kapatılan oda kodları
+        """
+        cutoff = datetime.utcnow() - timedelta(seconds=self.idle_ttl)
+        
+        # Bağlı kullanıcısı olan veya aktivitesi henüz yazılmamış odalar korunur
+        keep = set(self.manager.active_connections)
+        keep.update(
+            room_id for room_id, when in self.manager.room_activity.items() if when >= cutoff
+        )
+        
+        expired = await run_db_write(_deactivate_idle_rooms, cutoff, keep)
+        for room_id in expired:
+            forget_room(room_id)
+            recent_history.drop(room_id)
+            replay_log.drop(room_id)
+        
+        # Eski aktivite kayıtlarını ve soğuk buffer'ları at
+        for room_id in [
+            room_id for room_id, when in self.manager.room_activity.items()
+            if when < cutoff and room_id not in keep
+        ]:
+            del self.manager.room_activity[room_id]
+        recent_history.evict_idle()
+        replay_log.evict_idle(keep=self.manager.active_connections)
+        
+        self.sweeps += 1
+        self.expired_rooms += len(expired)
+        self.last_sweep_at = datetime.utcnow()
+        if expired:
+            print(f"💤 {len(expired)} boşta oda kapatıldı")
+        return expired
+    
+    def get_stats(self) -> dict:
+        """
+        Oda durumlarının sayılarını döner.
+        
+        Returns:
+            dict: live (bağlı kullanıcısı olan), idle (aktif ama boş),
+                  expired (bu süreçte kapatılan) oda sayıları
+        """
+        live = len(self.manager.active_connections)
+        return {
+            "live": live,
+            "idle": max(len(known_rooms) - live, 0),
+            "expired": self.expired_rooms,
+            "idle_ttl_seconds": self.idle_ttl,
+            "sweeps": self.sweeps,
+            "last_sweep_at": self.last_sweep_at.isoformat() if self.last_sweep_at else None
+        }
+    
+    # ==================== İç Yardımcılar ====================
+    
+    async def _run(self):
+        """Periyodik temizlik döngüsü"""
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                print(f"❌ Oda temizliği başarısız: {e}")
+
+
+# Global singleton instance
+room_lifecycle = RoomLifecycle()
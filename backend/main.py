@@ -7,8 +7,18 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from manager import manager
+from backplane import backplane
+from affinity import room_affinity
+from persistence import activity_writer, message_writer
+from cache import known_rooms, known_users, load_active_rooms
+from history import recent_history
+from replay import replay_log
+from directory import room_directory
+from lifecycle import room_lifecycle
+from typing_indicators import typing_indicators
+from serialization import JSON_BACKEND, MSGPACK_AVAILABLE
 from config import settings
-from database import init_db, get_db_info
+from database import init_db, get_db_info, shutdown_db_executor
 from routers import upload, chat, rooms
 from pathlib import Path
 
@@ -49,13 +59,29 @@ async def startup_event():
     table_count = db_info["tables_count"]
     print(f" Veritabani: {db_type}")
     print(f" Tablo Sayisi: {table_count}")
+    # Backplane indeks yüklenmeden açılır: arada oluşturulan odalar kaçmaz
+    await backplane.start()
+    # Worker'ların seq'leri çakışmasın diye slot'u seq'lere ekle
+    replay_log.slot = backplane.slot
+    print(f" Aktif Oda: {await load_active_rooms()}")
     print("=" * 60)
+    await message_writer.start()
+    await activity_writer.start()
+    await room_lifecycle.start()
+    await typing_indicators.start()
 
 @app.on_event("shutdown")
 async def shutdown_event():
     print("\n" + "=" * 60)
     print(" DropZone kapatiliyor...")
     print("=" * 60)
+    await chat.flush_pending_leaves()
+    await typing_indicators.stop()
+    await room_lifecycle.stop()
+    await activity_writer.stop()
+    await message_writer.stop()
+    await backplane.stop()
+    shutdown_db_executor()
 
 @app.get("/")
 async def root():
@@ -66,10 +92,29 @@ async def root():
         "version": settings.APP_VERSION,
         "database": {
             "connected": db_info["is_connected"],
-            "type": db_info["database_type"]
+            "type": db_info["database_type"],
+            "pool": db_info["pool"]
+        },
+        "websocket": manager.get_queue_stats(),
+        "serialization": {
+            "json": JSON_BACKEND,
+            "msgpack": MSGPACK_AVAILABLE and settings.WS_MSGPACK_ENABLED
+        },
+        "persistence": message_writer.get_stats(),
+        "activity": activity_writer.get_stats(),
+        "rooms": room_lifecycle.get_stats(),
+        "typing": typing_indicators.get_stats(),
+        "backplane": backplane.get_stats(),
+        "affinity": room_affinity.get_stats(),
+        "cache": {
+            "known_rooms": known_rooms.get_stats(),
+            "known_users": known_users.get_stats(),
+            "history": recent_history.get_stats(),
+            "replay": replay_log.get_stats(),
+            "room_directory": room_directory.get_stats()
         },
         "endpoints": {
-            "websocket": "/ws/{room_id}?username={username}",
+            "websocket": "/ws/{room_id}?username={username}&resume_from={seq}",
             "rooms": "/rooms",
             "chat_history": "/chat/{room_id}/history",
             "upload": "/upload",
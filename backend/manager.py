@@ -5,8 +5,126 @@ Her oda (room) için ayrı kullanıcı listesi tutar.
 """
 
 from fastapi import WebSocket
-from typing import Dict, List
-import json
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Set, Tuple, Union
+import asyncio
+import time
+
+from affinity import RoomAffinity, room_affinity
+from backplane import Backplane, backplane as default_backplane
+from config import settings
+from history import HistoryBuffer, recent_history
+from replay import ReplayLog, replay_log
+from serialization import Frame, FrameBatch, JSON_SUBPROTOCOL, MSGPACK_AVAILABLE, MSGPACK_SUBPROTOCOL
+
+
+# Kuyruk dolduğunda uygulanabilecek politikalar
+OVERFLOW_DROP_OLDEST = "drop_oldest"
+OVERFLOW_DROP_NEWEST = "drop_newest"
+OVERFLOW_DISCONNECT = "disconnect"
+OVERFLOW_POLICIES = (OVERFLOW_DROP_OLDEST, OVERFLOW_DROP_NEWEST, OVERFLOW_DISCONNECT)
+
+# Oda başka bir worker'a ait (ROOM_AFFINITY), istemci "redirect" frame'indeki adrese bağlanmalı
+REDIRECT_CLOSE_CODE = 4001
+
+
+@dataclass(slots=True, eq=False)
+class ClientConnection:
+    """Tek bir WebSocket bağlantısının kaydı (dict yerine kompakt nesne)"""
+    websocket: WebSocket
+    username: str
+    room_id: str
+    queue: asyncio.Queue
+    writer: Optional[asyncio.Task] = None
+    binary: bool = False  # MessagePack alt protokolü seçildiyse True
+    handed_off: bool = False  # Oda başka bir worker'a geçti, istemci oraya yönlendirildi
+    
+    # Oturum (RoomSession) muhasebesi, ActivityWriter tarafından toplu yazılır
+    joined_at: datetime = field(default_factory=datetime.utcnow)
+    left_at: Optional[datetime] = None
+    session_id: Optional[int] = None  # Yazılan RoomSession satırının id'si
+    session_pending: bool = False  # Oturum satırı henüz yazma sırasına alınmadı
+
+
+class RoomConnections:
+    """
+    Bir odadaki bağlantıların indeksi.
+    
+    Soket kimliği (id(websocket)) ve kullanıcı adına göre O(1) erişim sağlar.
+    Kullanıcı listesi sadece üyelik değiştiğinde yeniden oluşturulur.
+    
+    `version` odanın (diğer worker'lardakiler dahil) kullanıcı kümesi her
+    değiştiğinde ConnectionManager tarafından artırılır; presence diff'leri
+    bu numarayı taşır.
+    
+    Mesaj hızı saniyelik dilimlerle sayılır; yoğun odalarda frame'ler
+    `batch` içinde biriktirilip toplu gönderilir.
+    """
+    
+    __slots__ = ("by_socket", "by_username", "version", "_users", "rate_second", "rate_count", "last_rate", "batch")
+    
+    def __init__(self):
+        # id(websocket) -> ClientConnection (katılma sırası korunur)
+        self.by_socket: Dict[int, ClientConnection] = {}
+        # username -> {id(websocket): ClientConnection} (aynı kullanıcının birden fazla sekmesi olabilir)
+        self.by_username: Dict[str, Dict[int, ClientConnection]] = {}
+        self.version = 0
+        self._users: Optional[List[str]] = None
+        self.rate_second = 0  # Sayılan saniye dilimi (int(monotonic))
+        self.rate_count = 0  # Bu dilimdeki frame sayısı
+        self.last_rate = 0  # Bir önceki dilimdeki frame sayısı
+        # Gönderilmeyi bekleyen (frame, hariç tutulan kullanıcı) listesi
+        self.batch: Optional[List[Tuple[Frame, Optional[str]]]] = None
+    
+    def __len__(self) -> int:
+        return len(self.by_socket)
+    
+    def __iter__(self):
+        return iter(self.by_socket.values())
+    
+    def add(self, connection: ClientConnection) -> bool:
+        """
+        Bağlantıyı indekslere ekler.
+        
+        Returns:
+            bool: Kullanıcının bu odadaki ilk bağlantısıysa True
+        """
+        key = id(connection.websocket)
+        self.by_socket[key] = connection
+        sockets = self.by_username.get(connection.username)
+        if sockets is None:
+            sockets = self.by_username[connection.username] = {}
+        sockets[key] = connection
+        if len(sockets) > 1:
+            return False
+        self._users = None
+        return True
+    
+    def remove(self, websocket: WebSocket) -> Optional[ClientConnection]:
+        """Bağlantıyı indekslerden çıkarır, yoksa None döner"""
+        key = id(websocket)
+        connection = self.by_socket.pop(key, None)
+        if connection is None:
+            return None
+        
+        sockets = self.by_username.get(connection.username)
+        if sockets is not None:
+            sockets.pop(key, None)
+            if not sockets:
+                del self.by_username[connection.username]
+                self._users = None
+        return connection
+    
+    def get(self, websocket: WebSocket) -> Optional[ClientConnection]:
+        """Bağlantı kaydını soket nesnesine göre döner"""
+        return self.by_socket.get(id(websocket))
+    
+    def users(self) -> List[str]:
+        """Odadaki kullanıcı adları (cache'li, değiştirilmemeli)"""
+        if self._users is None:
+            self._users = list(self.by_username)
+        return self._users
 
 
 class ConnectionManager:
@@ -15,40 +133,170 @@ class ConnectionManager:
     
     Yapısı:
     active_connections = {
-        "room_id_1": [
-            {"websocket": ws1, "username": "Ahmet"},
-            {"websocket": ws2, "username": "Mehmet"}
-        ],
-        "room_id_2": [...]
+        "room_id_1": RoomConnections(
+            by_socket={id(ws1): ClientConnection(...), id(ws2): ClientConnection(...)},
+            by_username={"Ahmet": {...}, "Mehmet": {...}}
+        ),
+        "room_id_2": ...
     }
+    
+    Her bağlantının kendi giden mesaj kuyruğu ve bu kuyruğu boşaltan bir
+    writer task'ı vardır. broadcast() sadece kuyruklara ekler, yavaş bir
+    istemci odadaki diğer kullanıcıları bekletmez.
+    
+    Yayınlanan frame'ler oda bazında sıra numarası (seq) alır ve replay
+    log'una girer; yeniden bağlanan istemci kaçırdıklarını buradan alır.
+    
+    Birden fazla worker varsa yayınlar ve her worker'ın oda bazlı
+    kullanıcı kümesi backplane üzerinden diğer worker'lara aktarılır;
+    presence listeleri tüm worker'ların birleşimidir.
+    
+    Saniyede BROADCAST_BATCH_THRESHOLD'dan fazla frame yayınlanan odalarda
+    BROADCAST_BATCH_WINDOW_MS içinde gelen frame'ler her alıcıya tek bir
+    dizi frame'i ([...]) olarak gönderilir; sakin odalar beklemez.
     """
     
-    def __init__(self):
+    def __init__(
+        self,
+        queue_size: int = None,
+        overflow_policy: str = None,
+        replay: ReplayLog = None,
+        backplane: Backplane = None,
+        affinity: RoomAffinity = None,
+        batch_threshold: int = None,
+        batch_window_ms: int = None,
+        history: HistoryBuffer = None
+    ):
         # Oda ID'sine göre WebSocket bağlantılarını tutan dict
-        self.active_connections: Dict[str, List[Dict]] = {}
+        self.active_connections: Dict[str, RoomConnections] = {}
+        self.replay = replay or replay_log
+        self.history = history or recent_history
+        
+        # Diğer worker'lardaki kullanıcılar: oda -> worker -> kullanıcı adları
+        self.remote_users: Dict[str, Dict[str, Set[str]]] = {}
+        # Worker'lar arası presence diff'leri worker başına artan versiyon taşır
+        self.announce_version = 0  # Bu worker'ın yayınladığı son diff
+        self._remote_versions: Dict[str, int] = {}  # worker -> uygulanan son diff
+        self.backplane = backplane or default_backplane
+        self.backplane.on("broadcast", self._on_remote_broadcast)
+        self.backplane.on("presence", self._on_remote_presence)
+        self.backplane.on("presence_diff", self._on_remote_presence_diff)
+        self.backplane.on("presence_sync", self._on_presence_sync)
+        self.backplane.on("history_ids", self._on_remote_history_ids)
+        self.backplane.on_worker_joined(self._share_presence)
+        self.backplane.on_worker_lost(self._forget_worker)
+        self.affinity = affinity or room_affinity
+        self.affinity.on_rebalance(self._hand_off_rooms)
+        
+        self.queue_size = queue_size if queue_size is not None else settings.WS_MESSAGE_QUEUE_SIZE
+        self.overflow_policy = overflow_policy or settings.WS_QUEUE_OVERFLOW_POLICY
+        if self.overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Geçersiz kuyruk politikası: {self.overflow_policy}")
+        
+        # Kuyruk taşması istatistikleri
+        self.dropped_messages = 0
+        self.overflow_disconnects = 0
+        
+        # Yoğun odalarda toplu gönderim (0 = kapalı)
+        self.batch_threshold = batch_threshold if batch_threshold is not None else settings.BROADCAST_BATCH_THRESHOLD
+        self.batch_window = (batch_window_ms if batch_window_ms is not None else settings.BROADCAST_BATCH_WINDOW_MS) / 1000
+        self.batches_sent = 0  # Birden fazla frame içeren toplu gönderimler
+        self.batch_frames_saved = 0  # Toplu gönderim sayesinde gönderilmeyen WebSocket frame'leri
+        
+        # Herhangi bir odada katılım/ayrılma oldukça artar (oda dizini cache'i için)
+        self.presence_version = 0
+        self.presence_resyncs = 0  # İstemcinin boşluk fark edip istediği snapshot sayısı
+        self.remote_presence_resyncs = 0  # Diff boşluğu yüzünden diğer worker'dan istenen snapshot sayısı
+        
+        # Bellekteki aktivite ve oturum kayıtları (ActivityWriter periyodik yazar)
+        self.room_activity: Dict[str, datetime] = {}  # Oda -> son aktivite
+        self._dirty_rooms: Dict[str, datetime] = {}  # Yazılmamış son aktiviteler
+        self._session_opens: List[ClientConnection] = []
+        self._session_closes: List[ClientConnection] = []
     
-    async def connect(self, websocket: WebSocket, room_id: str, username: str):
+    async def connect(
+        self,
+        websocket: WebSocket,
+        room_id: str,
+        username: str,
+        resume_from: Optional[int] = None,
+        welcome: Callable[[bool], dict] = None
+    ) -> bool:
         """
         Yeni bir kullanıcıyı odaya bağlar.
         
+        Bağlantının ilk frame'i "welcome"dır: presence snapshot'ı, odanın
+        güncel seq'i ve `welcome(resumed)` ile üretilen alanlar (oda bilgisi,
+        son mesajlar). Hepsi bağlantı kaydedildiği adımda üretilir, sonraki
+        canlı frame'lerle arada boşluk kalmaz.
+        
         Args:
             websocket: FastAPI WebSocket nesnesi
             room_id: Oda ID'si (örn: "Bilgisayar-101")
             username: Kullanıcının adı
+            resume_from: Yeniden bağlanan istemcinin son gördüğü seq
+            welcome: Welcome frame'ine eklenecek alanları üreten fonksiyon
+        
+        Returns:
+            bool: Kaçırılan frame'ler replay log'undan gönderildiyse True;
+                  boşluk log'dan eskiyse False (istemci welcome'daki mesajlarla
+                  görünümünü sıfırlar)
         """
-        await websocket.accept()
+        subprotocol = self.negotiate_subprotocol(websocket)
+        await websocket.accept(subprotocol=subprotocol)
         
         # Oda yoksa oluştur
-        if room_id not in self.active_connections:
-            self.active_connections[room_id] = []
+        room = self.active_connections.get(room_id)
+        if room is None:
+            room = self.active_connections[room_id] = RoomConnections()
         
-        # Kullanıcıyı odaya ekle
-        self.active_connections[room_id].append({
-            "websocket": websocket,
-            "username": username
-        })
+        # Kullanıcıyı odaya ekle (kendi kuyruğu ve writer task'ı ile)
+        connection = ClientConnection(
+            websocket=websocket,
+            username=username,
+            room_id=room_id,
+            queue=asyncio.Queue(maxsize=self.queue_size),
+            binary=subprotocol == MSGPACK_SUBPROTOCOL
+        )
+        connection.writer = asyncio.create_task(self._writer(connection))
+        # Bekleyen toplu frame'ler yeni bağlantıya gitmemeli (welcome'daki seq'ten eskiler)
+        self._flush_batch(room)
+        joined = room.add(connection)
+        self.presence_version += 1
+        if joined:
+            self._announce(room_id, added=[username])
+            # Başka bir worker'da zaten bağlıysa odanın kullanıcı kümesi değişmedi
+            joined = not self._is_remote_user(room_id, username)
+            if joined:
+                room.version += 1
+        
+        # Kaçırılanlar canlı yayından önce ve aynı adımda kuyruğa girer (boşluk/tekrar olmaz)
+        missed = None
+        if resume_from is not None:
+            missed = self.replay.since(room_id, resume_from, limit=self.queue_size)
+        resumed = missed is not None
+        
+        # Katılana welcome (tam liste dahil), diğerlerine sadece presence farkı
+        self._enqueue_or_drop(connection, Frame({
+            "type": "welcome",
+            **(welcome(resumed) if welcome is not None else {}),
+            "presence": {"version": room.version, "users": self._room_users(room_id, room)},
+            "seq": self.replay.current_seq(room_id),
+            "resumed": resumed,
+            "timestamp": datetime.utcnow().isoformat()
+        }))
+        for frame in missed or ():
+            self._enqueue_or_drop(connection, frame)
+        if joined:
+            self._publish_presence(room, added=[username], skip=connection)
         
-        print(f"✅ {username} -> {room_id} odasına katıldı. Toplam: {len(self.active_connections[room_id])}")
+        # Oturumu aç (veritabanına toplu yazılır)
+        connection.session_pending = True
+        self._session_opens.append(connection)
+        self.touch_room(room_id, connection.joined_at)
+        
+        print(f"✅ {username} -> {room_id} odasına katıldı. Toplam: {len(room)}")
+        return resumed
     
     def disconnect(self, websocket: WebSocket, room_id: str):
         """
@@ -57,23 +305,31 @@ class ConnectionManager:
         Args:
             websocket: Çıkacak WebSocket bağlantısı
             room_id: Oda ID'si
-            
+        
         Returns:
             str: Çıkan kullanıcının adı (varsa)
         """
-        if room_id not in self.active_connections:
+        room = self.active_connections.get(room_id)
+        if room is None:
             return None
         
         # Kullanıcıyı bul ve çıkar
         username = None
-        for connection in self.active_connections[room_id]:
-            if connection["websocket"] == websocket:
-                username = connection["username"]
-                self.active_connections[room_id].remove(connection)
-                break
+        connection = room.remove(websocket)
+        if connection is not None:
+            username = connection.username
+            self._stop_writer(connection)
+            self.presence_version += 1
+            self._close_session(connection)
+            self.touch_room(room_id)
+            if username not in room.by_username:
+                self._announce(room_id, removed=[username])
+                if room and not self._is_remote_user(room_id, username):
+                    room.version += 1
+                    self._publish_presence(room, removed=[username])
         
         # Oda boşaldıysa sil
-        if not self.active_connections[room_id]:
+        if not room:
             del self.active_connections[room_id]
             print(f"🗑️ {room_id} odası boşaldı ve silindi.")
         
@@ -82,53 +338,226 @@ class ConnectionManager:
         
         return username
     
-    async def broadcast(self, room_id: str, message: dict, sender_username: str = None, exclude_sender: bool = False):
+    async def broadcast(
+        self,
+        room_id: str,
+        message: dict,
+        sender_username: str = None,
+        exclude_sender: bool = False,
+        history_entry: dict = None
+    ) -> Optional[int]:
         """
         Odadaki tüm kullanıcılara mesaj gönderir.
         
+        Mesaj her bağlantının kuyruğuna eklenir ve hemen dönülür;
+        asıl gönderimi bağlantının writer task'ı yapar.
+        
         Args:
             room_id: Hedef oda
             message: Gönderilecek mesaj (dict -> JSON'a dönüştürülür)
             sender_username: Gönderen kullanıcı adı (opsiyonel, sistem mesajları için None olabilir)
             exclude_sender: True ise göndericiye mesaj gönderilmez (typing indicator için)
+            history_entry: Mesajın history buffer kaydı (diğer worker'lara aktarılır)
+        
+        Returns:
+            Optional[int]: Frame'in seq'i (oda boşsa None)
+        """
+        if room_id not in self.active_connections and not self.should_relay(room_id):
+            return None
+        return await self.broadcast_frame(room_id, Frame(message), sender_username, exclude_sender, history_entry=history_entry)
+    
+    async def broadcast_frame(
+        self,
+        room_id: str,
+        frame: Frame,
+        sender_username: str = None,
+        exclude_sender: bool = False,
+        replay: bool = True,
+        relay: bool = True,
+        history_entry: dict = None
+    ) -> Optional[int]:
+        """
+        Frame'i odaya gönderir.
+        
+        JSON metni ve MessagePack gövdesi frame başına en fazla bir kez
+        üretilir (doğrulanmış modeller model_dump_json() ile).
+        
+        Args:
+            room_id: Hedef oda
+            frame: Gönderilecek frame
+            sender_username: Gönderen kullanıcı adı
+            exclude_sender: True ise göndericiye mesaj gönderilmez
+            replay: False ise seq almaz ve replay log'una girmez
+                    (typing gibi geçici sinyaller)
+            relay: False ise diğer worker'lara aktarılmaz (her worker'ın
+                   kendi ürettiği frame'ler, örn. birleşik typing listesi)
+            history_entry: Kaydedilen mesajın history buffer kaydı; diğer
+                           worker'lar kendi buffer'larına ekler
+        
+        Returns:
+            Optional[int]: Frame'in seq'i (oda boşsa veya replay=False ise None)
+        """
+        room = self.active_connections.get(room_id)
+        relay = relay and self.should_relay(room_id)
+        if room is None and not relay:
+            return None
+        self.touch_room(room_id)
+        if replay:
+            self.replay.append(room_id, frame)
+        if relay:
+            # Diğer worker'lar kendi seq'lerini verir, seq'siz gövde gider
+            self.backplane.publish(
+                "broadcast",
+                room=room_id,
+                body=frame.body,
+                skip_username=sender_username if exclude_sender else None,
+                replay=replay,
+                # Kaydın seq/id'si sonradan dolar, her worker kendisininkini işler
+                history=None if history_entry is None else {
+                    key: value for key, value in history_entry.items() if key not in ("seq", "id")
+                }
+            )
+        if room is None:
+            # Bu worker'da bağlı kimse yok (diğer worker'lardakilere gitti)
+            return frame.seq
+        
+        # Tüm kullanıcıların kuyruğuna ekle (exclude_sender True ise göndericiye hariç)
+        skip_username = sender_username if exclude_sender else None
+        overflowed = self._deliver(room, frame, skip_username)
+        
+        # Kuyruğu taşan bağlantıları kapat (disconnect politikası)
+        for connection in overflowed:
+            await self._drop_connection(connection)
+        return frame.seq
+    
+    async def send_personal_message(self, websocket: WebSocket, room_id: str, message: dict):
+        """
+        Tek bir bağlantıya mesaj gönderir (hata mesajları vb.).
+        
+        Broadcast ile aynı kuyruğu kullanır, böylece aynı sokete
+        iki task aynı anda yazmaz.
+        
+        Args:
+            websocket: Hedef WebSocket bağlantısı
+            room_id: Oda ID'si
+            message: Gönderilecek mesaj
         """
-        if room_id not in self.active_connections:
+        room = self.active_connections.get(room_id)
+        connection = room.get(websocket) if room is not None else None
+        frame = Frame(message)
+        
+        if connection is None:
+            # Odaya kayıtlı değilse doğrudan gönder
+            await websocket.send_text(frame.text)
             return
         
-        # Mesajı JSON string'e çevir
-        message_json = json.dumps(message, ensure_ascii=False)
+        if not self._enqueue(connection, frame.encode(connection.binary)):
+            await self._drop_connection(connection)
+    
+    def send_presence_snapshot(self, websocket: WebSocket, room_id: str):
+        """
+        Bağlantıya odanın tam kullanıcı listesini gönderir.
         
-        # Tüm kullanıcılara gönder (exclude_sender True ise göndericiye hariç)
-        disconnected = []
-        for connection in self.active_connections[room_id]:
-            # Eğer exclude_sender True ve bu kullanıcı gönderici ise atla
-            if exclude_sender and sender_username and connection["username"] == sender_username:
-                continue
-                
-            try:
-                await connection["websocket"].send_text(message_json)
-            except Exception as e:
-                print(f"⚠️ {connection['username']} kullanıcısına mesaj gönderilemedi: {e}")
-                disconnected.append(connection["websocket"])
+        İstemci diff'lerde versiyon boşluğu fark ettiğinde (örn. kuyruk
+        taşmasıyla atılan frame) "presence_sync" ile bunu ister.
+        """
+        room = self.active_connections.get(room_id)
+        connection = room.get(websocket) if room is not None else None
+        if connection is None:
+            return
+        self.presence_resyncs += 1
+        self._enqueue_or_drop(connection, self._presence_snapshot(room_id, room))
+    
+    def negotiate_subprotocol(self, websocket: WebSocket) -> Optional[str]:
+        """
+        İstemcinin Sec-WebSocket-Protocol listesinden alt protokol seçer.
         
-        # Bağlantısı kopanları temizle
-        for ws in disconnected:
-            self.disconnect(ws, room_id)
+        Returns:
+            Optional[str]: "dropzone.msgpack", "dropzone.json" veya None (düz JSON)
+        """
+        requested = websocket.scope.get("subprotocols") or []
+        if MSGPACK_SUBPROTOCOL in requested and MSGPACK_AVAILABLE and settings.WS_MSGPACK_ENABLED:
+            return MSGPACK_SUBPROTOCOL
+        if JSON_SUBPROTOCOL in requested:
+            return JSON_SUBPROTOCOL
+        return None
+    
+    async def redirect(self, websocket: WebSocket, url: str):
+        """
+        Bağlantıyı odanın sahibi olan worker'a yönlendirir (ROOM_AFFINITY).
+        
+        İstemci "redirect" frame'indeki adrese resume_from ile yeniden bağlanır.
+        """
+        subprotocol = self.negotiate_subprotocol(websocket)
+        await websocket.accept(subprotocol=subprotocol)
+        self.affinity.redirects += 1
+        frame = self._redirect_frame(url)
+        if subprotocol == MSGPACK_SUBPROTOCOL:
+            await websocket.send_bytes(frame.binary)
+        else:
+            await websocket.send_text(frame.text)
+        await websocket.close(code=REDIRECT_CLOSE_CODE, reason="Oda başka bir sunucuda")
+    
+    def should_relay(self, room_id: str) -> bool:
+        """
+        Odanın frame'leri diğer worker'lara aktarılmalı mı?
+        
+        Affinity açıkken oda tek worker'da yaşar; sadece devir sırasında
+        başka worker'da bağlı kalan kullanıcılar varsa aktarılır.
+        """
+        if not self.backplane.enabled:
+            return False
+        return not self.affinity.enabled or room_id in self.remote_users
+    
+    def is_handed_off(self, websocket: WebSocket, room_id: str) -> bool:
+        """Bağlantı odanın yeni sahibine devredildi mi? (ayrılma sayılmaz)"""
+        room = self.active_connections.get(room_id)
+        connection = room.get(websocket) if room is not None else None
+        return connection is not None and connection.handed_off
+    
+    def is_binary(self, websocket: WebSocket, room_id: str) -> bool:
+        """Bağlantı MessagePack alt protokolünü mü kullanıyor?"""
+        room = self.active_connections.get(room_id)
+        connection = room.get(websocket) if room is not None else None
+        return connection is not None and connection.binary
+    
+    def get_queue_stats(self) -> dict:
+        """
+        Giden mesaj kuyruklarının durumunu döner.
+        
+        Returns:
+            dict: Politika, kuyruk boyutu, en dolu kuyruk ve taşma sayaçları
+        """
+        depths = [
+            connection.queue.qsize()
+            for room in self.active_connections.values()
+            for connection in room
+        ]
+        return {
+            "queue_size": self.queue_size,
+            "overflow_policy": self.overflow_policy,
+            "max_queue_depth": max(depths) if depths else 0,
+            "dropped_messages": self.dropped_messages,
+            "overflow_disconnects": self.overflow_disconnects,
+            "presence_resyncs": self.presence_resyncs,
+            "remote_presence_resyncs": self.remote_presence_resyncs,
+            "batch_threshold": self.batch_threshold,
+            "batch_window_ms": int(self.batch_window * 1000),
+            "batches_sent": self.batches_sent,
+            "batch_frames_saved": self.batch_frames_saved
+        }
     
     def get_room_users(self, room_id: str) -> List[str]:
         """
-        Odadaki kullanıcı isimlerini döner.
+        Odadaki kullanıcı isimlerini döner (diğer worker'lardakiler dahil).
         
         Args:
             room_id: Oda ID'si
-            
+        
         Returns:
             List[str]: Kullanıcı isimleri listesi
         """
-        if room_id not in self.active_connections:
-            return []
-        
-        return [conn["username"] for conn in self.active_connections[room_id]]
+        return self._room_users(room_id, self.active_connections.get(room_id))
     
     def get_room_count(self, room_id: str) -> int:
         """
@@ -136,13 +565,408 @@ class ConnectionManager:
         
         Args:
             room_id: Oda ID'si
-            
+        
         Returns:
             int: Kullanıcı sayısı
         """
-        if room_id not in self.active_connections:
+        room = self.active_connections.get(room_id)
+        if room is None:
             return 0
-        return len(self.active_connections[room_id])
+        return len(room)
+    
+    # ==================== Aktivite ve Oturumlar ====================
+    
+    def touch_room(self, room_id: str, when: datetime = None):
+        """Odanın son aktivitesini bellekte günceller"""
+        when = when or datetime.utcnow()
+        self.room_activity[room_id] = when
+        self._dirty_rooms[room_id] = when
+    
+    def take_activity(self) -> Tuple[List[ClientConnection], List[ClientConnection], Dict[str, datetime]]:
+        """
+        Yazılmamış oturum açılış/kapanışlarını ve oda aktivitelerini devreder.
+        
+        Returns:
+            tuple: (açılan oturumlar, kapanan oturumlar, oda -> son aktivite)
+                   Açılanlardan zaten kapanmış olanların left_at'i doludur.
+        """
+        opens, self._session_opens = self._session_opens, []
+        closes, self._session_closes = self._session_closes, []
+        rooms, self._dirty_rooms = self._dirty_rooms, {}
+        for connection in opens:
+            connection.session_pending = False
+        return opens, closes, rooms
+    
+    def restore_activity(
+        self,
+        opens: List[ClientConnection],
+        closes: List[ClientConnection],
+        rooms: Dict[str, datetime]
+    ):
+        """take_activity() ile alınıp yazılamayanları bir sonraki yazım için geri koyar"""
+        for connection in opens:
+            connection.session_pending = True
+        self._session_opens[:0] = opens
+        self._session_closes[:0] = closes
+        for room_id, when in rooms.items():
+            # Bu arada daha yeni aktivite geldiyse o korunur
+            if room_id not in self._dirty_rooms or self._dirty_rooms[room_id] < when:
+                self._dirty_rooms[room_id] = when
+    
+    def end_sessions(self):
+        """Açık tüm oturumları kapanmış olarak işaretler (uygulama kapanışında)"""
+        for room in self.active_connections.values():
+            for connection in room:
+                if connection.left_at is None:
+                    self._close_session(connection)
+    
+    def _close_session(self, connection: ClientConnection):
+        """Oturumu kapatır; satırı henüz sıraya alınmadıysa kapalı olarak yazılır"""
+        if connection.left_at is not None:
+            return
+        connection.left_at = datetime.utcnow()
+        if not connection.session_pending:
+            self._session_closes.append(connection)
+    
+    # ==================== Backplane ====================
+    
+    def _announce(self, room_id: str, added: List[str] = (), removed: List[str] = ()):
+        """
+        Bu worker'ın odadaki kullanıcı kümesindeki değişikliği diğer
+        worker'lara diff olarak bildirir (tam liste sadece _share_presence'ta).
+        """
+        if self.backplane.enabled:
+            self.announce_version += 1
+            self.backplane.publish(
+                "presence_diff",
+                room=room_id,
+                added=list(added),
+                removed=list(removed),
+                version=self.announce_version
+            )
+    
+    def _is_remote_user(self, room_id: str, username: str) -> bool:
+        """Kullanıcı odaya başka bir worker üzerinden bağlı mı?"""
+        return any(username in users for users in self.remote_users.get(room_id, {}).values())
+    
+    def _on_remote_broadcast(self, message: dict):
+        """Diğer worker'da yayınlanan frame'i bu worker'daki bağlantılara iletir"""
+        room_id = message["room"]
+        frame = Frame(text=message["body"])
+        room = self.active_connections.get(room_id)
+        if message["replay"] and (room is not None or self.affinity.owns(room_id)):
+            # Oda burada boş olsa da log'a girer (buraya resume eden eksik almasın)
+            self.replay.append(room_id, frame)
+        entry = message.get("history")
+        if entry is not None:
+            # Bu worker'ın history buffer'ı da güncel kalsın (welcome ve /history)
+            if frame.seq is not None:
+                entry["seq"] = frame.seq
+            self.history.append(room_id, entry)
+        if room is None:
+            return
+        for connection in self._deliver(room, frame, message["skip_username"]):
+            asyncio.create_task(self._drop_connection(connection))
+    
+    def _on_remote_history_ids(self, message: dict):
+        """Diğer worker'da yazılan mesajların id'lerini history buffer'a işler"""
+        self.history.assign_ids(
+            message["room"],
+            {(username, timestamp): message_id for username, timestamp, message_id in message["ids"]}
+        )
+    
+    def _on_remote_presence(self, message: dict):
+        """Diğer worker'ın tüm odalardaki kullanıcı kümelerini (snapshot) uygular"""
+        worker = message["worker"]
+        rooms = message["rooms"]
+        self._remote_versions[worker] = message["version"]
+        for room_id in [room_id for room_id, workers in self.remote_users.items() if worker in workers and room_id not in rooms]:
+            self._set_remote_users(room_id, worker, set())
+        for room_id, users in rooms.items():
+            self._set_remote_users(room_id, worker, set(users))
+    
+    def _on_remote_presence_diff(self, message: dict):
+        """
+        Diğer worker'ın odadaki kullanıcı değişikliğini uygular.
+        
+        Versiyon beklenenden büyükse arada diff kaçırılmıştır (taşıyıcı
+        mesaj attı ya da worker yeni görüldü): diff yine uygulanır ve o
+        worker'dan tam liste istenir. Snapshot'ın kapsadığı eski diff'ler atlanır.
+        """
+        worker = message["worker"]
+        version = message["version"]
+        last = self._remote_versions.get(worker)
+        if last is not None and version <= last:
+            return
+        self._remote_versions[worker] = version
+        if last is None or version != last + 1:
+            self.remote_presence_resyncs += 1
+            self.backplane.publish("presence_sync", target=worker)
+        
+        room_id = message["room"]
+        users = set(self.remote_users.get(room_id, {}).get(worker, ()))
+        users.difference_update(message["removed"])
+        users.update(message["added"])
+        self._set_remote_users(room_id, worker, users)
+    
+    def _on_presence_sync(self, message: dict):
+        """Diff boşluğu fark eden worker'a tam listeyi yeniden gönderir"""
+        if message["target"] == self.backplane.worker_id:
+            self._share_presence(message["worker"])
+    
+    def _share_presence(self, worker: str):
+        """Bu worker'daki tüm odaların kullanıcılarını tek snapshot olarak bildirir"""
+        if self.backplane.enabled:
+            self.backplane.publish(
+                "presence",
+                rooms={room_id: list(room.users()) for room_id, room in self.active_connections.items()},
+                version=self.announce_version
+            )
+    
+    def _forget_worker(self, worker: str):
+        """Kapanan/ölen worker'ın kullanıcılarını odalardan çıkarır"""
+        self._remote_versions.pop(worker, None)
+        for room_id in [room_id for room_id, workers in self.remote_users.items() if worker in workers]:
+            self._set_remote_users(room_id, worker, set())
+    
+    def _hand_off_rooms(self):
+        """Sahibi başka bir worker'a geçen odalardaki bağlantıları oraya yönlendirir"""
+        for room_id, room in self.active_connections.items():
+            url = self.affinity.owner_url(room_id)
+            if url is None:
+                continue
+            frame = self._redirect_frame(url)
+            for connection in room:
+                if connection.handed_off:
+                    continue
+                connection.handed_off = True
+                self._enqueue_or_drop(connection, frame)
+                asyncio.create_task(self._close_after_flush(connection))
+    
+    async def _close_after_flush(self, connection: ClientConnection):
+        """Kuyruktaki frame'ler (redirect dahil) gönderildikten sonra soketi kapatır"""
+        try:
+            await asyncio.wait_for(connection.queue.join(), timeout=1)
+        except asyncio.TimeoutError:
+            pass
+        try:
+            await connection.websocket.close(code=REDIRECT_CLOSE_CODE, reason="Oda başka bir sunucuya taşındı")
+        except Exception:
+            pass
+    
+    @staticmethod
+    def _redirect_frame(url: str) -> Frame:
+        """İstemciyi odanın sahibi olan worker'a yönlendiren frame"""
+        return Frame({
+            "type": "redirect",
+            "url": url,
+            "timestamp": datetime.utcnow().isoformat()
+        })
+    
+    def _set_remote_users(self, room_id: str, worker: str, users: Set[str]):
+        """
+        Bir worker'ın odadaki kullanıcı kümesini değiştirir; birleşik küme
+        değiştiyse bu worker'daki bağlantılara presence diff'i gönderir.
+        """
+        workers = self.remote_users.get(room_id, {})
+        before = set().union(*workers.values())
+        if users:
+            workers[worker] = users
+            self.remote_users[room_id] = workers
+        elif workers.pop(worker, None) is not None and not workers:
+            del self.remote_users[room_id]
+        after = set().union(*workers.values())
+        
+        room = self.active_connections.get(room_id)
+        local = room.by_username if room is not None else {}
+        added = sorted(username for username in after - before if username not in local)
+        removed = sorted(username for username in before - after if username not in local)
+        if not added and not removed:
+            return
+        self.presence_version += 1
+        if room is not None:
+            room.version += 1
+            self._publish_presence(room, added, removed)
+    
+    # ==================== İç Yardımcılar ====================
+    
+    def _deliver(self, room: RoomConnections, frame: Frame, skip_username: str = None) -> List[ClientConnection]:
+        """
+        Yayın frame'ini odaya gönderir; oda yoğunsa toplu gönderim için biriktirir.
+        
+        Returns:
+            List[ClientConnection]: Kuyruğu taşan (kapatılması gereken) bağlantılar
+        """
+        if not self.batch_threshold:
+            return self._fan_out(room, frame, skip_username)
+        
+        now = int(time.monotonic())
+        if now != room.rate_second:
+            room.last_rate = room.rate_count if now == room.rate_second + 1 else 0
+            room.rate_second = now
+            room.rate_count = 0
+        room.rate_count += 1
+        
+        if room.batch is not None:
+            room.batch.append((frame, skip_username))
+            return []
+        if max(room.last_rate, room.rate_count) <= self.batch_threshold:
+            return self._fan_out(room, frame, skip_username)
+        
+        # Yoğun oda: pencere boyunca gelenler tek frame'de gider
+        room.batch = [(frame, skip_username)]
+        asyncio.get_running_loop().call_later(self.batch_window, self._flush_batch, room)
+        return []
+    
+    def _flush_batch(self, room: RoomConnections):
+        """Odada biriken frame'leri her alıcıya tek bir dizi frame'i olarak gönderir"""
+        batch, room.batch = room.batch, None
+        if not batch:
+            return
+        if len(batch) == 1:
+            overflowed = self._fan_out(room, *batch[0])
+        else:
+            self.batches_sent += 1
+            shared = FrameBatch([frame for frame, _ in batch])
+            skipped = {skip_username for _, skip_username in batch if skip_username}
+            overflowed = []
+            for connection in room:
+                if connection.username in skipped:
+                    # exclude_sender ile kendi frame'leri hariç tutulan kullanıcı
+                    frames = [frame for frame, skip_username in batch if skip_username != connection.username]
+                    if not frames:
+                        continue
+                    data = frames[0] if len(frames) == 1 else FrameBatch(frames)
+                else:
+                    frames, data = shared.frames, shared
+                self.batch_frames_saved += len(frames) - 1
+                if not self._enqueue(connection, data.encode(connection.binary)):
+                    overflowed.append(connection)
+        for connection in overflowed:
+            asyncio.create_task(self._drop_connection(connection))
+    
+    def _fan_out(self, room: RoomConnections, frame: Frame, skip_username: str = None, skip: ClientConnection = None) -> List[ClientConnection]:
+        """
+        Frame'i odadaki bağlantıların kuyruklarına ekler.
+        
+        Returns:
+            List[ClientConnection]: Kuyruğu taşan (kapatılması gereken) bağlantılar
+        """
+        overflowed = []
+        for connection in room:
+            if connection is skip or (skip_username and connection.username == skip_username):
+                continue
+            if not self._enqueue(connection, frame.encode(connection.binary)):
+                overflowed.append(connection)
+        return overflowed
+    
+    def _room_users(self, room_id: str, room: Optional[RoomConnections]) -> List[str]:
+        """Bu worker'daki kullanıcılar + diğer worker'lardaki kullanıcılar"""
+        local = room.users() if room is not None else []
+        remote = self.remote_users.get(room_id)
+        if not remote:
+            return local
+        others = set().union(*remote.values()).difference(room.by_username if room is not None else ())
+        return local + sorted(others)
+    
+    def _presence_snapshot(self, room_id: str, room: RoomConnections) -> Frame:
+        """Odanın tam kullanıcı listesi (presence snapshot)"""
+        return Frame({
+            "type": "presence",
+            "version": room.version,
+            "users": self._room_users(room_id, room),
+            "timestamp": datetime.utcnow().isoformat()
+        })
+    
+    def _publish_presence(self, room: RoomConnections, added: List[str] = (), removed: List[str] = (), skip: ClientConnection = None):
+        """
+        Kullanıcı kümesindeki değişikliği odaya diff olarak gönderir.
+        
+        Üyelik değiştiği anda (await olmadan) kuyruklara eklenir, böylece
+        diff'ler her bağlantıya versiyon sırasıyla ulaşır. Bekleyen toplu
+        frame'ler önce gönderilir (sıra korunur).
+        """
+        self._flush_batch(room)
+        frame = Frame({
+            "type": "presence_diff",
+            "version": room.version,
+            "added": list(added),
+            "removed": list(removed),
+            "timestamp": datetime.utcnow().isoformat()
+        })
+        for connection in self._fan_out(room, frame, skip=skip):
+            asyncio.create_task(self._drop_connection(connection))
+    
+    def _enqueue_or_drop(self, connection: ClientConnection, frame: Frame):
+        """Tek bağlantıya frame ekler, kuyruk taşarsa bağlantıyı kapatır"""
+        if not self._enqueue(connection, frame.encode(connection.binary)):
+            asyncio.create_task(self._drop_connection(connection))
+    
+    def _enqueue(self, connection: ClientConnection, data: Union[str, bytes]) -> bool:
+        """
+        Mesajı bağlantının kuyruğuna ekler, doluysa politikayı uygular.
+        
+        Returns:
+            bool: Bağlantı kapatılmalıysa False
+        """
+        queue = connection.queue
+        try:
+            queue.put_nowait(data)
+            return True
+        except asyncio.QueueFull:
+            pass
+        
+        if self.overflow_policy == OVERFLOW_DISCONNECT:
+            return False
+        
+        self.dropped_messages += 1
+        if self.overflow_policy == OVERFLOW_DROP_OLDEST:
+            # En eski mesajı at, yenisini ekle
+            queue.get_nowait()
+            queue.task_done()
+            queue.put_nowait(data)
+        # OVERFLOW_DROP_NEWEST: yeni mesaj sessizce atılır
+        return True
+    
+    async def _drop_connection(self, connection: ClientConnection):
+        """Kuyruğu taşan yavaş istemciyi odadan çıkarır ve soketini kapatır"""
+        if connection.left_at is not None:
+            # Zaten odadan çıkarıldı (aynı anda birden fazla taşma)
+            return
+        self.overflow_disconnects += 1
+        print(f"⚠️ {connection.username} kullanıcısının kuyruğu doldu, bağlantı kapatılıyor.")
+        self.disconnect(connection.websocket, connection.room_id)
+        try:
+            await connection.websocket.close(code=1008, reason="Mesaj kuyruğu doldu")
+        except Exception:
+            pass
+    
+    def _stop_writer(self, connection: ClientConnection):
+        """Bağlantının writer task'ını durdurur"""
+        writer = connection.writer
+        if writer is not None and writer is not asyncio.current_task():
+            writer.cancel()
+    
+    async def _writer(self, connection: ClientConnection):
+        """
+        Bağlantının kuyruğunu sırayla sokete yazan task.
+        Gönderim hatasında bağlantıyı odadan çıkarır.
+        """
+        queue = connection.queue
+        websocket = connection.websocket
+        while True:
+            data = await queue.get()
+            try:
+                if isinstance(data, bytes):
+                    await websocket.send_bytes(data)
+                else:
+                    await websocket.send_text(data)
+            except Exception as e:
+                print(f"⚠️ {connection.username} kullanıcısına mesaj gönderilemedi: {e}")
+                self.disconnect(websocket, connection.room_id)
+                return
+            finally:
+                queue.task_done()
 
 
 # Global singleton instance
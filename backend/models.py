@@ -3,7 +3,7 @@ SQLAlchemy Database Models
 Veritabanı tablolarının ORM tanımları
 """
 
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean, Index, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -23,10 +23,14 @@ class Room(Base):
     room_name = Column(String(200), nullable=True)  # Oda başlığı (örn: "Bilgisayar Programlama 101")
     description = Column(Text, nullable=True)  # Oda açıklaması
     max_users = Column(Integer, default=50)  # Maksimum kullanıcı sayısı
-    is_active = Column(Boolean, default=True)  # Oda aktif mi?
+    is_active = Column(Boolean, default=True, index=True)  # Oda aktif mi?
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     last_activity = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Denormalize sayaçlar (mesaj kaydedilirken persistence tarafından güncellenir)
+    message_count = Column(Integer, default=0, server_default="0", nullable=False)
+    last_message_at = Column(DateTime, nullable=True)  # Son mesajın zamanı
+    
     # İlişkiler
     messages = relationship("Message", back_populates="room", cascade="all, delete-orphan")
     
@@ -65,6 +69,10 @@ class Message(Base):
     Tüm sohbet mesajlarını ve dosya paylaşımlarını kaydeder
     """
     __tablename__ = "messages"
+    __table_args__ = (
+        # History sayfalama (keyset): WHERE room_id = ? AND is_deleted = 0 AND id < ? ORDER BY id
+        Index("ix_messages_room_deleted_id", "room_id", "is_deleted", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     room_id = Column(String(100), ForeignKey("rooms.room_id", ondelete="CASCADE"), nullable=False, index=True)
@@ -96,6 +104,10 @@ class File(Base):
     Yüklenen tüm dosyaların metadata'sını tutar
     """
     __tablename__ = "files"
+    __table_args__ = (
+        # Odanın dosyalarını zamana göre listeleme
+        Index("ix_files_room_uploaded", "room_id", "uploaded_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     room_id = Column(String(100), ForeignKey("rooms.room_id", ondelete="CASCADE"), nullable=False, index=True)
@@ -140,16 +152,92 @@ class RoomSession(Base):
     duration_seconds = Column(Integer, nullable=True)  # Oturum süresi (saniye)
     
     is_active = Column(Boolean, default=True)  # Hala odada mı?
+    worker = Column(String(100), nullable=True, index=True)  # Oturumu tutan worker (backplane worker_id)
     
     def __repr__(self):
         return f"<RoomSession(room='{self.room_id}', user='{self.username}', active={self.is_active})>"
 
 
+class Counter(Base):
+    """
+    Sayaç (Counter) Tablosu
+    İsimli, süreçler arası paylaşılan sayaçlar (örn: oda kodu blok rezervasyonu)
+    """
+    __tablename__ = "counters"
+    
+    name = Column(String(50), primary_key=True)
+    value = Column(Integer, default=0, nullable=False)
+    
+    def __repr__(self):
+        return f"<Counter(name='{self.name}', value={self.value})>"
+
+
+class AppSecret(Base):
+    """
+    Uygulama Anahtarı (AppSecret) Tablosu
+    İlk kullanımda rastgele üretilip saklanan, kuruluma özel anahtarlar
+    (örn: oda kodu permütasyon anahtarı)
+    """
+    __tablename__ = "app_secrets"
+    
+    name = Column(String(50), primary_key=True)
+    value = Column(String(128), nullable=False)  # Hex kodlu anahtar
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f"<AppSecret(name='{self.name}')>"
+
+
 # ==================== Helper Functions ====================
 
 def create_all_tables(engine):
-    """Tüm tabloları oluşturur"""
+    """
+    Tüm tabloları oluşturur.
+    Mevcut tablolara sonradan eklenen index'ler de (yoksa) oluşturulur.
+    """
     Base.metadata.create_all(bind=engine)
+    add_room_counter_columns(engine)
+    add_session_worker_column(engine)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+
+def add_room_counter_columns(engine):
+    """
+    Eski veritabanlarına rooms.message_count / last_message_at sütunlarını
+    ekler ve mevcut mesajlardan bir kereye mahsus doldurur.
+    """
+    columns = {column["name"] for column in inspect(engine).get_columns("rooms")}
+    if "message_count" in columns:
+        return
+    
+    datetime_type = Room.__table__.c.last_message_at.type.compile(dialect=engine.dialect)
+    with engine.begin() as connection:
+        connection.execute(text("ALTER TABLE rooms ADD COLUMN message_count INTEGER NOT NULL DEFAULT 0"))
+        if "last_message_at" not in columns:
+            connection.execute(text(f"ALTER TABLE rooms ADD COLUMN last_message_at {datetime_type}"))
+        backfill_room_counters(connection)
+    print("✅ Oda mesaj sayaçları dolduruldu")
+
+
+def add_session_worker_column(engine):
+    """Eski veritabanlarına room_sessions.worker sütununu ekler"""
+    columns = {column["name"] for column in inspect(engine).get_columns("room_sessions")}
+    if "worker" in columns:
+        return
+    
+    with engine.begin() as connection:
+        connection.execute(text("ALTER TABLE room_sessions ADD COLUMN worker VARCHAR(100)"))
+
+
+def backfill_room_counters(connection):
+    """Oda sayaçlarını messages tablosundan yeniden hesaplar"""
+    connection.execute(text("""
+        UPDATE rooms SET
+            message_count = (SELECT COUNT(*) FROM messages WHERE messages.room_id = rooms.room_id),
+            last_message_at = (SELECT MAX(created_at) FROM messages WHERE messages.room_id = rooms.room_id)
+    """))
 
 
 def drop_all_tables(engine):
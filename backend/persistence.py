@@ -0,0 +1,548 @@
+"""
+Mesaj Kalıcılığı - Write-Behind Pipeline
+WebSocket handler'ları mesajları kuyruğa ekler, arka plandaki flusher
+task'ı bunları toplu (multi-row) INSERT ile veritabanına yazar.
+Oda aktivitesi ve kullanıcı oturumları da (ActivityWriter) periyodik
+olarak toplu yazılır.
+"""
+
+from datetime import datetime
+from typing import Dict, List, Optional, Union
+import asyncio
+
+from sqlalchemy import bindparam, insert, or_, update
+
+from cache import known_rooms, known_users
+from config import settings
+from database import WriteSessionLocal, run_in_db_thread
+from manager import ClientConnection, ConnectionManager, manager
+from models import Message, Room, RoomSession, User
+
+
+# Kalıcılık modları
+WRITE_MODE_WRITE_BEHIND = "write_behind"  # Kuyruğa ekle ve hemen dön
+WRITE_MODE_SYNC = "sync"  # Commit edilene kadar bekle
+WRITE_MODES = (WRITE_MODE_WRITE_BEHIND, WRITE_MODE_SYNC)
+
+
+class PendingMessage:
+    """Kuyrukta bekleyen tek bir mesaj satırı"""
+    
+    __slots__ = ("row", "future", "record")
+    
+    def __init__(self, row: dict, future: Optional[asyncio.Future] = None, record: Optional[dict] = None):
+        self.row = row
+        self.future = future
+        # Satır yazıldığında veritabanı id'si bu dict'e ("id") işlenir
+        self.record = record
+
+
+class MessageWriter:
+    """
+    Mesajları toplu halde veritabanına yazan write-behind kuyruğu.
+    
+    - Batch, MESSAGE_BATCH_SIZE satıra ulaştığında veya ilk satırdan
+      sonra MESSAGE_FLUSH_INTERVAL_MS geçtiğinde yazılır.
+    - Veritabanı işi event loop dışında (DB thread pool) yapılır.
+    - Yazılamayan batch artan beklemeyle tekrar denenir, olmazsa satır
+      satır yazılır (tek bir bozuk satır tüm batch'i kaybettirmez).
+    - "sync" modunda enqueue() satır commit edilene kadar bekler
+      (bekleyen satırlar tek commit'te birlikte yazılır).
+    """
+    
+    def __init__(
+        self,
+        batch_size: int = None,
+        flush_interval_ms: int = None,
+        max_queue_size: int = None,
+        mode: str = None
+    ):
+        self.batch_size = batch_size or settings.MESSAGE_BATCH_SIZE
+        self.flush_interval = (flush_interval_ms if flush_interval_ms is not None else settings.MESSAGE_FLUSH_INTERVAL_MS) / 1000
+        self.max_queue_size = max_queue_size or settings.MESSAGE_QUEUE_MAX_SIZE
+        self.mode = mode or settings.MESSAGE_WRITE_MODE
+        self.retries = settings.MESSAGE_WRITE_RETRIES
+        self.retry_backoff = settings.MESSAGE_RETRY_BACKOFF_MS / 1000
+        if self.mode not in WRITE_MODES:
+            raise ValueError(f"Geçersiz mesaj yazma modu: {self.mode}")
+        
+        self._queue: Optional[asyncio.Queue] = None
+        self._flusher: Optional[asyncio.Task] = None
+        
+        # İstatistikler
+        self.written_messages = 0
+        self.written_batches = 0
+        self.failed_messages = 0
+    
+    async def start(self):
+        """Flusher task'ını başlatır (uygulama açılışında)"""
+        if self._flusher is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._flusher = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Kuyrukta kalan mesajları yazar ve flusher'ı durdurur (kapanışta)"""
+        if self._flusher is None:
+            return
+        await self._queue.put(None)  # Durdurma sinyali
+        await self._flusher
+        self._flusher = None
+    
+    async def enqueue(
+        self,
+        room_id: str,
+        username: str,
+        message_type: str,
+        content: str = None,
+        file_id: int = None,
+        created_at: datetime = None,
+        record: dict = None
+    ):
+        """
+        Mesaj satırını yazma kuyruğuna ekler.
+        
+        Kuyruk doluysa yer açılana kadar bekler (backpressure).
+        "sync" modunda satır commit edilene kadar döner.
+        `record` verilirse satır yazıldığında id'si record["id"] olarak eklenir.
+        """
+        row = {
+            "room_id": room_id,
+            "username": username,
+            "message_type": message_type,
+            "content": content,
+            "file_id": file_id,
+            "created_at": created_at or datetime.utcnow(),
+            "is_deleted": False
+        }
+        
+        if self._flusher is None:
+            # Flusher çalışmıyorsa (örn. script kullanımı) doğrudan yaz
+            ids = await run_in_db_thread(self._write_batch, [row])
+            if record is not None:
+                record["id"] = ids[0]
+            return
+        
+        future = asyncio.get_running_loop().create_future() if self.mode == WRITE_MODE_SYNC else None
+        await self._queue.put(PendingMessage(row, future, record))
+        if future is not None:
+            await future
+    
+    async def wait_flushed(self):
+        """
+        Şu ana kadar kuyruğa eklenen tüm satırlar yazılana kadar bekler.
+        (Buffer'ları veritabanından tutarlı şekilde doldurmak için)
+        """
+        if self._flusher is None:
+            return
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(PendingMessage(None, future))
+        await future
+    
+    def get_stats(self) -> dict:
+        """
+        Kuyruk derinliği ve yazma istatistiklerini döner.
+        
+        Returns:
+            dict: Mod, kuyruk derinliği ve sayaçlar
+        """
+        return {
+            "mode": self.mode,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "batch_size": self.batch_size,
+            "flush_interval_ms": int(self.flush_interval * 1000),
+            "written_messages": self.written_messages,
+            "written_batches": self.written_batches,
+            "failed_messages": self.failed_messages
+        }
+    
+    # ==================== İç Yardımcılar ====================
+    
+    async def _run(self):
+        """Kuyruğu batch'ler halinde boşaltan ana döngü"""
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            
+            # Sync modunda beklemeden, hazır olanları topla (group commit)
+            deadline = loop.time() + (0 if self.mode == WRITE_MODE_SYNC else self.flush_interval)
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            
+            await self._flush(batch)
+        
+        # Kapanış: kuyrukta kalanları da yaz
+        remaining = []
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not None:
+                remaining.append(item)
+        for start in range(0, len(remaining), self.batch_size):
+            await self._flush(remaining[start:start + self.batch_size])
+    
+    async def _flush(self, batch: List[PendingMessage]):
+        """Batch'i thread'de yazar ve bekleyen future'ları sonuçlandırır"""
+        # Satırı olmayan kayıtlar wait_flushed() bariyerleridir
+        written = [pending for pending in batch if pending.row is not None]
+        results = await self._write_with_retry([pending.row for pending in written]) if written else []
+        
+        errors = []
+        relayed: Dict[str, List[list]] = {}  # Diğer worker'ların buffer'ları için oda -> id'ler
+        for pending, result in zip(written, results):
+            if isinstance(result, Exception):
+                errors.append(result)
+                if pending.future is not None and not pending.future.done():
+                    pending.future.set_exception(result)
+            elif pending.record is not None:
+                pending.record["id"] = result
+                if manager.should_relay(pending.row["room_id"]):
+                    relayed.setdefault(pending.row["room_id"], []).append(
+                        [pending.record["username"], pending.record["timestamp"], result]
+                    )
+        
+        if errors:
+            self.failed_messages += len(errors)
+            print(f"❌ {len(errors)} mesaj veritabanına yazılamadı: {errors[0]}")
+        if len(written) > len(errors):
+            self.written_messages += len(written) - len(errors)
+            self.written_batches += 1
+        for room_id, ids in relayed.items():
+            manager.backplane.publish("history_ids", room=room_id, ids=ids)
+        for pending in batch:
+            if pending.future is not None and not pending.future.done():
+                pending.future.set_result(None)
+    
+    async def _write_with_retry(self, rows: List[dict]) -> List[Union[int, Exception]]:
+        """
+        Batch'i yazar; hata olursa MESSAGE_WRITE_RETRIES kez artan
+        beklemeyle (MESSAGE_RETRY_BACKOFF_MS, her denemede iki katı) tekrar dener.
+        Yine yazılamazsa satırlar tek tek yazılır; böylece sadece gerçekten
+        yazılamayan satırlar (örn. bozuk tek bir satır) kaybedilir.
+        
+        Returns:
+            List: Satır sırasıyla mesaj id'si veya satırın yazılamama hatası
+        """
+        delay = self.retry_backoff
+        for attempt in range(self.retries + 1):
+            try:
+                return await run_in_db_thread(self._write_batch, rows)
+            except Exception as e:
+                if attempt == self.retries:
+                    break
+                print(f"⚠️ {len(rows)} mesaj yazılamadı, {int(delay * 1000)} ms sonra tekrar denenecek: {e}")
+                await asyncio.sleep(delay)
+                delay *= 2
+        
+        results: List[Union[int, Exception]] = []
+        for row in rows:
+            try:
+                results.extend(await run_in_db_thread(self._write_batch, [row]))
+            except Exception as e:
+                results.append(e)
+        return results
+    
+    def _write_batch(self, rows: List[dict]) -> List[int]:
+        """
+        Satırları tek transaction'da yazar (thread içinde çalışır).
+        Eksik oda ve anonim kullanıcılar toplu olarak oluşturulur;
+        varlığı daha önce doğrulananlar için sorgu atılmaz.
+        
+        Returns:
+            List[int]: Yazılan mesajların id'leri (satır sırasıyla)
+        """
+        room_ids = {row["room_id"] for row in rows if row["room_id"] not in known_rooms}
+        usernames = {row["username"] for row in rows if row["username"] and row["username"] not in known_users}
+        active_rooms = {}
+        
+        db = WriteSessionLocal()
+        try:
+            # Room var mı kontrol et, yoksa oluştur
+            if room_ids:
+                existing_rooms = {
+                    room.room_id: room for room in
+                    db.query(Room.room_id, Room.room_name, Room.is_active).filter(Room.room_id.in_(room_ids)).all()
+                }
+                for room_id in room_ids - existing_rooms.keys():
+                    db.add(Room(room_id=room_id, room_name=room_id))
+                    active_rooms[room_id] = room_id
+                active_rooms.update(
+                    (room.room_id, room.room_name) for room in existing_rooms.values() if room.is_active
+                )
+            
+            # User var mı kontrol et, yoksa oluştur (anonim kullanıcı)
+            if usernames:
+                existing_users = {
+                    username for (username,) in
+                    db.query(User.username).filter(User.username.in_(usernames)).all()
+                }
+                for username in usernames - existing_users:
+                    db.add(User(username=username, display_name=username, is_anonymous=True))
+            
+            db.flush()
+            
+            # Mesajları tek multi-row INSERT ile kaydet (id'ler RETURNING ile)
+            result = db.execute(
+                insert(Message).returning(Message.id, sort_by_parameter_order=True),
+                rows
+            )
+            ids = result.scalars().all()
+            
+            # Oda sayaçlarını oda başına tek UPDATE ile artır
+            db.connection().execute(
+                update(Room.__table__)
+                .where(Room.room_id == bindparam("target_room"))
+                .values(
+                    message_count=Room.message_count + bindparam("added"),
+                    last_message_at=bindparam("last_at"),
+                    last_activity=bindparam("last_at")
+                ),
+                self._room_counters(rows)
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        
+        # Commit başarılı: doğrulananları cache'e ekle
+        known_rooms.update(active_rooms)
+        known_users.update(usernames)
+        return ids
+    
+    @staticmethod
+    def _room_counters(rows: List[dict]) -> List[dict]:
+        """Batch'teki mesajları oda bazında sayar (UPDATE parametreleri)"""
+        counters = {}
+        for row in rows:
+            counter = counters.get(row["room_id"])
+            if counter is None:
+                counters[row["room_id"]] = {
+                    "target_room": row["room_id"],
+                    "added": 1,
+                    "last_at": row["created_at"]
+                }
+            else:
+                counter["added"] += 1
+                counter["last_at"] = max(counter["last_at"], row["created_at"])
+        return list(counters.values())
+
+
+class ActivityWriter:
+    """
+    ConnectionManager'ın bellekte tuttuğu aktivite ve oturumları yazar.
+    
+    Her ACTIVITY_FLUSH_INTERVAL_SECONDS'ta bir tek transaction'da:
+    - Değişen her oda için bir last_activity UPDATE'i,
+    - Açılan oturumlar için toplu RoomSession INSERT'i,
+    - Kapanan oturumlar için toplu UPDATE (left_at, duration_seconds).
+    
+    Oturum satırları yazan worker'ı taşır; çökmüş bir çalışmadan açık
+    kalan oturumlar kapatılırken canlı worker'ların oturumlarına dokunulmaz.
+    """
+    
+    def __init__(self, connection_manager: ConnectionManager = None, interval_seconds: float = None):
+        self.manager = connection_manager or manager
+        self.backplane = self.manager.backplane
+        self.interval = interval_seconds if interval_seconds is not None else settings.ACTIVITY_FLUSH_INTERVAL_SECONDS
+        self._task: Optional[asyncio.Task] = None
+        self.backplane.on_worker_lost(self._on_worker_lost)
+        
+        # İstatistikler
+        self.flushes = 0
+        self.room_updates = 0
+        self.sessions_opened = 0
+        self.sessions_closed = 0
+        self.failed_flushes = 0
+    
+    async def start(self):
+        """Periyodik yazma task'ını başlatır, yarım kalmış oturumları kapatır"""
+        if self._task is not None:
+            return
+        if not self.backplane.enabled:
+            await self._close_orphaned_sessions()
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Açık oturumları kapatır, kalanları yazar ve task'ı durdurur"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self.manager.end_sessions()
+        await self.flush()
+    
+    async def flush(self):
+        """Bekleyen aktivite ve oturumları yazar"""
+        opens, closes, rooms = self.manager.take_activity()
+        if not (opens or closes or rooms):
+            return
+        
+        open_rows = [
+            {
+                "room_id": connection.room_id,
+                "username": connection.username,
+                "joined_at": connection.joined_at,
+                "left_at": connection.left_at,
+                "duration_seconds": self._duration(connection),
+                "is_active": connection.left_at is None,
+                "worker": self.backplane.worker_id
+            }
+            for connection in opens
+        ]
+        # Açılış satırı yazılamamış oturumların kapanışı atlanır
+        close_rows = [
+            {
+                "session_id": connection.session_id,
+                "left_at": connection.left_at,
+                "duration_seconds": self._duration(connection)
+            }
+            for connection in closes if connection.session_id is not None
+        ]
+        room_rows = [{"target_room": room_id, "activity": when} for room_id, when in rooms.items()]
+        
+        try:
+            if open_rows:
+                # Oturumların kullanıcı satırları (join mesajıyla) önce yazılsın
+                await message_writer.wait_flushed()
+            ids = await run_in_db_thread(self._write, open_rows, close_rows, room_rows)
+        except Exception as e:
+            self.failed_flushes += 1
+            print(f"❌ Oda aktivitesi/oturumlar yazılamadı, bir sonraki yazımda tekrar denenecek: {e}")
+            self.manager.restore_activity(opens, closes, rooms)
+            return
+        
+        for connection, session_id in zip(opens, ids):
+            connection.session_id = session_id
+        self.flushes += 1
+        self.room_updates += len(room_rows)
+        self.sessions_opened += len(open_rows)
+        self.sessions_closed += len(close_rows) + sum(1 for row in open_rows if not row["is_active"])
+    
+    def get_stats(self) -> dict:
+        """Yazma istatistiklerini döner"""
+        return {
+            "interval_seconds": self.interval,
+            "flushes": self.flushes,
+            "room_updates": self.room_updates,
+            "sessions_opened": self.sessions_opened,
+            "sessions_closed": self.sessions_closed,
+            "failed_flushes": self.failed_flushes
+        }
+    
+    # ==================== İç Yardımcılar ====================
+    
+    async def _run(self):
+        """Periyodik yazma döngüsü"""
+        if self.backplane.enabled:
+            # Diğer worker'lar hello'ya hemen heartbeat ile cevap verir;
+            # bir aralık sonra canlı worker listesi bilinir
+            await asyncio.sleep(self.backplane.heartbeat)
+            await self._close_orphaned_sessions()
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+    
+    @staticmethod
+    def _duration(connection: ClientConnection) -> Optional[int]:
+        """Kapanmış oturumun süresi (saniye)"""
+        if connection.left_at is None:
+            return None
+        return int((connection.left_at - connection.joined_at).total_seconds())
+    
+    def _write(self, open_rows: List[dict], close_rows: List[dict], room_rows: List[dict]) -> List[int]:
+        """
+        Aktivite ve oturumları tek transaction'da yazar (thread içinde çalışır).
+        
+        Returns:
+            List[int]: Açılan oturumların RoomSession id'leri (satır sırasıyla)
+        """
+        ids = []
+        db = WriteSessionLocal()
+        try:
+            if open_rows:
+                result = db.execute(
+                    insert(RoomSession).returning(RoomSession.id, sort_by_parameter_order=True),
+                    open_rows
+                )
+                ids = result.scalars().all()
+            
+            connection = db.connection()
+            if close_rows:
+                connection.execute(
+                    update(RoomSession.__table__)
+                    .where(RoomSession.id == bindparam("session_id"))
+                    .values(
+                        left_at=bindparam("left_at"),
+                        duration_seconds=bindparam("duration_seconds"),
+                        is_active=False
+                    ),
+                    close_rows
+                )
+            if room_rows:
+                connection.execute(
+                    update(Room.__table__)
+                    .where(Room.room_id == bindparam("target_room"))
+                    .values(last_activity=bindparam("activity")),
+                    room_rows
+                )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        return ids
+    
+    def _on_worker_lost(self, worker: str):
+        """Düşen worker'ın açık kalan oturumlarını kapatır"""
+        if self._task is not None:
+            asyncio.create_task(self._close_orphaned_sessions())
+    
+    async def _close_orphaned_sessions(self):
+        """Canlı olmayan worker'lardan (çökme vb.) açık kalmış oturumları kapatır"""
+        live = [self.backplane.worker_id, *self.backplane.peers()]
+        try:
+            await run_in_db_thread(self._close_stale_sessions, live)
+        except Exception as e:
+            print(f"❌ Açık kalmış oturumlar kapatılamadı: {e}")
+    
+    def _close_stale_sessions(self, live: List[str]):
+        """Worker'ı `live` içinde olmayan açık oturumları kapatır (thread içinde çalışır)"""
+        db = WriteSessionLocal()
+        try:
+            db.query(RoomSession)\
+                .filter(
+                    RoomSession.is_active == True,
+                    or_(RoomSession.worker.is_(None), RoomSession.worker.notin_(live))
+                )\
+                .update({RoomSession.is_active: False}, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+
+# Global singleton instances
+message_writer = MessageWriter()
+activity_writer = ActivityWriter()
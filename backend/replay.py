@@ -0,0 +1,175 @@
+"""
+Yeniden Bağlanma Replay Log'u
+Odaya yayınlanan her frame'e oda bazında artan bir sıra numarası (seq)
+verir ve son REPLAY_LOG_SIZE frame'i bellekte tutar. Yeniden bağlanan
+istemci son gördüğü seq'i `resume_from` ile gönderir; kaçırdığı frame'ler
+buradan (zaten serileştirilmiş halleriyle) tekrar gönderilir.
+
+Birden fazla worker'da her worker kendi seq'lerini verir. Seq'ler
+SEQ_STRIDE adımla artar ve alt kısmı worker'ın backplane slot'udur; başka
+bir worker'ın verdiği seq ile yeniden bağlanan istemci replay yerine
+resync alır (numaralar hiçbir zaman çakışmaz).
+"""
+
+from collections import OrderedDict, deque
+from typing import Deque, List, Optional
+import time
+
+from config import settings
+from serialization import Frame
+
+
+# Ardışık iki seq arasındaki fark (= en fazla worker sayısı)
+SEQ_STRIDE = 256
+
+
+class RoomLog:
+    """Tek bir odanın son frame'leri"""
+    
+    __slots__ = ("seq", "frames", "last_access")
+    
+    def __init__(self, capacity: int, slot: int = 0):
+        # Seq milisaniye cinsinden oluşturulma zamanından başlar: log atılıp
+        # yeniden oluşturulsa (veya süreç yeniden başlasa) bile eski
+        # numaralar tekrar kullanılmaz, eski resume_from değerleri resync alır
+        self.seq = (time.time_ns() // 1_000_000) * SEQ_STRIDE + slot
+        # Eskiden yeniye, SEQ_STRIDE aralıklı seq'li frame'ler
+        self.frames: Deque[Frame] = deque(maxlen=capacity)
+        self.last_access = time.monotonic()
+    
+    @property
+    def first_seq(self) -> int:
+        """Log'daki en eski frame'in seq'i (log boşsa bir sonraki seq)"""
+        return self.frames[0].seq if self.frames else self.seq + SEQ_STRIDE
+
+
+class ReplayLog:
+    """
+    Oda bazlı, boyutu sınırlı yayın log'u.
+    
+    - Oda başına en fazla REPLAY_LOG_SIZE frame tutulur.
+    - En fazla REPLAY_LOG_MAX_ROOMS oda tutulur, en az kullanılan atılır.
+    - Oda boşaldıktan sonra da log kalır (Wi-Fi kesintisi sonrası herkes
+      aynı anda yeniden bağlanabilir); soğuk loglar evict_idle ile atılır.
+    """
+    
+    def __init__(self, capacity: int = None, max_rooms: int = None, idle_seconds: int = None):
+        self.capacity = capacity or settings.REPLAY_LOG_SIZE
+        self.max_rooms = max_rooms or settings.REPLAY_LOG_MAX_ROOMS
+        self.idle_seconds = idle_seconds if idle_seconds is not None else settings.REPLAY_LOG_IDLE_SECONDS
+        self._rooms: "OrderedDict[str, RoomLog]" = OrderedDict()
+        self.slot = 0  # Backplane başlatılınca worker'ın slot'u atanır
+        
+        # İstatistikler
+        self.resumes = 0  # Kaçırılan frame'leri replay ile kapatılan bağlantılar
+        self.replayed_frames = 0
+        self.resyncs = 0  # Boşluk log'dan eski olduğu için resync gönderilenler
+        self.evictions = 0
+    
+    def append(self, room_id: str, frame: Frame) -> int:
+        """
+        Frame'e odanın sıradaki seq'ini verir ve log'a ekler.
+        
+        Returns:
+            int: Frame'in seq'i
+        """
+        room = self._rooms.get(room_id)
+        if room is None:
+            room = self._rooms[room_id] = RoomLog(self.capacity, self.slot)
+            self._enforce_room_limit()
+        else:
+            self._rooms.move_to_end(room_id)
+        
+        room.seq += SEQ_STRIDE
+        frame.seq = room.seq
+        room.frames.append(frame)
+        room.last_access = time.monotonic()
+        return room.seq
+    
+    def current_seq(self, room_id: str) -> Optional[int]:
+        """Odanın son seq'i (log yoksa None)"""
+        room = self._rooms.get(room_id)
+        return room.seq if room is not None else None
+    
+    def since(self, room_id: str, resume_from: int, limit: int = None) -> Optional[List[Frame]]:
+        """
+        resume_from'dan sonraki frame'leri döner.
+        
+        Args:
+            limit: Bundan fazla frame kaçırıldıysa replay yerine resync
+                   (örn. bağlantı kuyruğunun boyutu)
+        
+        Returns:
+            Optional[List[Frame]]: Kaçırılan frame'ler (hiç yoksa boş liste);
+                                   boşluk log'da değilse None (resync gerekir)
+        """
+        room = self._rooms.get(room_id)
+        if (
+            room is None
+            or not room.first_seq - SEQ_STRIDE <= resume_from <= room.seq
+            or (room.seq - resume_from) % SEQ_STRIDE
+            or (limit and (room.seq - resume_from) // SEQ_STRIDE > limit)
+        ):
+            self.resyncs += 1
+            return None
+        
+        room.last_access = time.monotonic()
+        missed = [frame for frame in room.frames if frame.seq > resume_from]
+        self.resumes += 1
+        self.replayed_frames += len(missed)
+        return missed
+    
+    def rooms(self) -> List[str]:
+        """Bellekte tutulan odalar"""
+        return list(self._rooms)
+    
+    def drop(self, room_id: str):
+        """Odanın log'unu siler (oda kapatıldığında vb.)"""
+        self._rooms.pop(room_id, None)
+    
+    def evict_idle(self, keep=()) -> int:
+        """
+        Uzun süredir yayın olmayan odaların log'larını atar.
+        
+        Args:
+            keep: Log'u atılmayacak odalar (bağlı kullanıcısı olanlar)
+        
+        Returns:
+            int: Atılan oda sayısı
+        """
+        if not self.idle_seconds:
+            return 0
+        threshold = time.monotonic() - self.idle_seconds
+        cold = [
+            room_id for room_id, room in self._rooms.items()
+            if room.last_access < threshold and room_id not in keep
+        ]
+        for room_id in cold:
+            self.drop(room_id)
+        self.evictions += len(cold)
+        return len(cold)
+    
+    def get_stats(self) -> dict:
+        """Log boyutu ve replay istatistiklerini döner"""
+        return {
+            "rooms": len(self._rooms),
+            "max_rooms": self.max_rooms,
+            "capacity_per_room": self.capacity,
+            "logged_frames": sum(len(room.frames) for room in self._rooms.values()),
+            "resumes": self.resumes,
+            "replayed_frames": self.replayed_frames,
+            "resyncs": self.resyncs,
+            "evictions": self.evictions
+        }
+    
+    # ==================== İç Yardımcılar ====================
+    
+    def _enforce_room_limit(self):
+        """Oda limiti aşıldıysa en az kullanılanları atar"""
+        while len(self._rooms) > self.max_rooms:
+            self._rooms.popitem(last=False)
+            self.evictions += 1
+
+
+# Global singleton instance
+replay_log = ReplayLog()
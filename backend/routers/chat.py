@@ -3,15 +3,24 @@ Chat Router - WebSocket ve Mesaj Geçmişi
 Mesaj kalıcılığı ile WebSocket endpoint ve history API
 """
 
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException, Response
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-import json
+from typing import Dict, List, Optional, Tuple, Union
 from datetime import datetime
+import asyncio
 
-from database import get_db
-from models import Message, Room, User
+from cache import resolve_room
+from config import settings
+from database import run_db
+from directory import room_directory
+from history import recent_history
+from models import File, Message, Room
 from manager import manager
-from schemas import validate_websocket_message
+from persistence import message_writer
+from schemas import parse_websocket_frame, parse_websocket_object, stamp_websocket_message
+from serialization import Frame, dumps, unpackb
+from typing_indicators import typing_indicators
 
 router = APIRouter()
 
@@ -19,49 +28,164 @@ router = APIRouter()
 # ==================== Helper Functions ====================
 
 async def save_message_to_db(
-    db: Session,
     room_id: str,
     username: str,
     message_type: str,
     content: str = None,
     file_id: int = None
-) -> Message:
-    """Mesajı veritabanına kaydet"""
-    # Room var mı kontrol et, yoksa oluştur
-    room = db.query(Room).filter(Room.room_id == room_id).first()
-    if not room:
-        room = Room(room_id=room_id, room_name=room_id)
-        db.add(room)
-        db.commit()
-        db.refresh(room)
-    
-    # User var mı kontrol et, yoksa oluştur (anonim kullanıcı)
-    user = db.query(User).filter(User.username == username).first()
-    if not user:
-        user = User(username=username, display_name=username, is_anonymous=True)
-        db.add(user)
-        db.commit()
-        db.refresh(user)
-    
-    # Mesajı kaydet
-    message = Message(
+):
+    """
+    Mesajı veritabanına kaydet
+    
+    Satır write-behind kuyruğuna eklenir ve arka planda toplu yazılır
+    (bkz. persistence.MessageWriter). MESSAGE_WRITE_MODE=sync ise
+    commit edilene kadar beklenir. Mesaj, odanın history buffer'ına da eklenir;
+    buffer kaydının "id" alanı satır yazıldığında, "seq" alanı mesaj odaya
+    yayınlandığında (mark_broadcast) doldurulur.
+    
+    Returns:
+        dict: History buffer kaydı
+    """
+    created_at = datetime.utcnow()
+    
+    # History buffer'ı güncelle (message_to_dict ile aynı format)
+    entry = {
+        "type": message_type,
+        "username": username,
+        "timestamp": created_at.isoformat(),
+        "seq": None  # Henüz yayınlanmadı
+    }
+    if content:
+        entry["content"] = content
+        entry["message"] = content
+    recent_history.append(room_id, entry)
+    
+    await message_writer.enqueue(
         room_id=room_id,
         username=username,
         message_type=message_type,
         content=content,
         file_id=file_id,
-        created_at=datetime.utcnow()
+        created_at=created_at,
+        record=entry
+    )
+    return entry
+
+
+def mark_broadcast(entry: dict, seq: Optional[int]):
+    """Buffer kaydına yayınlandığı frame'in seq'ini yazar (oda boşsa alanı kaldırır)"""
+    if seq is None:
+        entry.pop("seq", None)
+    else:
+        entry["seq"] = seq
+
+
+def is_broadcast(entry: dict) -> bool:
+    """Kayıt odaya yayınlandı mı? (kaydedilmiş ama henüz yayınlanmamışsa False)"""
+    return entry.get("seq", 0) is not None
+
+
+def public_messages(entries: List[dict]) -> List[dict]:
+    """
+    Buffer kayıtlarını iç "seq" alanı olmadan döner; böylece buffer'dan
+    ve veritabanından gelen mesajlar istemciye aynı biçimde gider.
+    """
+    return [
+        {key: value for key, value in entry.items() if key != "seq"} if "seq" in entry else entry
+        for entry in entries
+    ]
+
+
+# ==================== Leave Bekletme ====================
+
+# Kopan bağlantıların bekletilen leave mesajları: (oda, kullanıcı) -> task
+pending_leaves: Dict[Tuple[str, str], asyncio.Task] = {}
+
+
+async def announce_leave(room_id: str, username: str):
+    """Leave mesajını kaydeder ve odaya yayınlar"""
+    entry = await save_message_to_db(
+        room_id=room_id,
+        username=username,
+        message_type='leave',
+        content=f"{username} odadan ayrıldı"
     )
-    db.add(message)
-    db.commit()
-    db.refresh(message)
     
-    return message
+    leave_message = {
+        "type": "leave",
+        "username": username,
+        "message": f"{username} odadan ayrıldı",
+        "timestamp": datetime.utcnow().isoformat()
+    }
+    mark_broadcast(entry, await manager.broadcast(room_id, leave_message, history_entry=entry))
 
 
-def message_to_dict(message: Message) -> dict:
-    """Message modelini dict'e çevir"""
+async def schedule_leave(room_id: str, username: str):
+    """
+    Leave mesajını LEAVE_GRACE_SECONDS kadar bekletir.
+    
+    Kısa bir kopmadan sonra resume_from ile dönen kullanıcı için
+    (cancel_pending_leave) ne leave ne de yeni join kaydedilir.
+    """
+    if settings.LEAVE_GRACE_SECONDS <= 0:
+        await announce_leave(room_id, username)
+        return
+    
+    key = (room_id, username)
+    if key in pending_leaves:
+        return  # Aynı kullanıcının başka bir soketi için zaten bekliyor
+    
+    async def delayed():
+        await asyncio.sleep(settings.LEAVE_GRACE_SECONDS)
+        pending_leaves.pop(key, None)
+        await announce_leave(room_id, username)
+    
+    pending_leaves[key] = asyncio.create_task(delayed())
+
+
+def cancel_pending_leave(room_id: str, username: str) -> bool:
+    """Kullanıcının bekleyen leave mesajını iptal eder (varsa True)"""
+    task = pending_leaves.pop((room_id, username), None)
+    if task is None:
+        return False
+    task.cancel()
+    return True
+
+
+async def flush_pending_leaves():
+    """Kapanışta bekleyen leave mesajlarını beklemeden yazar"""
+    for room_id, username in list(pending_leaves):
+        cancel_pending_leave(room_id, username)
+        await announce_leave(room_id, username)
+
+
+# History için okunan sütunlar: dosya bilgisi aynı sorguda (LEFT JOIN) gelir,
+# mesaj başına ayrı File sorgusu (N+1) ve ORM nesnesi oluşturulmaz
+MESSAGE_COLUMNS = (
+    Message.id,
+    Message.message_type,
+    Message.username,
+    Message.created_at,
+    Message.content,
+    Message.file_id,
+    File.file_url,
+    File.original_filename,
+    File.file_size,
+    File.file_type,
+)
+
+
+def select_messages(room_id: str):
+    """Odanın silinmemiş mesajları için (dosya bilgisiyle birlikte) SELECT"""
+    return select(*MESSAGE_COLUMNS)\
+        .outerjoin(File, Message.file_id == File.id)\
+        .where(Message.room_id == room_id, Message.is_deleted == False)
+
+
+def message_to_dict(message) -> dict:
+    """MESSAGE_COLUMNS satırını dict'e çevir"""
     result = {
+        "id": message.id,
         "type": message.message_type,
         "username": message.username,
         "timestamp": message.created_at.isoformat(),
@@ -71,173 +195,320 @@ def message_to_dict(message: Message) -> dict:
         result["content"] = message.content
         result["message"] = message.content
     
-    if message.file_id and message.file:
-        result["file_url"] = message.file.file_url
-        result["file_name"] = message.file.original_filename
-        result["file_size"] = message.file.file_size
-        result["file_type"] = message.file.file_type
+    if message.file_id and message.file_url:
+        result["file_url"] = message.file_url
+        result["file_name"] = message.original_filename
+        result["file_size"] = message.file_size
+        result["file_type"] = message.file_type
     
     return result
 
 
+def _history_response(room_id: str, message_list: Optional[List[dict]], limit: int, forward: bool = False) -> Response:
+    """
+    History cevabını oluşturur (jsonable_encoder atlanır, doğrudan serileştirilir).
+    Sayfa doluysa devam etmek için cursor olarak uçtaki mesajın id'si döner.
+    """
+    message_list = public_messages(message_list or [])
+    
+    next_cursor = None
+    if message_list and len(message_list) >= limit:
+        edge = message_list[-1] if forward else message_list[0]
+        next_cursor = edge.get("id")
+    
+    body = dumps({
+        "room_id": room_id,
+        "messages": message_list,
+        "count": len(message_list),
+        "next_cursor": next_cursor
+    })
+    return Response(content=body, media_type="application/json")
+
+
+# ==================== Database Helpers (DB thread pool'unda çalışır) ====================
+
+def _load_history(
+    db: Session,
+    room_id: str,
+    limit: int,
+    before: Optional[datetime] = None
+) -> Optional[List[dict]]:
+    """Odanın son N mesajını dict listesi olarak döner, oda yoksa None"""
+    # Room var mı kontrol et
+    room = db.query(Room.id).filter(Room.room_id == room_id).first()
+    if not room:
+        return None
+    
+    # Son N mesajı çek (silinen mesajları hariç tut)
+    query = select_messages(room_id)
+    if before is not None:
+        query = query.where(Message.created_at < before)
+    messages = db.execute(
+        query.order_by(Message.id.desc()).limit(limit)
+    ).all()
+    
+    # Ters çevir (en eski mesaj üstte olsun)
+    messages.reverse()
+    
+    return [message_to_dict(msg) for msg in messages]
+
+
+def _load_history_page(
+    db: Session,
+    room_id: str,
+    limit: int,
+    before_id: Optional[int] = None,
+    after_id: Optional[int] = None
+) -> Optional[List[dict]]:
+    """
+    Cursor (mesaj id) ile bir sayfa mesaj döner, oda yoksa None.
+    
+    Keyset sayfalama: OFFSET kullanılmaz, (room_id, is_deleted, id)
+    index'i üzerinden doğrudan cursor'dan devam edilir.
+    
+    Args:
+        before_id: Bu id'den eski mesajlar (geriye doğru)
+        after_id: Bu id'den yeni mesajlar (ileriye doğru)
+    """
+    room = db.query(Room.id).filter(Room.room_id == room_id).first()
+    if not room:
+        return None
+    
+    query = select_messages(room_id)
+    
+    if after_id is not None:
+        messages = db.execute(
+            query.where(Message.id > after_id).order_by(Message.id.asc()).limit(limit)
+        ).all()
+    else:
+        if before_id is not None:
+            query = query.where(Message.id < before_id)
+        messages = db.execute(
+            query.order_by(Message.id.desc()).limit(limit)
+        ).all()
+        messages.reverse()
+    
+    return [message_to_dict(msg) for msg in messages]
+
+
 # ==================== WebSocket Endpoint ====================
 
+async def _buffered_history(room_id: str, limit: int) -> Optional[List[dict]]:
+    """
+    Odanın son mesajlarını history buffer'ından döner.
+    Soğuk odanın buffer'ı önce veritabanından doldurulur.
+    
+    Sahibi başka bir worker olan odanın (ROOM_AFFINITY) buffer'ı burada
+    güncel tutulmaz; okunmaz ve doldurulmaz, istek veritabanından cevaplanır.
+    
+    Returns:
+        Optional[List[dict]]: Mesajlar, buffer bu isteği karşılayamıyorsa None
+    """
+    if not manager.affinity.owns(room_id):
+        return None
+    
+    message_list = recent_history.get(room_id, limit)
+    
+    if message_list is None and recent_history.can_serve(limit):
+        # Soğuk oda: buffer'ı veritabanından doldur
+        async def load(before: datetime):
+            # Kuyrukta bekleyen mesajlar önce yazılsın
+            await message_writer.wait_flushed()
+            return await run_db(_load_history, room_id, recent_history.capacity, before)
+        
+        if await recent_history.prime(room_id, load):
+            message_list = recent_history.get(room_id, limit)
+    
+    return message_list
+
+
+async def _welcome_builder(room_id: str, room_name: Optional[str], username: str):
+    """
+    Katılan istemcinin welcome frame'i için içerik üreticisini hazırlar.
+    
+    Buffer önceden doldurulur; üretici manager.connect() içinde bağlantı
+    kaydedildiği adımda (await olmadan) çağrılır. Böylece welcome'daki
+    mesajlar ile canlı yayın arasında boşluk veya tekrar olmaz: kaydedilmiş
+    ama henüz yayınlanmamış mesajlar welcome'a girmez, canlı gelir.
+    """
+    limit = settings.WELCOME_HISTORY_SIZE
+    preloaded = await _buffered_history(room_id, limit)
+    if preloaded is None:
+        # Buffer bu limiti karşılayamıyor, veritabanından oku
+        preloaded = await run_db(_load_history, room_id, limit) or []
+    
+    def build(resumed: bool) -> dict:
+        messages = []
+        if not resumed:
+            # Kaldığı yerden devam eden istemci kaçırdıklarını replay log'undan alır
+            current = recent_history.get(room_id, limit)
+            messages = public_messages([m for m in (preloaded if current is None else current) if is_broadcast(m)])
+        return {
+            "room": {"room_id": room_id, "room_name": room_name},
+            "messages": messages,
+            "typing": [user for user in typing_indicators.get_typing_users(room_id) if user != username]
+        }
+    
+    return build
+
+
+async def receive_frame(websocket: WebSocket) -> Union[str, bytes]:
+    """Sıradaki text veya binary frame'i döner, bağlantı kapandıysa WebSocketDisconnect"""
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000))
+    text = message.get("text")
+    return text if text is not None else message.get("bytes", b"")
+
+
+def parse_inbound(data: Union[str, bytes], binary: bool):
+    """Frame'i bağlantının protokolüne göre çözer ve doğrular"""
+    if binary and isinstance(data, bytes):
+        try:
+            decoded = unpackb(data)
+        except Exception:
+            raise ValueError("Geçersiz MessagePack frame") from None
+        return parse_websocket_object(decoded)
+    return parse_websocket_frame(data)
+
+
 @router.websocket("/ws/{room_id}")
 async def websocket_endpoint(
     websocket: WebSocket,
     room_id: str,
     username: str,
-    db: Session = Depends(get_db)
+    resume_from: Optional[int] = None
 ):
-    """WebSocket bağlantısı - mesaj kalıcılığı ve oda güvenliği ile"""
+    """
+    WebSocket bağlantısı - mesaj kalıcılığı ve oda güvenliği ile
+    
+    İlk frame "welcome"dır: oda bilgisi, kullanıcı listesi ve son
+    WELCOME_HISTORY_SIZE mesaj (ayrı history/check istekleri gerekmez).
+    
+    Yayınlanan her frame oda bazında artan bir `seq` taşır. Yeniden bağlanan
+    istemci son gördüğü seq'i `resume_from` ile gönderirse kaçırdığı frame'ler
+    welcome'dan sonra tekrar gönderilir; boşluk replay log'undan eskiyse
+    welcome'daki mesajlar geçmişin yerine geçer. Kopan bağlantının leave
+    mesajı LEAVE_GRACE_SECONDS bekletilir; bu sürede resume ile dönen
+    kullanıcı için ne leave ne de join kaydedilir.
+    """
     
     # Oda kodunu büyük harfe çevir
     room_id = room_id.upper()
     
-    # Odanın var olup olmadığını kontrol et
-    room = db.query(Room).filter(Room.room_id == room_id, Room.is_active == True).first()
-    if not room:
+    # Oda başka bir worker'a aitse sahibine yönlendir (ROOM_AFFINITY)
+    owner_url = manager.affinity.owner_url(room_id)
+    if owner_url is not None:
+        await manager.redirect(websocket, owner_url)
+        return
+    
+    # Odanın var olup olmadığını kontrol et (aktif oda indeksinden)
+    room_name = await resolve_room(room_id)
+    if room_name is None:
         # Oda yoksa bağlantıyı reddet
         await websocket.close(code=4000, reason=f"Oda bulunamadı: {room_id}")
         return
     
-    await manager.connect(websocket, room_id, username)
+    # İlk frame: oda bilgisi, presence ve son mesajlar (ayrı REST çağrıları gerekmez)
+    welcome = await _welcome_builder(room_id, room_name, username)
+    resumed = await manager.connect(websocket, room_id, username, resume_from, welcome=welcome)
     
-    # Join mesajını kaydet ve broadcast et
-    await save_message_to_db(
-        db=db,
-        room_id=room_id,
-        username=username,
-        message_type='join',
-        content=f"{username} odaya katıldı"
-    )
+    # Kısa kopmadan dönen kullanıcının bekleyen leave'i atılır; yeni oturumsa önce o yazılır
+    leave_cancelled = cancel_pending_leave(room_id, username)
+    if leave_cancelled and not resumed:
+        await announce_leave(room_id, username)
     
-    join_message = {
-        "type": "join",
-        "username": username,
-        "message": f"{username} odaya katıldı",
-        "timestamp": datetime.utcnow().isoformat(),
-        "room_users": manager.get_room_users(room_id)
-    }
-    await manager.broadcast(room_id, join_message)
+    # Join mesajını kaydet ve broadcast et. Sadece leave'i hiç yazılmadan
+    # kaldığı yerden devam eden bağlantı hariç; leave yazıldıysa (bekleme
+    # süresi dolduysa) replay başarılı olsa da kullanıcı yeniden katılır
+    if not (resumed and leave_cancelled):
+        entry = await save_message_to_db(
+            room_id=room_id,
+            username=username,
+            message_type='join',
+            content=f"{username} odaya katıldı"
+        )
+        
+        join_message = {
+            "type": "join",
+            "username": username,
+            "message": f"{username} odaya katıldı",
+            "timestamp": datetime.utcnow().isoformat()
+        }
+        mark_broadcast(entry, await manager.broadcast(room_id, join_message, history_entry=entry))
+    
+    binary = manager.is_binary(websocket, room_id)
     
     try:
         while True:
-            data = await websocket.receive_text()
+            data = await receive_frame(websocket)
+            
+            # Ham JSON'dan (veya MessagePack'ten) doğrudan doğrula (tipi olmayan/düz metin -> PlainMessage)
             try:
-                message_data = json.loads(data)
-                
-                # Mesaj tipine göre işle
-                if "type" in message_data:
-                    try:
-                        validated_message = validate_websocket_message(message_data)
-                        enriched_message = validated_message.model_dump()
-                        if not enriched_message.get("timestamp"):
-                            enriched_message["timestamp"] = datetime.utcnow().isoformat()
-                        
-                        msg_type = enriched_message.get("type", "message")
-                        
-                        # Typing indicators - sadece broadcast et, veritabanına kaydetme
-                        if msg_type == "typing_start":
-                            enriched_message["username"] = username
-                            await manager.broadcast(room_id, enriched_message, sender_username=username, exclude_sender=True)
-                            continue
-                        elif msg_type == "typing_stop":
-                            enriched_message["username"] = username
-                            await manager.broadcast(room_id, enriched_message, sender_username=username, exclude_sender=True)
-                            continue
-                        
-                        # Mesajı veritabanına kaydet (typing hariç)
-                        if msg_type == "message" and enriched_message.get("content"):
-                            await save_message_to_db(
-                                db=db,
-                                room_id=room_id,
-                                username=username,
-                                message_type='message',
-                                content=enriched_message["content"]
-                            )
-                        elif msg_type == "file":
-                            file_info = f"Dosya: {enriched_message.get('file_name', 'dosya')}"
-                            await save_message_to_db(
-                                db=db,
-                                room_id=room_id,
-                                username=username,
-                                message_type='file',
-                                content=file_info
-                            )
-                            # File mesajına username ekle
-                            enriched_message["username"] = username
-                        
-                    except ValueError as e:
-                        error_message = {
-                            "type": "error",
-                            "error_code": "INVALID_MESSAGE_FORMAT",
-                            "message": str(e),
-                            "timestamp": datetime.utcnow().isoformat()
-                        }
-                        await websocket.send_text(json.dumps(error_message))
-                        continue
-                else:
-                    # Type belirtilmemişse normal mesaj
-                    enriched_message = {
-                        "type": "message",
-                        "username": username,
-                        "content": message_data.get("content", ""),
-                        "timestamp": datetime.utcnow().isoformat()
-                    }
-                    
-                    # Veritabanına kaydet
-                    await save_message_to_db(
-                        db=db,
-                        room_id=room_id,
-                        username=username,
-                        message_type='message',
-                        content=enriched_message["content"]
-                    )
-                
-                # Broadcast yap
-                await manager.broadcast(room_id, enriched_message, sender_username=username)
-                
-            except json.JSONDecodeError:
-                # JSON değilse düz metin olarak işle
-                enriched_message = {
-                    "type": "message",
-                    "username": username,
-                    "content": data,
+                inbound = parse_inbound(data, binary)
+            except ValueError as e:
+                error_message = {
+                    "type": "error",
+                    "error_code": "INVALID_MESSAGE_FORMAT",
+                    "message": str(e),
                     "timestamp": datetime.utcnow().isoformat()
                 }
-                
-                # Veritabanına kaydet
-                await save_message_to_db(
-                    db=db,
+                await manager.send_personal_message(websocket, room_id, error_message)
+                continue
+            
+            # Gönderen her zaman bağlantının kullanıcısıdır
+            stamp_websocket_message(inbound, username)
+            
+            msg_type = inbound.type
+            
+            # Presence boşluğu: istemciye tam kullanıcı listesini gönder
+            if msg_type == "presence_sync":
+                manager.send_presence_snapshot(websocket, room_id)
+                continue
+            
+            # Typing indicators - sunucuda toplanır, aralıklarla tek frame olarak gönderilir
+            if msg_type == "typing_start":
+                typing_indicators.typing_start(room_id, username)
+                continue
+            if msg_type == "typing_stop":
+                typing_indicators.typing_stop(room_id, username)
+                continue
+            
+            # Mesajı veritabanına kaydet (typing hariç)
+            entry = None
+            if msg_type == "message":
+                entry = await save_message_to_db(
                     room_id=room_id,
                     username=username,
                     message_type='message',
-                    content=data
+                    content=inbound.content
                 )
-                
-                await manager.broadcast(room_id, enriched_message, sender_username=username)
-                
+            elif msg_type == "file":
+                entry = await save_message_to_db(
+                    room_id=room_id,
+                    username=username,
+                    message_type='file',
+                    content=f"Dosya: {inbound.file_name or 'dosya'}"
+                )
+            
+            # Mesaj gönderen artık yazmıyor
+            typing_indicators.typing_stop(room_id, username, signal=False)
+            
+            # Broadcast yap (doğrulanmış modelden tek adımda serileştirilir)
+            seq = await manager.broadcast_frame(room_id, Frame(inbound), sender_username=username, history_entry=entry)
+            if entry is not None:
+                mark_broadcast(entry, seq)
+    
     except WebSocketDisconnect:
+        handed_off = manager.is_handed_off(websocket, room_id)
         disconnected_user = manager.disconnect(websocket, room_id)
+        typing_indicators.typing_stop(room_id, username, signal=False)
+        if handed_off:
+            # Oda başka bir worker'a taşındı, kullanıcı oraya bağlanıyor (ayrılmadı)
+            return
         
-        # Leave mesajını kaydet
-        await save_message_to_db(
-            db=db,
-            room_id=room_id,
-            username=disconnected_user or username,
-            message_type='leave',
-            content=f"{disconnected_user or username} odadan ayrıldı"
-        )
-        
-        leave_message = {
-            "type": "leave",
-            "username": disconnected_user or username,
-            "message": f"{disconnected_user or username} odadan ayrıldı",
-            "timestamp": datetime.utcnow().isoformat(),
-            "room_users": manager.get_room_users(room_id)
-        }
-        await manager.broadcast(room_id, leave_message)
+        # Leave mesajı bekletilir: kullanıcı resume_from ile dönerse hiç yazılmaz
+        await schedule_leave(room_id, disconnected_user or username)
 
 
 # ==================== REST Endpoints ====================
@@ -246,61 +517,82 @@ async def websocket_endpoint(
 async def get_chat_history(
     room_id: str,
     limit: int = 50,
-    db: Session = Depends(get_db)
+    before_id: Optional[int] = None,
+    after_id: Optional[int] = None
 ):
     """
-    Oda geçmişini getir (son N mesaj)
+    Oda geçmişini getir (son N mesaj veya cursor ile bir sayfa)
+    
+    Cursor'sız, buffer kapasitesine sığan istekler bellekteki ring buffer'dan,
+    diğerleri veritabanından (keyset sayfalama ile) cevaplanır.
     
     Args:
         room_id: Oda ID
         limit: Maksimum mesaj sayısı (varsayılan: 50)
+        before_id: Bu mesaj id'sinden eski mesajları getir (geriye kaydırma)
+        after_id: Bu mesaj id'sinden yeni mesajları getir (kaçırılanları alma)
     
     Returns:
-        dict: Mesaj listesi
+        dict: Mesaj listesi ve sonraki sayfa için `next_cursor`
+              (before_id/after_id olarak gönderilir, sayfa bittiyse None)
     """
-    # Room var mı kontrol et
-    room = db.query(Room).filter(Room.room_id == room_id).first()
-    if not room:
-        return {"room_id": room_id, "messages": [], "count": 0}
+    if before_id is not None and after_id is not None:
+        raise HTTPException(status_code=400, detail="before_id ve after_id birlikte kullanılamaz")
     
-    # Son N mesajı çek (silinen mesajları hariç tut)
-    messages = db.query(Message)\
-        .filter(Message.room_id == room_id, Message.is_deleted == False)\
-        .order_by(Message.created_at.desc())\
-        .limit(limit)\
-        .all()
+    if before_id is not None or after_id is not None:
+        message_list = await run_db(_load_history_page, room_id, limit, before_id, after_id)
+        return _history_response(room_id, message_list, limit, forward=after_id is not None)
     
-    # Ters çevir (en eski mesaj üstte olsun)
-    messages.reverse()
+    message_list = await _buffered_history(room_id, limit)
     
-    # Dict'e çevir
-    message_list = [message_to_dict(msg) for msg in messages]
+    if message_list is None:
+        message_list = await run_db(_load_history, room_id, limit)
+    elif len(message_list) >= limit > 0 and "id" not in message_list[0]:
+        # Cursor olacak mesaj henüz yazılmadı, id'si atanana kadar bekle
+        await message_writer.wait_flushed()
     
+    return _history_response(room_id, message_list, limit)
+
+
+def _active_rooms_view(entries: List[dict], total: int, version: int, next_cursor: Optional[str]) -> dict:
+    """Oda dizini sayfasını /rooms formatına çevirir"""
     return {
-        "room_id": room_id,
-        "messages": message_list,
-        "count": len(message_list)
+        "total_rooms": total,
+        "rooms": [
+            {
+                "room_id": entry["room_id"],
+                "room_name": entry["room_name"],
+                "description": entry["description"],
+                "last_activity": entry["last_activity"],
+                "message_count": entry["message_count"],
+                "last_message_at": entry["last_message_at"],
+                "active_users": entry["active_users"],
+                "user_count": len(entry["active_users"])
+            }
+            for entry in entries
+        ],
+        "version": version,
+        "next_cursor": next_cursor
     }
 
 
 @router.get("/rooms")
-async def get_active_rooms(db: Session = Depends(get_db)):
-    """Aktif odaları listele"""
-    # Veritabanındaki tüm odalar
-    rooms = db.query(Room).filter(Room.is_active == True).all()
-    
-    room_list = []
-    for room in rooms:
-        # Manager'daki aktif kullanıcılarla birleştir
-        active_users = manager.get_room_users(room.room_id)
-        room_list.append({
-            "room_id": room.room_id,
-            "room_name": room.room_name or room.room_id,
-            "description": room.description,
-            "last_activity": room.last_activity.isoformat() if room.last_activity else None,
-            "message_count": len(room.messages),
-            "active_users": active_users,
-            "user_count": len(active_users)
-        })
-    
-    return {"total_rooms": len(room_list), "rooms": room_list}
+async def get_active_rooms(
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    since: Optional[int] = None
+):
+    """
+    Aktif odaları listele (oda dizini cache'inden)
+    
+    Args:
+        limit: Sayfa boyutu (verilmezse tüm odalar)
+        cursor: Önceki sayfanın `next_cursor` değeri
+        since: Önceki cevabın `version` değeri; değişiklik yoksa
+               sadece {"version", "not_modified": true} döner
+    """
+    try:
+        body = await room_directory.page(_active_rooms_view, limit, cursor, since)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return Response(content=body, media_type="application/json")
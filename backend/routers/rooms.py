@@ -3,12 +3,15 @@ Rooms Router - Oda Yönetimi
 Oda oluşturma, kontrol etme ve listeleme endpoint'leri
 """
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, HTTPException, Response
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
+from typing import List, Optional
 from datetime import datetime
 
-from database import get_db
+from cache import register_room, resolve_room
+from database import run_db_write
+from directory import room_directory
 from models import Room
 from utils import generate_unique_room_code
 
@@ -39,10 +42,57 @@ class RoomCheckResponse(BaseModel):
     user_count: int = 0
 
 
+# ==================== Database Helpers (DB thread pool'unda çalışır) ====================
+
+def _create_room(db: Session, room_name: str) -> dict:
+    """Benzersiz kodlu yeni oda oluşturur ve bilgilerini döner"""
+    # Benzersiz kod üret
+    code = generate_unique_room_code(db)
+    
+    # Yeni oda oluştur
+    new_room = Room(
+        room_id=code,
+        room_name=room_name or f"Oda {code}",
+        is_active=True,
+        created_at=datetime.utcnow()
+    )
+    
+    result = {
+        "code": code,
+        "room_name": new_room.room_name,
+        "created_at": new_room.created_at
+    }
+    
+    db.add(new_room)
+    db.commit()
+    
+    return result
+
+
+# ==================== Views ====================
+
+def _room_list_view(entries: List[dict], total: int, version: int, next_cursor: Optional[str]) -> dict:
+    """Oda dizini sayfasını /rooms/list formatına çevirir"""
+    return {
+        "total": total,
+        "rooms": [
+            {
+                "code": entry["room_id"],
+                "name": entry["room_name"],
+                "created_at": entry["created_at"],
+                "user_count": len(entry["active_users"])
+            }
+            for entry in entries
+        ],
+        "version": version,
+        "next_cursor": next_cursor
+    }
+
+
 # ==================== Endpoints ====================
 
 @router.post("/create", response_model=RoomCreateResponse)
-async def create_room(request: RoomCreateRequest, db: Session = Depends(get_db)):
+async def create_room(request: RoomCreateRequest):
     """
     Yeni bir oda oluşturur ve benzersiz kod döner.
     
@@ -53,38 +103,27 @@ async def create_room(request: RoomCreateRequest, db: Session = Depends(get_db))
         RoomCreateResponse: Oda kodu ve bilgileri
     """
     try:
-        # Benzersiz kod üret
-        code = generate_unique_room_code(db)
-        
-        # Yeni oda oluştur
-        new_room = Room(
-            room_id=code,
-            room_name=request.room_name or f"Oda {code}",
-            is_active=True,
-            created_at=datetime.utcnow()
-        )
-        
-        db.add(new_room)
-        db.commit()
-        db.refresh(new_room)
+        new_room = await run_db_write(_create_room, request.room_name)
+        code = new_room["code"]
+        register_room(code, new_room["room_name"])
         
         return RoomCreateResponse(
             success=True,
             code=code,
-            room_name=new_room.room_name,
+            room_name=new_room["room_name"],
             message=f"Oda başarıyla oluşturuldu: {code}",
-            created_at=new_room.created_at.isoformat()
+            created_at=new_room["created_at"].isoformat()
         )
-        
+    
     except ValueError as e:
         raise HTTPException(status_code=500, detail=str(e))
     except Exception as e:
-        db.rollback()
+        # Rollback DatabaseSession tarafından yapılır
         raise HTTPException(status_code=500, detail=f"Oda oluşturulurken hata: {str(e)}")
 
 
 @router.get("/{code}/check", response_model=RoomCheckResponse)
-async def check_room(code: str, db: Session = Depends(get_db)):
+async def check_room(code: str):
     """
     Odanın var olup olmadığını kontrol eder.
     
@@ -97,10 +136,10 @@ async def check_room(code: str, db: Session = Depends(get_db)):
     # Oda kodunu büyük harfe çevir (case-insensitive)
     code = code.upper()
     
-    # Odayı veritabanında ara
-    room = db.query(Room).filter(Room.room_id == code, Room.is_active == True).first()
+    # Odayı aktif oda indeksinde ara
+    room_name = await resolve_room(code)
     
-    if room:
+    if room_name is not None:
         # Aktif kullanıcı sayısını manager'dan al (eğer import edilebilirse)
         try:
             from manager import manager
@@ -111,7 +150,7 @@ async def check_room(code: str, db: Session = Depends(get_db)):
         return RoomCheckResponse(
             exists=True,
             code=code,
-            room_name=room.room_name,
+            room_name=room_name,
             user_count=user_count
         )
     else:
@@ -122,31 +161,25 @@ async def check_room(code: str, db: Session = Depends(get_db)):
 
 
 @router.get("/list")
-async def list_active_rooms(db: Session = Depends(get_db)):
+async def list_active_rooms(
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    since: Optional[int] = None
+):
     """
-    Aktif odaları listeler.
+    Aktif odaları listeler (en yeni önce, sayfalı).
+    
+    Args:
+        limit: Sayfa boyutu (varsayılan: ROOM_DIRECTORY_PAGE_SIZE)
+        cursor: Önceki sayfanın `next_cursor` değeri
+        since: Önceki cevabın `version` değeri; değişiklik yoksa
+               sadece {"version", "not_modified": true} döner
     
     Returns:
-        dict: Aktif oda listesi
+        dict: Aktif oda listesi, `version` ve `next_cursor`
     """
-    rooms = db.query(Room).filter(Room.is_active == True).order_by(Room.created_at.desc()).limit(50).all()
-    
-    room_list = []
-    for room in rooms:
-        try:
-            from manager import manager
-            user_count = len(manager.get_room_users(room.room_id))
-        except:
-            user_count = 0
-        
-        room_list.append({
-            "code": room.room_id,
-            "name": room.room_name,
-            "created_at": room.created_at.isoformat(),
-            "user_count": user_count
-        })
-    
-    return {
-        "total": len(room_list),
-        "rooms": room_list
-    }
+    try:
+        body = await room_directory.page(_room_list_view, limit or room_directory.page_size, cursor, since)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return Response(content=body, media_type="application/json")
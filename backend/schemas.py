@@ -3,8 +3,8 @@ Pydantic Schemas - Veri Doğrulama ve Serileştirme
 Tüm WebSocket mesajları ve API request/response'ları için tip güvenliği sağlar.
 """
 
-from pydantic import BaseModel, Field, field_validator
-from typing import Optional, Literal
+from pydantic import BaseModel, Discriminator, Field, Tag, TypeAdapter, ValidationError, field_validator
+from typing import Annotated, Any, Optional, Literal, Union
 from datetime import datetime
 
 
@@ -12,7 +12,10 @@ from datetime import datetime
 
 class MessageBase(BaseModel):
     """WebSocket üzerinden gönderilen her mesajın temel yapısı"""
-    type: Literal["join", "leave", "message", "file", "error", "system", "typing_start", "typing_stop"]
+    type: Literal[
+        "join", "leave", "message", "file", "error", "system", "typing_start", "typing_stop",
+        "presence", "presence_diff", "presence_sync", "typing", "welcome", "redirect"
+    ]
     timestamp: Optional[datetime] = None
     
     class Config:
@@ -55,7 +58,6 @@ class JoinMessage(MessageBase):
     type: Literal["join"] = "join"
     username: str
     message: str
-    room_users: list[str] = []
     
     class Config:
         json_schema_extra = {
@@ -63,7 +65,6 @@ class JoinMessage(MessageBase):
                 "type": "join",
                 "username": "Mehmet",
                 "message": "Mehmet odaya katıldı",
-                "room_users": ["Ahmet", "Mehmet"],
                 "timestamp": "2026-02-06T12:30:00"
             }
         }
@@ -74,7 +75,6 @@ class LeaveMessage(MessageBase):
     type: Literal["leave"] = "leave"
     username: str
     message: str
-    room_users: list[str] = []
     
     class Config:
         json_schema_extra = {
@@ -82,7 +82,6 @@ class LeaveMessage(MessageBase):
                 "type": "leave",
                 "username": "Ahmet",
                 "message": "Ahmet odadan ayrıldı",
-                "room_users": ["Mehmet"],
                 "timestamp": "2026-02-06T12:30:00"
             }
         }
@@ -176,6 +175,171 @@ class TypingStopMessage(MessageBase):
         }
 
 
+class TypingMessage(MessageBase):
+    """
+    Odada yazan kullanıcıların toplu listesi (sunucu gönderir).
+    typing_start/typing_stop sinyalleri sunucuda toplanır ve liste
+    değiştiğinde aralıklarla bu frame yayınlanır.
+    """
+    type: Literal["typing"] = "typing"
+    users: list[str] = []
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "type": "typing",
+                "users": ["Ahmet", "Ayşe"],
+                "timestamp": "2026-02-06T12:30:00"
+            }
+        }
+
+
+class PresenceMessage(MessageBase):
+    """
+    Odanın tam kullanıcı listesi (presence snapshot).
+    Katılan istemciye ve presence_sync isteyene gönderilir.
+    """
+    type: Literal["presence"] = "presence"
+    version: int
+    users: list[str] = []
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "type": "presence",
+                "version": 7,
+                "users": ["Ahmet", "Mehmet"],
+                "timestamp": "2026-02-06T12:30:00"
+            }
+        }
+
+
+class PresenceDiffMessage(MessageBase):
+    """
+    Kullanıcı kümesindeki değişiklik (diğer üyelere gönderilir).
+    
+    İstemci sadece version == yerel versiyon + 1 olan diff'i uygular;
+    daha büyük bir versiyon görürse presence_sync ile snapshot ister,
+    küçük veya eşitse yok sayar.
+    """
+    type: Literal["presence_diff"] = "presence_diff"
+    version: int
+    added: list[str] = []
+    removed: list[str] = []
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "type": "presence_diff",
+                "version": 8,
+                "added": ["Ayşe"],
+                "removed": [],
+                "timestamp": "2026-02-06T12:30:00"
+            }
+        }
+
+
+class PresenceSyncMessage(MessageBase):
+    """İstemcinin tam kullanıcı listesi isteği (versiyon boşluğu fark edildiğinde)"""
+    type: Literal["presence_sync"] = "presence_sync"
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "type": "presence_sync"
+            }
+        }
+
+
+class WelcomeMessage(MessageBase):
+    """
+    Bağlantının ilk frame'i: oda bilgisi, presence snapshot'ı ve son mesajlar.
+    
+    resume_from ile gelen istemcinin boşluğu replay log'undan kapatılabildiyse
+    `resumed` True olur, `messages` boş gelir ve kaçırılan frame'ler ardından
+    gönderilir; aksi halde istemci görünümünü `messages` ile sıfırlar.
+    """
+    type: Literal["welcome"] = "welcome"
+    room: dict
+    presence: dict
+    messages: list[dict] = []
+    typing: list[str] = []
+    seq: Optional[int] = None  # Odanın güncel seq'i (sonraki resume_from için)
+    resumed: bool = False
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "type": "welcome",
+                "room": {"room_id": "A7X-29K", "room_name": "Matematik 101"},
+                "presence": {"version": 7, "users": ["Ahmet", "Mehmet"]},
+                "messages": [
+                    {"id": 41, "type": "message", "username": "Ahmet", "content": "Merhaba", "timestamp": "2026-02-06T12:29:00"}
+                ],
+                "typing": [],
+                "seq": 450560000000256,
+                "resumed": False,
+                "timestamp": "2026-02-06T12:30:00"
+            }
+        }
+
+
+class RedirectMessage(MessageBase):
+    """
+    Oda başka bir worker'a ait (ROOM_AFFINITY): istemci `url` adresine
+    resume_from ile yeniden bağlanır. Ardından bağlantı 4001 ile kapatılır.
+    """
+    type: Literal["redirect"] = "redirect"
+    url: str
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "type": "redirect",
+                "url": "ws://localhost:8001",
+                "timestamp": "2026-02-06T12:30:00"
+            }
+        }
+
+
+class PlainMessage(BaseModel):
+    """
+    Tipi belirtilmemiş mesaj ({"content": "..."} veya düz metin).
+    Frontend normal sohbet mesajlarını bu şekilde gönderir.
+    """
+    type: Literal["message"] = "message"
+    username: Optional[str] = None
+    content: str = ""
+    timestamp: Optional[datetime] = None
+
+
+def _inbound_message_tag(value: Any) -> Optional[str]:
+    """Gelen mesajın şema etiketini belirler (type yoksa "plain")"""
+    if isinstance(value, dict):
+        return value.get("type", "plain")
+    return getattr(value, "type", None)
+
+
+# WebSocket'ten gelen tüm mesaj tipleri (type alanına göre ayrılan union)
+InboundMessage = Annotated[
+    Union[
+        Annotated[ChatMessage, Tag("message")],
+        Annotated[JoinMessage, Tag("join")],
+        Annotated[LeaveMessage, Tag("leave")],
+        Annotated[FileMessage, Tag("file")],
+        Annotated[ErrorMessage, Tag("error")],
+        Annotated[SystemMessage, Tag("system")],
+        Annotated[TypingStartMessage, Tag("typing_start")],
+        Annotated[TypingStopMessage, Tag("typing_stop")],
+        Annotated[PresenceSyncMessage, Tag("presence_sync")],
+        Annotated[PlainMessage, Tag("plain")],
+    ],
+    Discriminator(_inbound_message_tag)
+]
+
+inbound_message_adapter = TypeAdapter(InboundMessage)
+
+
 # ==================== API Request/Response Şemaları ====================
 
 class RoomCreate(BaseModel):
@@ -295,16 +459,85 @@ class RoomDB(BaseModel):
 
 # ==================== Helper Functions ====================
 
+def parse_websocket_frame(raw: Union[str, bytes]) -> Union[MessageBase, PlainMessage]:
+    """
+    WebSocket frame'ini doğrudan ham JSON'dan doğrula (ara dict oluşturmadan)
+    
+    JSON nesnesi olmayan frame'ler düz metin mesaj olarak kabul edilir.
+    
+    Args:
+        raw: WebSocket'ten gelen ham metin veya bytes
+    
+    Returns:
+        Doğrulanmış Pydantic model instance
+    
+    Raises:
+        ValueError: Geçersiz mesaj formatı
+    """
+    try:
+        return inbound_message_adapter.validate_json(raw)
+    except ValidationError as e:
+        error = e.errors()[0]
+        if error["type"] in ("json_invalid", "union_tag_not_found"):
+            content = raw if isinstance(raw, str) else raw.decode("utf-8", errors="replace")
+            return PlainMessage(content=content)
+        if error["type"] == "union_tag_invalid":
+            raise ValueError(f"Bilinmeyen mesaj tipi: {error['ctx']['tag']}") from None
+        raise
+
+
+def parse_websocket_object(data: Any) -> Union[MessageBase, PlainMessage]:
+    """
+    Önceden çözülmüş (örn. MessagePack) WebSocket mesajını doğrula
+    
+    Args:
+        data: Çözülmüş mesaj (dict veya düz metin)
+    
+    Returns:
+        Doğrulanmış Pydantic model instance
+    
+    Raises:
+        ValueError: Geçersiz mesaj formatı
+    """
+    if not isinstance(data, dict):
+        return PlainMessage(content=str(data))
+    try:
+        return inbound_message_adapter.validate_python(data)
+    except ValidationError as e:
+        error = e.errors()[0]
+        if error["type"] == "union_tag_invalid":
+            raise ValueError(f"Bilinmeyen mesaj tipi: {error['ctx']['tag']}") from None
+        raise
+
+
+def stamp_websocket_message(message: Union[MessageBase, PlainMessage], username: str):
+    """
+    Doğrulanmış mesaja sunucu tarafı alanlarını işle (gönderen ve zaman)
+    
+    Alanlar doğrudan model __dict__'ine yazılır: pydantic'in __setattr__'ı
+    mesaj başına doğrulama/serileştirmenin tamamından daha pahalıdır.
+    
+    Args:
+        message: parse_websocket_frame() sonucu
+        username: Bağlantının kullanıcı adı (istemcinin gönderdiği ezilir)
+    """
+    fields = message.__dict__
+    if "username" in fields:
+        fields["username"] = username
+    if fields["timestamp"] is None:
+        fields["timestamp"] = datetime.utcnow()
+
+
 def validate_websocket_message(data: dict) -> MessageBase:
     """
     WebSocket'ten gelen mesajı doğrula ve uygun şemaya dönüştür
     
     Args:
         data: WebSocket'ten gelen JSON dict
-        
+    
     Returns:
         Doğrulanmış Pydantic model instance
-        
+    
     Raises:
         ValueError: Geçersiz mesaj formatı
     """
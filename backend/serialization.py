@@ -0,0 +1,182 @@
+"""
+Serileştirme
+WebSocket frame'leri ve REST cevapları için JSON / MessagePack kodlayıcıları.
+
+- orjson kuruluysa JSON için o, değilse stdlib json kullanılır.
+- msgpack kuruluysa istemciler Sec-WebSocket-Protocol ile
+  "dropzone.msgpack" alt protokolünü seçip binary frame'lerle konuşabilir.
+"""
+
+from datetime import date, datetime
+from typing import Any, List, Optional, Union
+import json
+
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - opsiyonel bağımlılık
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - opsiyonel bağımlılık
+    msgpack = None
+
+
+# WebSocket alt protokolleri
+JSON_SUBPROTOCOL = "dropzone.json"
+MSGPACK_SUBPROTOCOL = "dropzone.msgpack"
+
+JSON_BACKEND = "orjson" if orjson is not None else "json"
+MSGPACK_AVAILABLE = msgpack is not None
+
+
+def _default(value: Any) -> Any:
+    """Standart JSON/MessagePack tiplerine uymayan değerler"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    raise TypeError(f"Serileştirilemeyen tip: {type(value).__name__}")
+
+
+# ==================== JSON ====================
+
+if orjson is not None:
+    def dumps(obj: Any) -> bytes:
+        """Nesneyi UTF-8 JSON bytes'a çevirir"""
+        return orjson.dumps(obj, default=_default)
+    
+    def dumps_text(obj: Any) -> str:
+        """Nesneyi JSON metnine çevirir (WebSocket text frame)"""
+        return orjson.dumps(obj, default=_default).decode()
+    
+    loads = orjson.loads
+else:
+    def dumps(obj: Any) -> bytes:
+        """Nesneyi UTF-8 JSON bytes'a çevirir"""
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=_default).encode()
+    
+    def dumps_text(obj: Any) -> str:
+        """Nesneyi JSON metnine çevirir (WebSocket text frame)"""
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=_default)
+    
+    loads = json.loads
+
+
+# ==================== MessagePack ====================
+
+def packb(obj: Any) -> bytes:
+    """Nesneyi MessagePack bytes'a çevirir (msgpack kurulu olmalı)"""
+    return msgpack.packb(obj, default=_default)
+
+
+def unpackb(data: bytes) -> Any:
+    """MessagePack bytes'ı nesneye çevirir (msgpack kurulu olmalı)"""
+    return msgpack.unpackb(data)
+
+
+# ==================== Frame ====================
+
+class Frame:
+    """
+    Bir kez oluşturulup odadaki tüm bağlantılara gönderilen mesaj.
+    
+    JSON metni ve MessagePack gövdesi ilk ihtiyaç duyulduğunda bir kez
+    üretilir; odada MessagePack istemcisi yoksa binary hiç oluşturulmaz.
+    Replay log'una giren frame'lere `seq` atanır ve gövdeye eklenir.
+    """
+    
+    __slots__ = ("payload", "seq", "_body", "_text", "_binary")
+    
+    def __init__(self, payload: Union[dict, BaseModel, None] = None, text: Optional[str] = None):
+        self.payload = payload
+        self.seq: Optional[int] = None
+        self._body = text
+        self._text: Optional[str] = None
+        self._binary: Optional[bytes] = None
+    
+    @property
+    def body(self) -> str:
+        """seq eklenmemiş JSON metni (backplane ile diğer worker'lara giden)"""
+        if self._body is None:
+            if isinstance(self.payload, BaseModel):
+                self._body = self.payload.model_dump_json()
+            else:
+                self._body = dumps_text(self.payload)
+        return self._body
+    
+    @property
+    def text(self) -> str:
+        """JSON text frame"""
+        if self._text is None:
+            text = self.body
+            if self.seq is not None:
+                # Nesnenin kapanışından önce seq alanını ekle (yeniden serileştirmeden)
+                text = f'{text[:-1]},"seq":{self.seq}}}'
+            self._text = text
+        return self._text
+    
+    @property
+    def binary(self) -> bytes:
+        """MessagePack binary frame"""
+        if self._binary is None:
+            payload = self.payload
+            if isinstance(payload, BaseModel):
+                payload = payload.model_dump(mode="json")
+            elif payload is None:
+                payload = loads(self._body)
+            if self.seq is not None:
+                payload = {**payload, "seq": self.seq}
+            self._binary = packb(payload)
+        return self._binary
+    
+    def encode(self, binary: bool) -> Union[str, bytes]:
+        """Bağlantının protokolüne göre frame gövdesi"""
+        return self.binary if binary else self.text
+
+
+class FrameBatch:
+    """
+    Yoğun odalarda kısa bir pencerede biriken frame'lerin tek bir dizi
+    frame'i ([frame, frame, ...]) olarak gönderilmesi.
+    
+    Öğeler yeniden serileştirilmez: JSON'da metinler virgülle, MessagePack'te
+    binary gövdeler dizi başlığının arkasına eklenir.
+    """
+    
+    __slots__ = ("frames", "_text", "_binary")
+    
+    def __init__(self, frames: List[Frame]):
+        self.frames = frames
+        self._text: Optional[str] = None
+        self._binary: Optional[bytes] = None
+    
+    def __len__(self) -> int:
+        return len(self.frames)
+    
+    @property
+    def text(self) -> str:
+        """JSON dizisi"""
+        if self._text is None:
+            self._text = "[" + ",".join(frame.text for frame in self.frames) + "]"
+        return self._text
+    
+    @property
+    def binary(self) -> bytes:
+        """MessagePack dizisi"""
+        if self._binary is None:
+            size = len(self.frames)
+            if size < 16:
+                header = bytes((0x90 | size,))
+            elif size < 0x10000:
+                header = b"\xdc" + size.to_bytes(2, "big")
+            else:
+                header = b"\xdd" + size.to_bytes(4, "big")
+            self._binary = header + b"".join(frame.binary for frame in self.frames)
+        return self._binary
+    
+    def encode(self, binary: bool) -> Union[str, bytes]:
+        """Bağlantının protokolüne göre frame gövdesi"""
+        return self.binary if binary else self.text
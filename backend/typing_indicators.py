@@ -0,0 +1,211 @@
+"""
+Yazıyor Göstergeleri
+typing_start/typing_stop sinyallerini oda bazında sunucuda toplar ve
+sabit aralıklarla, sadece değiştiğinde, tek bir "typing" frame'i olarak
+odaya gönderir. Sinyal yenilenmezse kullanıcı TYPING_TIMEOUT_SECONDS
+sonunda listeden düşer (yazarken kopan istemci takılı kalmaz).
+
+Birden fazla worker varsa her worker kendi listesini backplane ile
+yayınlar; odaya gönderilen liste tüm worker'ların birleşimidir.
+"""
+
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+import asyncio
+import time
+
+from config import settings
+from manager import ConnectionManager, manager
+from serialization import Frame
+
+
+class TypingIndicators:
+    """
+    Oda bazında kimin yazdığını tutan ve toplu gönderen arka plan task'ı.
+    
+    - typing_start(): kullanıcının süresini yeniler, liste değiştiyse odayı işaretler
+    - typing_stop(): kullanıcıyı çıkarır (typing_stop, mesaj gönderme, ayrılma)
+    - Her TYPING_BROADCAST_INTERVAL_MS'te süresi dolanlar atılır ve
+      listesi son gönderilenden farklı olan odalara {"type": "typing",
+      "users": [...]} gönderilir.
+    """
+    
+    def __init__(
+        self,
+        connection_manager: ConnectionManager = None,
+        interval_ms: int = None,
+        timeout_seconds: float = None
+    ):
+        self.manager = connection_manager or manager
+        self.interval = (interval_ms or settings.TYPING_BROADCAST_INTERVAL_MS) / 1000
+        self.timeout = timeout_seconds or settings.TYPING_TIMEOUT_SECONDS
+        
+        # Oda -> {kullanıcı adı: sona erme zamanı (monotonic)}
+        self._typing: Dict[str, Dict[str, float]] = {}
+        # Oda -> en son gönderilen (birleşik) liste
+        self._sent: Dict[str, Tuple[str, ...]] = {}
+        # Oda -> diğer worker'lara en son bildirilen yerel liste
+        self._published: Dict[str, Tuple[str, ...]] = {}
+        # Oda -> worker -> o worker'da yazanlar
+        self._remote: Dict[str, Dict[str, Tuple[str, ...]]] = {}
+        self._dirty: Set[str] = set()
+        self._task: Optional[asyncio.Task] = None
+        
+        # İstatistikler
+        self.signals = 0  # Alınan typing_start/typing_stop sinyalleri
+        self.frames_sent = 0  # Gönderilen toplu "typing" frame'leri
+        
+        backplane = self.manager.backplane
+        backplane.on("typing", self._on_remote_typing)
+        backplane.on_worker_lost(self._forget_worker)
+    
+    async def start(self):
+        """Periyodik gönderim task'ını başlatır"""
+        if self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Gönderim task'ını durdurur"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+    
+    def typing_start(self, room_id: str, username: str):
+        """Kullanıcının yazdığını kaydeder (süresi her sinyalde yenilenir)"""
+        self.signals += 1
+        users = self._typing.get(room_id)
+        if users is None:
+            users = self._typing[room_id] = {}
+        if username not in users:
+            self._dirty.add(room_id)
+        users[username] = time.monotonic() + self.timeout
+    
+    def typing_stop(self, room_id: str, username: str, signal: bool = True):
+        """
+        Kullanıcıyı yazanlardan çıkarır.
+        
+        Args:
+            signal: İstemciden gelen typing_stop ise True (mesaj gönderme
+                    veya ayrılma gibi örtük durdurmalar sayılmaz)
+        """
+        if signal:
+            self.signals += 1
+        users = self._typing.get(room_id)
+        if users is not None and users.pop(username, None) is not None:
+            self._dirty.add(room_id)
+    
+    def get_typing_users(self, room_id: str) -> List[str]:
+        """Odada şu an yazan kullanıcılar (diğer worker'lardakiler dahil)"""
+        return list(self._merged(room_id, self._typing.get(room_id, ())))
+    
+    async def flush(self):
+        """Süresi dolanları atar ve listesi değişen odalara gönderir"""
+        now = time.monotonic()
+        for room_id, users in list(self._typing.items()):
+            expired = [username for username, expires_at in users.items() if expires_at <= now]
+            for username in expired:
+                del users[username]
+            if expired:
+                self._dirty.add(room_id)
+        
+        dirty, self._dirty = self._dirty, set()
+        for room_id in dirty:
+            typing = tuple(sorted(self._typing.get(room_id, ())))
+            if not typing:
+                self._typing.pop(room_id, None)
+            self._publish(room_id, typing)
+            typing = self._merged(room_id, typing)
+            
+            if room_id not in self.manager.active_connections:
+                # Oda boşaldı, gönderilecek kimse yok
+                self._sent.pop(room_id, None)
+                continue
+            if typing == self._sent.get(room_id, ()):
+                continue
+            
+            if typing:
+                self._sent[room_id] = typing
+            else:
+                self._sent.pop(room_id, None)
+            await self.manager.broadcast_frame(room_id, Frame({
+                "type": "typing",
+                "users": list(typing),
+                "timestamp": datetime.utcnow().isoformat()
+            }), replay=False, relay=False)
+            self.frames_sent += 1
+    
+    def get_stats(self) -> dict:
+        """
+        Yazıyor göstergesi istatistiklerini döner.
+        
+        Returns:
+            dict: Yazan kullanıcısı olan oda sayısı, alınan sinyal ve
+                  gönderilen frame sayıları
+        """
+        return {
+            "rooms": len(self._typing),
+            "signals": self.signals,
+            "frames_sent": self.frames_sent,
+            "interval_ms": int(self.interval * 1000),
+            "timeout_seconds": self.timeout
+        }
+    
+    # ==================== İç Yardımcılar ====================
+    
+    def _merged(self, room_id: str, typing) -> Tuple[str, ...]:
+        """Yerel liste + diğer worker'larda yazanlar (sıralı)"""
+        remote = self._remote.get(room_id)
+        if not remote:
+            return tuple(sorted(typing))
+        return tuple(sorted(set(typing).union(*remote.values())))
+    
+    def _publish(self, room_id: str, typing: Tuple[str, ...]):
+        """Yerel liste değiştiyse diğer worker'lara bildirir"""
+        if not self.manager.should_relay(room_id) or typing == self._published.get(room_id, ()):
+            return
+        if typing:
+            self._published[room_id] = typing
+        else:
+            self._published.pop(room_id, None)
+        self.manager.backplane.publish("typing", room=room_id, users=list(typing))
+    
+    def _on_remote_typing(self, message: dict):
+        """Diğer worker'ın odadaki yazanlar listesini günceller"""
+        room_id, worker = message["room"], message["worker"]
+        workers = self._remote.setdefault(room_id, {})
+        if message["users"]:
+            workers[worker] = tuple(message["users"])
+        else:
+            workers.pop(worker, None)
+            if not workers:
+                del self._remote[room_id]
+        self._dirty.add(room_id)
+    
+    def _forget_worker(self, worker: str):
+        """Kapanan/ölen worker'da yazanları listelerden çıkarır"""
+        for room_id, workers in list(self._remote.items()):
+            if workers.pop(worker, None) is not None:
+                if not workers:
+                    del self._remote[room_id]
+                self._dirty.add(room_id)
+    
+    async def _run(self):
+        """Periyodik gönderim döngüsü"""
+        while True:
+            await asyncio.sleep(self.interval)
+            if not self._typing and not self._dirty:
+                continue
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"❌ Yazıyor göstergeleri gönderilemedi: {e}")
+
+
+# Global singleton instance
+typing_indicators = TypingIndicators()
@@ -3,39 +3,165 @@ Utility Functions
 Yardımcı fonksiyonlar
 """
 
-import random
+from collections import deque
+from typing import Deque
+import hashlib
+import hmac
+import secrets
 import string
+import threading
 
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
 
-def generate_room_code(length: int = 6) -> str:
+from config import settings
+from models import AppSecret, Counter, Room
+
+
+# Karışık harfler ve sayılar (0, O, I, l gibi karıştırılabilecekleri hariç tut)
+ROOM_CODE_CHARS = string.ascii_uppercase.replace('O', '').replace('I', '') + string.digits.replace('0', '')
+
+# XXX-XXX kodunun her yarısı 33^3 değer alır, toplam 33^6 (~1.29 milyar) kod
+ROOM_CODE_HALF = len(ROOM_CODE_CHARS) ** 3
+ROOM_CODE_SPACE = ROOM_CODE_HALF * ROOM_CODE_HALF
+
+
+class RoomCodeAllocator:
     """
-    Okunabilir, benzersiz bir oda kodu üretir.
-    Format: XXX-XXX (örn: A7X-29K)
+    Deneme-yanılma olmadan benzersiz oda kodu dağıtır.
     
-    Args:
-        length: Kod uzunluğu (varsayılan: 6)
-    
-    Returns:
-        str: Üretilen oda kodu
+    - Kodlar artan bir sayacın anahtarlı permütasyonudur (4 turlu Feistel):
+      her sayaç değeri farklı bir koda gider, ardışık kodlar birbirinden
+      tahmin edilemez.
+    - Anahtar ilk kullanımda rastgele üretilip `app_secrets` tablosunda
+      saklanır; her kurulum (SECRET_KEY varsayılan kalsa bile) farklı bir
+      kod dizisi verir, tüm süreçler aynı anahtarı kullanır.
+    - Sayaç veritabanındaki `counters` tablosundan ROOM_CODE_BLOCK_SIZE'lık
+      bloklar halinde rezerve edilir; birden fazla süreç farklı bloklar alır.
+    - Blok doldurulurken, önceden (rastgele üretilmiş) mevcut kodlarla
+      çakışanlar tek bir toplu sorgu ile elenir.
     """
-    # Karışık harfler ve sayılar (0, O, I, l gibi karıştırılabilecekleri hariç tut)
-    chars = string.ascii_uppercase.replace('O', '').replace('I', '') + string.digits.replace('0', '')
     
-    # İlk yarı
-    first_part = ''.join(random.choice(chars) for _ in range(length // 2))
-    # İkinci yarı
-    second_part = ''.join(random.choice(chars) for _ in range(length // 2))
+    COUNTER_NAME = "room_code"
+    KEY_NAME = "room_code_key"
+    ROUNDS = 4
+    
+    def __init__(self, block_size: int = None, secret_key: str = None):
+        self.block_size = block_size or settings.ROOM_CODE_BLOCK_SIZE
+        # Anahtar verilmediyse ilk rezervasyonda veritabanından yüklenir
+        self._key = hashlib.sha256(secret_key.encode()).digest() if secret_key else None
+        self._codes: Deque[str] = deque()
+        self._lock = threading.Lock()
+    
+    def allocate(self, db) -> str:
+        """
+        Kullanılmamış bir oda kodu döner.
+        
+        Havuz boşsa yeni blok rezerve edilir ve hemen commit edilir;
+        bu yüzden db üzerinde bekleyen değişiklik olmamalıdır.
+        
+        Args:
+            db: Database session (yazma)
+        
+        Returns:
+            str: Benzersiz oda kodu
+        
+        Raises:
+            ValueError: Kod alanı tükendiyse
+        """
+        with self._lock:
+            while not self._codes:
+                self._refill(db)
+            return self._codes.popleft()
+    
+    def code_for(self, number: int) -> str:
+        """Sayaç değerini XXX-XXX formatında koda çevirir"""
+        left, right = divmod(self._permute(number), ROOM_CODE_HALF)
+        return f"{self._encode_half(left)}-{self._encode_half(right)}"
     
-    return f"{first_part}-{second_part}"
+    # ==================== İç Yardımcılar ====================
+    
+    def _refill(self, db):
+        """Yeni sayaç bloğu rezerve eder ve kullanılmayan kodları havuza ekler"""
+        if self._key is None:
+            self._key = self._load_key(db)
+        
+        numbers = [number for number in self._reserve_block(db) if number < ROOM_CODE_SPACE]
+        if not numbers:
+            raise ValueError("Oda kodu alanı tükendi.")
+        
+        codes = [self.code_for(number) for number in numbers]
+        taken = {
+            room_id for (room_id,) in
+            db.query(Room.room_id).filter(Room.room_id.in_(codes)).all()
+        }
+        self._codes.extend(code for code in codes if code not in taken)
+    
+    def _reserve_block(self, db) -> range:
+        """Sayaçtan block_size'lık aralığı atomik olarak ayırır"""
+        end = db.execute(
+            update(Counter)
+            .where(Counter.name == self.COUNTER_NAME)
+            .values(value=Counter.value + self.block_size)
+            .returning(Counter.value)
+        ).scalar()
+        
+        if end is None:
+            # İlk rezervasyon: sayaç satırını oluştur
+            try:
+                db.add(Counter(name=self.COUNTER_NAME, value=self.block_size))
+                db.flush()
+            except IntegrityError:
+                # Başka bir süreç aynı anda oluşturdu
+                db.rollback()
+                return self._reserve_block(db)
+            end = self.block_size
+        
+        db.commit()
+        return range(end - self.block_size, end)
+    
+    def _load_key(self, db) -> bytes:
+        """Permütasyon anahtarını okur; yoksa rastgele üretip saklar"""
+        row = db.get(AppSecret, self.KEY_NAME)
+        if row is None:
+            try:
+                db.add(AppSecret(name=self.KEY_NAME, value=secrets.token_hex(32)))
+                db.commit()
+            except IntegrityError:
+                # Başka bir süreç aynı anda oluşturdu: onunkini kullan
+                db.rollback()
+            row = db.get(AppSecret, self.KEY_NAME)
+        return bytes.fromhex(row.value)
+    
+    def _permute(self, number: int) -> int:
+        """[0, ROOM_CODE_SPACE) aralığında anahtarlı bijeksiyon (Feistel)"""
+        left, right = divmod(number, ROOM_CODE_HALF)
+        for round_no in range(self.ROUNDS):
+            left, right = right, (left + self._round(round_no, right)) % ROOM_CODE_HALF
+        return left * ROOM_CODE_HALF + right
+    
+    def _round(self, round_no: int, value: int) -> int:
+        """Feistel tur fonksiyonu (HMAC-SHA256)"""
+        digest = hmac.new(self._key, bytes([round_no]) + value.to_bytes(4, "big"), hashlib.sha256).digest()
+        return int.from_bytes(digest[:8], "big") % ROOM_CODE_HALF
+    
+    @staticmethod
+    def _encode_half(value: int) -> str:
+        """0..33^3-1 değerini 3 karakterlik koda çevirir"""
+        base = len(ROOM_CODE_CHARS)
+        chars = []
+        for _ in range(3):
+            value, digit = divmod(value, base)
+            chars.append(ROOM_CODE_CHARS[digit])
+        return ''.join(reversed(chars))
 
 
-def generate_unique_room_code(db, max_attempts: int = 10) -> str:
+def generate_unique_room_code(db) -> str:
     """
     Veritabanında benzersiz olan bir oda kodu üretir.
     
     Args:
         db: Database session
-        max_attempts: Maksimum deneme sayısı
     
     Returns:
         str: Benzersiz oda kodu
@@ -43,13 +169,8 @@ def generate_unique_room_code(db, max_attempts: int = 10) -> str:
     Raises:
         ValueError: Benzersiz kod üretilemezse
     """
-    from models import Room
-    
-    for _ in range(max_attempts):
-        code = generate_room_code()
-        # Kodun veritabanında olup olmadığını kontrol et
-        existing = db.query(Room).filter(Room.room_id == code).first()
-        if not existing:
-            return code
-    
-    raise ValueError("Benzersiz oda kodu üretilemedi. Lütfen tekrar deneyin.")
+    return room_code_allocator.allocate(db)
+
+
+# Global singleton instance
+room_code_allocator = RoomCodeAllocator()
@@ -3,6 +3,10 @@ import { useWebSocket } from '../hooks/useWebSocket';
 import { api } from '../services/api';
 import { Message } from './Message';
 
+// The server drops a typer after TYPING_TIMEOUT_SECONDS (5s) without a
+// typing_start, so keep refreshing it at half that while the user types
+const TYPING_REFRESH_MS = 2500;
+
 interface ChatRoomProps {
   roomId: string;
   roomName?: string;
@@ -13,42 +17,21 @@ interface ChatRoomProps {
 export const ChatRoom = ({ roomId, roomName, username, onLeave }: ChatRoomProps) => {
   const [messageInput, setMessageInput] = useState('');
   const [uploading, setUploading] = useState(false);
-  const [loadingHistory, setLoadingHistory] = useState(true);
   const [typingUsers, setTypingUsers] = useState<string[]>([]);
   const [isTyping, setIsTyping] = useState(false);
   const messagesEndRef = useRef<HTMLDivElement>(null);
   const fileInputRef = useRef<HTMLInputElement>(null);
   const typingTimeoutRef = useRef<NodeJS.Timeout | null>(null);
+  const lastTypingSentRef = useRef(0);
 
-  const { messages, isConnected, error, sendMessage, connect, disconnect, loadHistory, typingUsers: wsTypingUsers } =
+  const { messages, isConnected, error, sendMessage, connect, disconnect, typingUsers: wsTypingUsers } =
     useWebSocket();
 
-  // Load chat history when room is opened
-  useEffect(() => {
-    const loadChatHistory = async () => {
-      try {
-        setLoadingHistory(true);
-        const response = await api.getChatHistory(roomId, 50);
-        if (response.messages && response.messages.length > 0) {
-          loadHistory(response.messages);
-        }
-      } catch (err) {
-        console.error('Failed to load chat history:', err);
-      } finally {
-        setLoadingHistory(false);
-      }
-    };
-
-    loadChatHistory();
-  }, [roomId, loadHistory]);
-
-  // Connect to WebSocket after loading history
+  // Connect to WebSocket (the welcome frame brings the recent history)
   useEffect(() => {
-    if (!loadingHistory) {
-      connect(roomId, username);
-    }
+    connect(roomId, username);
     return () => disconnect();
-  }, [roomId, username, loadingHistory, connect, disconnect]);
+  }, [roomId, username, connect, disconnect]);
 
   useEffect(() => {
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
@@ -64,9 +47,10 @@ export const ChatRoom = ({ roomId, roomName, username, onLeave }: ChatRoomProps)
     const value = e.target.value;
     setMessageInput(value);
 
-    // Send typing_start if not already typing
-    if (!isTyping && value.length > 0) {
+    // Send typing_start when typing begins, then refresh it before the server expires it
+    if (value.length > 0 && (!isTyping || Date.now() - lastTypingSentRef.current >= TYPING_REFRESH_MS)) {
       setIsTyping(true);
+      lastTypingSentRef.current = Date.now();
       sendMessage({ type: 'typing_start', username });
     }
 
@@ -1,7 +1,10 @@
 import { useState, useEffect, useRef, useCallback } from 'react';
-import type { Message } from '../types/index';
+import type { Message, PresenceMessage, RedirectMessage, WelcomeMessage } from '../types/index';
 
 const WS_URL = 'ws://localhost:8000';
+const RECONNECT_DELAY_MS = 2000;
+// Server asked us to move to the worker that owns the room
+const REDIRECT_CLOSE_CODE = 4001;
 
 interface UseWebSocketReturn {
   messages: Message[];
@@ -12,6 +15,7 @@ interface UseWebSocketReturn {
   disconnect: () => void;
   loadHistory: (history: Message[]) => void;
   typingUsers: string[];
+  roomUsers: string[];
 }
 
 export const useWebSocket = (): UseWebSocketReturn => {
@@ -19,16 +23,28 @@ export const useWebSocket = (): UseWebSocketReturn => {
   const [isConnected, setIsConnected] = useState(false);
   const [error, setError] = useState<string | null>(null);
   const [typingUsers, setTypingUsers] = useState<string[]>([]);
+  const [roomUsers, setRoomUsers] = useState<string[]>([]);
+  const presenceVersionRef = useRef<number>(-1);
   const wsRef = useRef<WebSocket | null>(null);
   const roomIdRef = useRef<string>('');
   const usernameRef = useRef<string>('');
+  // Last broadcast sequence number seen, sent as resume_from on reconnect
+  const lastSeqRef = useRef<number | null>(null);
+  const reconnectTimerRef = useRef<ReturnType<typeof setTimeout> | null>(null);
+  // Server URL from the last redirect (used for the next connection only)
+  const redirectUrlRef = useRef<string | null>(null);
+  // Redirects since the last welcome - back off if servers disagree on the owner
+  const redirectCountRef = useRef(0);
 
-  const connect = useCallback((roomId: string, username: string) => {
-    roomIdRef.current = roomId;
-    usernameRef.current = username;
+  const openSocket = useCallback(() => {
+    const roomId = roomIdRef.current;
+    const username = usernameRef.current;
+    const resume = lastSeqRef.current !== null ? `&resume_from=${lastSeqRef.current}` : '';
+    const baseUrl = redirectUrlRef.current ?? WS_URL;
+    redirectUrlRef.current = null;
 
     try {
-      const ws = new WebSocket(`${WS_URL}/ws/${roomId}?username=${username}`);
+      const ws = new WebSocket(`${baseUrl}/ws/${roomId}?username=${username}${resume}`);
 
       ws.onopen = () => {
         console.log('WebSocket connected');
@@ -38,21 +54,68 @@ export const useWebSocket = (): UseWebSocketReturn => {
 
       ws.onmessage = (event) => {
         try {
-          const message: Message = JSON.parse(event.data);
-          
-          // Handle typing indicators
-          if (message.type === 'typing_start') {
-            setTypingUsers((prev) => {
-              if (!prev.includes(message.username)) {
-                return [...prev, message.username];
+          const payload = JSON.parse(event.data);
+          // Busy rooms send the frames of a short window as one array
+          const frames = Array.isArray(payload) ? payload : [payload];
+          const received: Message[] = [];
+
+          for (const data of frames) {
+            if (typeof data.seq === 'number') {
+              lastSeqRef.current = data.seq;
+            }
+
+            // First frame: room info, users and recent messages in one go
+            if (data.type === 'welcome') {
+              const welcome = data as WelcomeMessage;
+              redirectCountRef.current = 0;
+              presenceVersionRef.current = welcome.presence.version;
+              setRoomUsers(welcome.presence.users);
+              setTypingUsers(welcome.typing);
+              // Not resumed (first join or missed too much) - start from the server's view
+              if (!welcome.resumed) {
+                setMessages(welcome.messages);
               }
-              return prev;
-            });
-          } else if (message.type === 'typing_stop') {
-            setTypingUsers((prev) => prev.filter((user) => user !== message.username));
-          } else {
+              continue;
+            }
+
+            // The room is served by another worker - reconnect there when the socket closes
+            if (data.type === 'redirect') {
+              redirectUrlRef.current = (data as RedirectMessage).url;
+              redirectCountRef.current += 1;
+              continue;
+            }
+
+            // Handle presence (full list on join, diffs afterwards)
+            if (data.type === 'presence' || data.type === 'presence_diff') {
+              const presence = data as PresenceMessage;
+              if (presence.type === 'presence') {
+                presenceVersionRef.current = presence.version;
+                setRoomUsers(presence.users ?? []);
+              } else if (presence.version === presenceVersionRef.current + 1) {
+                presenceVersionRef.current = presence.version;
+                setRoomUsers((prev) => [
+                  ...prev.filter((user) => !presence.removed?.includes(user)),
+                  ...(presence.added ?? []).filter((user) => !prev.includes(user)),
+                ]);
+              } else if (presence.version > presenceVersionRef.current) {
+                // Missed a diff - ask for the full list again
+                ws.send(JSON.stringify({ type: 'presence_sync' }));
+              }
+              continue;
+            }
+
+            // Handle typing indicators (server sends the full list when it changes)
+            if (data.type === 'typing') {
+              setTypingUsers((data.users as string[]).filter((user) => user !== usernameRef.current));
+              continue;
+            }
+
             // Regular message - add to messages list
-            setMessages((prev) => [...prev, message]);
+            received.push(data as Message);
+          }
+
+          if (received.length > 0) {
+            setMessages((prev) => [...prev, ...received]);
           }
         } catch (err) {
           console.error('Failed to parse message:', err);
@@ -64,9 +127,16 @@ export const useWebSocket = (): UseWebSocketReturn => {
         setError('Bağlantı hatası oluştu');
       };
 
-      ws.onclose = () => {
+      ws.onclose = (event) => {
         console.log('WebSocket disconnected');
         setIsConnected(false);
+
+        // Unexpected close (sleep, Wi-Fi drop) - reconnect and resume from the last seq
+        // 4000: room not found, no point retrying
+        if (wsRef.current === ws && event.code !== 4000) {
+          const redirected = event.code === REDIRECT_CLOSE_CODE && redirectCountRef.current <= 1;
+          reconnectTimerRef.current = setTimeout(openSocket, redirected ? 0 : RECONNECT_DELAY_MS);
+        }
       };
 
       wsRef.current = ws;
@@ -76,13 +146,30 @@ export const useWebSocket = (): UseWebSocketReturn => {
     }
   }, []);
 
+  const connect = useCallback((roomId: string, username: string) => {
+    roomIdRef.current = roomId;
+    usernameRef.current = username;
+    lastSeqRef.current = null;
+    openSocket();
+  }, [openSocket]);
+
   const disconnect = useCallback(() => {
+    if (reconnectTimerRef.current) {
+      clearTimeout(reconnectTimerRef.current);
+      reconnectTimerRef.current = null;
+    }
     if (wsRef.current) {
-      wsRef.current.close();
+      const ws = wsRef.current;
       wsRef.current = null;
+      ws.close();
       setIsConnected(false);
       setMessages([]);
       setTypingUsers([]);
+      setRoomUsers([]);
+      presenceVersionRef.current = -1;
+      lastSeqRef.current = null;
+      redirectUrlRef.current = null;
+      redirectCountRef.current = 0;
     }
   }, []);
 
@@ -101,8 +188,13 @@ export const useWebSocket = (): UseWebSocketReturn => {
 
   useEffect(() => {
     return () => {
+      if (reconnectTimerRef.current) {
+        clearTimeout(reconnectTimerRef.current);
+      }
       if (wsRef.current) {
-        wsRef.current.close();
+        const ws = wsRef.current;
+        wsRef.current = null;
+        ws.close();
       }
     };
   }, []);
@@ -116,5 +208,6 @@ export const useWebSocket = (): UseWebSocketReturn => {
     disconnect,
     loadHistory,
     typingUsers,
+    roomUsers,
   };
 };
@@ -5,13 +5,39 @@ export interface Message {
   timestamp: string;
   content?: string;
   message?: string;
-  room_users?: string[];
   file_url?: string;
   file_name?: string;
   file_size?: number;
   file_type?: string;
   error_code?: string;
   severity?: 'info' | 'warning' | 'success';
+  seq?: number;
+}
+
+// Presence (full snapshot or diff against the previous version)
+export interface PresenceMessage {
+  type: 'presence' | 'presence_diff';
+  version: number;
+  users?: string[];
+  added?: string[];
+  removed?: string[];
+}
+
+// First frame after connecting
+export interface WelcomeMessage {
+  type: 'welcome';
+  room: { room_id: string; room_name: string | null };
+  presence: { version: number; users: string[] };
+  messages: Message[];
+  typing: string[];
+  seq: number | null;
+  resumed: boolean;
+}
+
+// The room lives on another server (room affinity) - reconnect to `url`
+export interface RedirectMessage {
+  type: 'redirect';
+  url: string;
 }
 
 // Room info